@@ -0,0 +1,44 @@
+"""add file objects table
+
+Revision ID: d41c7a9e5b20
+Revises: c0a83e94e061
+Create Date: 2026-10-19 10:12:44.218391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7a9e5b20'
+down_revision: Union[str, Sequence[str], None] = 'c0a83e94e061'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('file_objects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('s3_key', sa.String(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('metadata', sa.JSON(), nullable=True),
+    sa.Column('processing_seconds', sa.Float(), nullable=True),
+    sa.Column('upload_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_uploaded_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_objects_id'), 'file_objects', ['id'], unique=False)
+    op.create_index(op.f('ix_file_objects_sha256'), 'file_objects', ['sha256'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_file_objects_sha256'), table_name='file_objects')
+    op.drop_index(op.f('ix_file_objects_id'), table_name='file_objects')
+    op.drop_table('file_objects')
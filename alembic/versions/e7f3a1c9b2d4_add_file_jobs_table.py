@@ -0,0 +1,46 @@
+"""add file jobs table
+
+Revision ID: e7f3a1c9b2d4
+Revises: d41c7a9e5b20
+Create Date: 2026-10-19 18:05:12.480913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f3a1c9b2d4'
+down_revision: Union[str, Sequence[str], None] = 'd41c7a9e5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('file_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('s3_key', sa.String(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('stage', sa.String(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_jobs_sha256'), 'file_jobs', ['sha256'], unique=False)
+    op.create_index(op.f('ix_file_jobs_status'), 'file_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_file_jobs_status'), table_name='file_jobs')
+    op.drop_index(op.f('ix_file_jobs_sha256'), table_name='file_jobs')
+    op.drop_table('file_jobs')
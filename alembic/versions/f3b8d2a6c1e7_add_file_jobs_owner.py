@@ -0,0 +1,28 @@
+"""add file jobs owner
+
+Revision ID: f3b8d2a6c1e7
+Revises: e7f3a1c9b2d4
+Create Date: 2026-10-19 18:52:37.214650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6c1e7'
+down_revision: Union[str, Sequence[str], None] = 'e7f3a1c9b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('file_jobs', sa.Column('owner', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('file_jobs', 'owner')
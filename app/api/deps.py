@@ -0,0 +1,65 @@
+"""
+FastAPI dependencies providing the shared services.
+
+The services are built on first use rather than when the endpoint modules
+are imported. Building one imports its client libraries and creates their
+clients, so the first build runs in a worker thread, under a lock of its
+own so that concurrent first requests build it once without waiting on the
+build of another service; later calls return the getter's singleton
+without leaving the event loop. Getters build the services they depend on
+themselves, possibly in several threads at once, so each one also guards
+its singleton with a threading lock.
+"""
+from typing import Any, Callable, Dict, Set
+from app.services.file_dedup import FileDedupService, get_file_dedup_service
+from app.services.file_processor import FileProcessor, get_file_processor
+from app.services.hybrid_search_service import HybridSearchService, get_hybrid_search_service
+from app.services.image_derivatives import ImageDerivativeService, get_image_derivative_service
+from app.services.s3_service import S3Service, get_s3_service
+from app.services.semantic_search_service import SemanticSearchService, get_semantic_search_service
+from app.services.upload_jobs import UploadJobService, get_upload_job_service
+import asyncio
+
+# Getters whose singleton has been built, and the lock of each getter's first build
+_built: Set[Callable[[], Any]] = set()
+_build_locks: Dict[Callable[[], Any], asyncio.Lock] = {}
+
+
+async def provide(getter: Callable[[], Any]) -> Any:
+    """
+    Return ``getter()``, calling it in a worker thread the first time
+    """
+    if getter not in _built:
+        async with _build_locks.setdefault(getter, asyncio.Lock()):
+            if getter not in _built:
+                await asyncio.to_thread(getter)
+                _built.add(getter)
+    return getter()
+
+
+async def s3_service() -> S3Service:
+    return await provide(get_s3_service)
+
+
+async def file_processor() -> FileProcessor:
+    return await provide(get_file_processor)
+
+
+async def semantic_search_service() -> SemanticSearchService:
+    return await provide(get_semantic_search_service)
+
+
+async def hybrid_search_service() -> HybridSearchService:
+    return await provide(get_hybrid_search_service)
+
+
+async def file_dedup_service() -> FileDedupService:
+    return await provide(get_file_dedup_service)
+
+
+async def image_derivative_service() -> ImageDerivativeService:
+    return await provide(get_image_derivative_service)
+
+
+async def upload_job_service() -> UploadJobService:
+    return await provide(get_upload_job_service)
@@ -6,6 +6,7 @@ from app.api.v1.endpoints import visits
 from app.api.v1.endpoints import cases
 from app.api.v1.endpoints import alerts
 from app.api.v1.endpoints import consultations
+from app.api.v1.endpoints import models
 
 api_router = APIRouter()
 api_router.include_router(files.router, prefix="/files", tags=["files"])
@@ -14,4 +15,5 @@ api_router.include_router(patients.router, prefix="/patients", tags=["patients"]
 api_router.include_router(visits.router, prefix="/visits", tags=["visits"])
 api_router.include_router(cases.router, prefix="/cases", tags=["cases"])
 api_router.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
-api_router.include_router(consultations.router, prefix="/consultations", tags=["consultations"])
\ No newline at end of file
+api_router.include_router(consultations.router, prefix="/consultations", tags=["consultations"])
+api_router.include_router(models.router, prefix="/models", tags=["models"])
\ No newline at end of file
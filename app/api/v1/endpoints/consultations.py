@@ -1,29 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from app.core.db import get_db
+from app.core.response_cache import cached, invalidates
 from app.schemas.consultation import (
     ConsultationCreate, ConsultationResponse, ConsultationUpdate,
     ChatMessageCreate, FileAttachmentCreate
 )
+from app.api import deps
 from app.services.consultation import ConsultationService, ChatMessageService, FileAttachmentService
-from app.services.file_processor import FileProcessor
 from app.services.s3_service import S3Service
 from app.services.file_processor import FileProcessor
 from app.services.transcription_service import get_transcription_service
 from typing import List, Optional
 from datetime import datetime
+import asyncio
 import os
 
 router = APIRouter()
-s3_service = S3Service()
-file_processor = FileProcessor()
 
 @router.post("/", response_model=ConsultationResponse)
+@invalidates("consultations")
 async def create_consultation(
     transcript: str = Form(...),
     language: str = Form(...),
     audio: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    s3_service: S3Service = Depends(deps.s3_service)
 ):
     try:
         # Upload audio to S3
@@ -44,6 +46,7 @@ async def create_consultation(
         raise HTTPException(status_code=500, detail=f"Failed to create consultation: {str(e)}")
 
 @router.get("/", response_model=List[ConsultationResponse])
+@cached(ttl=30, tags=["consultations"], response_model=List[ConsultationResponse])
 def list_consultations(
     status: Optional[str] = None,
     db: Session = Depends(get_db)
@@ -54,6 +57,7 @@ def list_consultations(
         raise HTTPException(status_code=500, detail=f"Failed to retrieve consultations: {str(e)}")
 
 @router.get("/{consultation_id}", response_model=ConsultationResponse)
+@cached(ttl=60, tags=["consultation:{consultation_id}"], response_model=ConsultationResponse)
 def get_consultation(consultation_id: int, db: Session = Depends(get_db)):
     try:
         consultation = ConsultationService.get_by_id(db, consultation_id)
@@ -66,6 +70,7 @@ def get_consultation(consultation_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve consultation: {str(e)}")
 
 @router.put("/{consultation_id}", response_model=ConsultationResponse)
+@invalidates("consultation:{consultation_id}", "consultations")
 def update_consultation(
     consultation_id: int,
     update: ConsultationUpdate,
@@ -83,6 +88,7 @@ def update_consultation(
 
 # Chat message endpoints
 @router.post("/{consultation_id}/chat", response_model=dict)
+@invalidates("consultation:{consultation_id}", "consultations")
 def add_chat_message(
     consultation_id: int,
     chat_message: ChatMessageCreate,
@@ -107,6 +113,7 @@ def add_chat_message(
         raise HTTPException(status_code=500, detail=f"Failed to add chat message: {str(e)}")
 
 @router.get("/{consultation_id}/chat", response_model=List[dict])
+@cached(ttl=60, tags=["consultation:{consultation_id}"])
 def get_chat_messages(consultation_id: int, db: Session = Depends(get_db)):
     try:
         # Verify consultation exists
@@ -132,10 +139,13 @@ def get_chat_messages(consultation_id: int, db: Session = Depends(get_db)):
 
 # File attachment endpoints
 @router.post("/{consultation_id}/files", response_model=dict)
+@invalidates("consultation:{consultation_id}", "consultations")
 async def upload_file_to_consultation(
     consultation_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    s3_service: S3Service = Depends(deps.s3_service),
+    file_processor: FileProcessor = Depends(deps.file_processor)
 ):
     try:
         # Verify consultation exists
@@ -172,6 +182,7 @@ async def upload_file_to_consultation(
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 @router.get("/{consultation_id}/files", response_model=List[dict])
+@cached(ttl=300, tags=["consultation:{consultation_id}"])
 def get_consultation_files(consultation_id: int, db: Session = Depends(get_db)):
     try:
         # Verify consultation exists
@@ -197,6 +208,7 @@ def get_consultation_files(consultation_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve files: {str(e)}")
 
 @router.post("/{consultation_id}/transcribe", response_model=dict)
+@invalidates("consultation:{consultation_id}", "consultations")
 async def transcribe_consultation_audio(
     consultation_id: int,
     db: Session = Depends(get_db)
@@ -241,7 +253,8 @@ async def transcribe_consultation_audio(
                 audio_format = "m4a"
         
         # Transcribe audio
-        result = transcription_service.transcribe_bytes(audio_content, audio_format=audio_format)
+        # Off the event loop, so that other requests (and queued ones) proceed
+        result = await asyncio.to_thread(transcription_service.transcribe_bytes, audio_content, audio_format=audio_format)
         transcript_text = result.get("transcript", "")
         
         if not transcript_text:
@@ -297,7 +310,8 @@ async def transcribe_audio_file(
                 audio_format = ext
         
         # Transcribe audio
-        result = transcription_service.transcribe_bytes(audio_content, audio_format=audio_format)
+        # Off the event loop, so that other requests (and queued ones) proceed
+        result = await asyncio.to_thread(transcription_service.transcribe_bytes, audio_content, audio_format=audio_format)
         transcript_text = result.get("transcript", "")
         
         response = {
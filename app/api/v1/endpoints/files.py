@@ -1,52 +1,209 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-from typing import List
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from typing import Any, Dict, List, Optional
+from app.api import deps
+from app.core.singleflight import SingleFlight
 from app.services.s3_service import S3Service
 from app.services.file_processor import FileProcessor
 from app.services.semantic_search_service import SemanticSearchService
-from app.schemas.file import FileResponse as FileResponseSchema
-from datetime import datetime
+from app.services.hybrid_search_service import HybridSearchService
+from app.services.search_index import get_search_index_manager
+from app.services.file_dedup import FileDedupService, content_key, read_and_hash
+from app.services.upload_jobs import UploadJobService
+from app.services.image_derivatives import DERIVATIVE_CACHE_CONTROL, DERIVATIVE_SIZES, derivative_key
+from app.core.response_cache import cached, invalidates
+from app.schemas.file import FileJobResponse, FileResponse as FileResponseSchema, HybridSearchRequest, HybridSearchResponse
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 
 router = APIRouter()
-s3_service = S3Service()
-file_processor = FileProcessor()
-semantic_search_service = SemanticSearchService()
+# Concurrent uploads of the same content are processed once
+upload_flight = SingleFlight()
+_bootstrap_task: Optional[asyncio.Task] = None
+_upload_job_service: Optional[UploadJobService] = None
+
+async def bootstrap() -> None:
+    global _upload_job_service
+    # Create the versioned index and aliases before anything dynamic-maps it
+    # (indexing a file ensures it too, should this fail)
+    try:
+        await get_search_index_manager().ensure_index()
+    except Exception as e:
+        logger.error(f"Failed to bootstrap search index: {str(e)}")
+    try:
+        _upload_job_service = await deps.upload_job_service()
+        resumed = await _upload_job_service.resume()
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished upload jobs")
+    except Exception as e:
+        logger.error(f"Failed to resume upload jobs: {str(e)}")
+
+@router.on_event("startup")
+async def startup_event():
+    # Building the services and reaching Elasticsearch and the database is
+    # left to the background, so the app serves requests right away
+    global _bootstrap_task
+    _bootstrap_task = asyncio.create_task(bootstrap())
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    if _bootstrap_task is not None and not _bootstrap_task.done():
+        _bootstrap_task.cancel()
+    if _upload_job_service is not None:
+        await _upload_job_service.stop()
+
+def derivative_urls(request: Request, file_key: str) -> Dict[str, str]:
+    """
+    Stable (and therefore browser-cacheable) URLs of an image's derivatives
+    """
+    return {
+        f"{'thumbnail' if name == 'thumb' else name}_url": str(request.url_for("get_file_derivative", name=name, file_key=file_key))
+        for name in DERIVATIVE_SIZES
+    }
 
 @router.post("/upload", response_model=FileResponseSchema)
-async def upload_file(file: UploadFile = File(...)):
+@invalidates("files")
+async def upload_file(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    s3_service: S3Service = Depends(deps.s3_service),
+    file_processor: FileProcessor = Depends(deps.file_processor),
+    file_dedup_service: FileDedupService = Depends(deps.file_dedup_service),
+    upload_job_service: UploadJobService = Depends(deps.upload_job_service)
+):
     """
-    Upload a file to S3 storage, process it, and store metadata.
+    Upload a file to S3 storage and queue its processing (OCR, embedding,
+    indexing). Returns 202 as soon as the file is stored, with the URL of
+    the job reporting when it becomes searchable.
     """
     try:
-        file_content = await file.read()
-        file_key = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        
-        # Process file to extract metadata and OCR
-        metadata = await file_processor.process_file(file.filename, file_content)
-        
-        # Upload file to S3
-        file_url = await s3_service.upload_file(file_key, file_content, file.content_type)
-        
-        # Index file with semantic embedding
-        await semantic_search_service.index_file({
-            "id": file_key,
-            "filename": file.filename,
-            "content_type": file.content_type,
-            **metadata
-        })
-        
-        # Add metadata to the response
+        file_content, sha256 = await read_and_hash(file)
+
+        # Known content reuses the stored object, metadata and embeddings
+        file_object = await file_dedup_service.find(sha256)
+        deduplicated = file_object is not None
+        if file_object is None:
+            stored_here = []
+
+            async def store() -> Dict[str, Any]:
+                stored_here.append(True)
+                return await store_file_object(
+                    sha256, file.filename, file.content_type, file_content,
+                    s3_service, file_processor, file_dedup_service, upload_job_service
+                )
+
+            file_object = await upload_flight.do(sha256, store)
+            if not stored_here:
+                # Joined an identical upload in flight: count it as a duplicate
+                deduplicated = True
+                file_object = {**(await file_dedup_service.find(sha256) or file_object), "job": file_object.get("job")}
+
+        # Objects stored before uploads were processed in the background have no job
+        job = file_object.get("job") or await upload_job_service.latest_for(sha256)
+        if job is not None and job["status"] == "failed":
+            # Processing of this content failed before: try again
+            job = await upload_job_service.submit(
+                sha256, file_object["s3_key"], file.filename, file.content_type,
+                file_processor.detect_type(file_content), file_content
+            )
+        if job is not None and job["status"] != "indexed":
+            response.status_code = 202
+        file_url = await s3_service.get_presigned_url(file_object["s3_key"])
+        derivatives = derivative_urls(request, file_object["s3_key"]) if file_object["metadata"].get("derivatives") else {}
+
+        # Add metadata to the response; it was stored by the first upload of
+        # the content, so this request's name and type take precedence
         return {
+            **file_object["metadata"],
             "filename": file.filename.strip(),
             "url": file_url,
             "content_type": file.content_type,
-            **metadata
+            **derivatives,
+            "sha256": sha256,
+            "deduplicated": deduplicated,
+            "job_id": job["id"] if job is not None else None,
+            "status": job["status"] if job is not None else "indexed",
+            "status_url": str(request.url_for("get_upload_job", job_id=job["id"])) if job is not None else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def store_file_object(
+    sha256: str,
+    filename: str,
+    content_type: str,
+    file_content: bytes,
+    s3_service: S3Service,
+    file_processor: FileProcessor,
+    file_dedup_service: FileDedupService,
+    upload_job_service: UploadJobService
+) -> Dict[str, Any]:
+    """
+    Store new content under its content-addressed key and queue its processing
+    """
+    file_type = file_processor.detect_type(file_content)
+    file_key = content_key(sha256, filename)
+    await s3_service.upload_file(file_key, file_content, content_type)
+
+    # Completed with the extracted metadata and processing time by the job
+    metadata = {"filename": os.path.basename(filename), "file_type": file_type, "size": len(file_content)}
+    file_object = await file_dedup_service.record(sha256, file_key, content_type, len(file_content), metadata, 0.0)
+    if file_object["upload_count"] > 1:
+        # Another worker stored the same content first and queued its job
+        return file_object
+    job = await upload_job_service.submit(sha256, file_key, filename, content_type, file_type, file_content)
+    return {**file_object, "job": job}
+
+@router.get("/jobs/{job_id}", response_model=FileJobResponse)
+async def get_upload_job(job_id: str, upload_job_service: UploadJobService = Depends(deps.upload_job_service)):
+    """
+    Processing status of an upload: "queued", "processing", "indexed" (searchable) or "failed"
+    """
+    job = await upload_job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/derivatives/{name}/{file_key}")
+async def get_file_derivative(
+    name: str, file_key: str, request: Request, s3_service: S3Service = Depends(deps.s3_service)
+):
+    """
+    Serve a WebP thumbnail or preview of an image. Derivatives of
+    content-addressed files never change, so they are cached indefinitely.
+    """
+    if name not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=404, detail="Unknown derivative")
+    try:
+        derivative = await s3_service.get_object(derivative_key(file_key, name))
+    except Exception:
+        raise HTTPException(status_code=404, detail="Derivative not found")
+
+    headers = {"Cache-Control": DERIVATIVE_CACHE_CONTROL}
+    if derivative["etag"]:
+        headers["ETag"] = derivative["etag"]
+        if request.headers.get("if-none-match") == derivative["etag"]:
+            return Response(status_code=304, headers=headers)
+    return Response(content=derivative["body"], media_type=derivative["content_type"], headers=headers)
+
+@router.get("/dedup/stats")
+async def dedup_stats(file_dedup_service: FileDedupService = Depends(deps.file_dedup_service)):
+    """
+    Storage and processing time saved by content-hash deduplication
+    """
+    try:
+        return await file_dedup_service.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/presigned-url/{file_key}")
-async def get_presigned_url(file_key: str):
+async def get_presigned_url(file_key: str, s3_service: S3Service = Depends(deps.s3_service)):
     """
     Get a presigned URL for a file
     """
@@ -57,49 +214,119 @@ async def get_presigned_url(file_key: str):
         raise HTTPException(status_code=404, detail="File not found")
 
 @router.get("/semantic-search", response_model=List[FileResponseSchema])
-async def semantic_search_files(query: str, top_k: int = 10):
+async def semantic_search_files(
+    query: str,
+    top_k: int = 10,
+    s3_service: S3Service = Depends(deps.s3_service),
+    semantic_search_service: SemanticSearchService = Depends(deps.semantic_search_service)
+):
     """
     Perform semantic search for files
     """
     try:
         files = await semantic_search_service.semantic_search(query, top_k)
-        return files
+        # The index stores the object key rather than an expiring URL
+        return [
+            {**file_data, "url": await s3_service.get_presigned_url(file_data["id"])} if file_data.get("id") else file_data
+            for file_data in files
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/semantic-search/stats")
+async def semantic_search_stats(
+    semantic_search_service: SemanticSearchService = Depends(deps.semantic_search_service)
+):
+    """
+    Query embedding cache and request coalescing statistics
+    """
+    return semantic_search_service.get_stats()
+
+@router.post("/hybrid-search", response_model=HybridSearchResponse)
+async def hybrid_search_files(
+    request: HybridSearchRequest, hybrid_search_service: HybridSearchService = Depends(deps.hybrid_search_service)
+):
+    """
+    Search files with BM25 and kNN combined by reciprocal rank fusion
+    """
+    try:
+        return await hybrid_search_service.search(
+            request.query,
+            filters=request.filters,
+            page=request.page,
+            size=request.size,
+            budget_ms=request.budget_ms
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search", response_model=List[FileResponseSchema])
-async def search_files(query: str="", page: int = 1, size: int = 10):
+@cached(ttl=30, tags=["files"], response_model=List[FileResponseSchema])
+async def search_files(
+    request: Request,
+    query: str="",
+    page: int = 1,
+    size: int = 10,
+    s3_service: S3Service = Depends(deps.s3_service),
+    file_dedup_service: FileDedupService = Depends(deps.file_dedup_service)
+):
     """
     List all files in the S3 bucket
     """
     try:
         files = await s3_service.list_files()
+        # Content-addressed keys are hashes: show the name the file was uploaded under
+        filenames = await file_dedup_service.filenames(file_data["key"] for file_data in files)
+        for file_data in files:
+            file_data["filename"] = filenames.get(file_data["key"], file_data["filename"])
+            # List views load the thumbnail rather than the original
+            if os.path.splitext(file_data["key"])[1].lower() in IMAGE_EXTENSIONS:
+                file_data.update(derivative_urls(request, file_data["key"]))
         return files
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/download/{file_key}")
-async def download_file(file_key: str):
+async def download_file(
+    file_key: str,
+    s3_service: S3Service = Depends(deps.s3_service),
+    file_dedup_service: FileDedupService = Depends(deps.file_dedup_service)
+):
     """
     Download a file from S3 storage
     """
     try:
         file_data = await s3_service.download_file(file_key)
+        filenames = await file_dedup_service.filenames([file_key])
         return FileResponse(
             file_data,
             media_type="application/octet-stream",
-            filename=file_key
+            filename=filenames.get(file_key, file_key)
         )
     except Exception as e:
         raise HTTPException(status_code=404, detail="File not found")
 
 @router.delete("/{file_key}")
-async def delete_file(file_key: str):
+@invalidates("files", "file:{file_key}")
+async def delete_file(
+    file_key: str,
+    s3_service: S3Service = Depends(deps.s3_service),
+    file_dedup_service: FileDedupService = Depends(deps.file_dedup_service)
+):
     """
-    Delete a file from S3 storage
+    Delete a file from S3 storage. Content-addressed objects are shared by
+    every upload of the same content and are only deleted with the last one.
     """
     try:
+        # Forgotten first: a failure then leaves an object that a re-upload
+        # overwrites, rather than a record of an object that no longer exists
+        if await file_dedup_service.forget(file_key):
+            # Other uploads of the same content still use the object
+            return {"message": "File deleted successfully"}
         await s3_service.delete_file(file_key)
+        if os.path.splitext(file_key)[1].lower() in IMAGE_EXTENSIONS:
+            for name in DERIVATIVE_SIZES:
+                await s3_service.delete_file(derivative_key(file_key, name))
         return {"message": "File deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=404, detail="File not found")
@@ -107,14 +334,15 @@ async def delete_file(file_key: str):
 
 
 @router.get("/{file_id}")
-async def get_file(file_id: str):
+@cached(ttl=300, tags=["file:{file_id}"])
+async def get_file(file_id: str, s3_service: S3Service = Depends(deps.s3_service)):
     try:
         return await s3_service.get_file_metadata(file_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail="File not found")
 
 @router.delete("/{file_id}")
-async def delete_file_index(file_id: str):
+async def delete_file_index(file_id: str, s3_service: S3Service = Depends(deps.s3_service)):
     try:
         await s3_service.delete_index(file_id)
         return {"message": "File deleted successfully"}
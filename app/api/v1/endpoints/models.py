@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from app.services.model_registry import get_model_registry
+
+router = APIRouter()
+
+@router.get("/")
+async def list_loaded_models():
+    """
+    Embedding models loaded in this worker, with their load time and resident memory.
+    """
+    return get_model_registry().get_stats()
@@ -1,24 +1,44 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, APIRouter
+from fastapi import FastAPI, HTTPException, UploadFile, File, APIRouter, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from app.services.agentic.rag_pipeline_service import RAGPipeline
+from types import ModuleType
+from typing import Any, List, Optional
 from app.schemas.agentic import RAGConfig, RAGResponse, DocumentLoaderConfig
-import boto3
-import aiohttp
+from app.core.config import settings
+import asyncio
+import importlib
+import json
+import logging
 import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# langchain, langgraph and the vector store clients take longer to import than
+# the rest of the app together: the pipeline module is imported off the event
+# loop once the app has started, and the endpoints answer 503 until it is
+RAG_PIPELINE_MODULE = "app.services.agentic.rag_pipeline_service"
 
 router = APIRouter()
+_rag_module: Optional[ModuleType] = None
+_rag_import_task: Optional[asyncio.Task] = None
 # Pydantic models for request bodies
 class TextInput(BaseModel):
     content: str
 
 class WebInput(BaseModel):
-    url: str
+    url: Optional[str] = None
+    urls: Optional[List[str]] = None
     selector: Optional[str] = "p"
+    max_depth: int = 0
+    max_pages: int = 100
 
 class FileInput(BaseModel):
     presigned_url: str
 
+class S3Input(BaseModel):
+    key: str
+
 class QueryRequest(BaseModel):
     question: str
 
@@ -28,18 +48,60 @@ config = RAGConfig(
     embeddings={"provider":"mistralai","model": "mistral-embed"},
     chunking={"chunkSize": 1000, "chunkOverlap": 200},
     vectorStore={"type": "memory"},
-    documentLoader={"type": "web", "webConfig": {"url": "https://lilianweng.github.io/posts/2023-06-23-agent/", "selector": "p"}}
+    documentLoader={"type": "web", "webConfig": {"url": settings.RAG_SOURCE_URL, "selector": "p"}}
 )
-rag_pipeline = None
+
+async def _load_and_start() -> None:
+    global _rag_module
+    if _rag_module is None:
+        try:
+            _rag_module = await asyncio.to_thread(importlib.import_module, RAG_PIPELINE_MODULE)
+        except Exception as e:
+            logger.error(f"Failed to import the RAG pipeline: {str(e)}")
+            return
+    _rag_module.start_rag_pipeline(config)
+
+def start_in_background() -> None:
+    """
+    Import the pipeline module and start initializing the pipeline, unless
+    that is already under way
+    """
+    global _rag_import_task
+    if _rag_module is not None:
+        _rag_module.start_rag_pipeline(config)
+    elif _rag_import_task is None or _rag_import_task.done():
+        _rag_import_task = asyncio.create_task(_load_and_start())
 
 @router.on_event("startup")
 async def startup_event():
-    global rag_pipeline
-    rag_pipeline = RAGPipeline(config)
-    await rag_pipeline.initialize()
+    # Initialize in the background so app boot never waits on the imports,
+    # the corpus, embeddings or the LLM client; /rag/ready reports when it is usable.
+    start_in_background()
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    # Only close a crawler the pipeline may have created
+    web_crawler = sys.modules.get("app.services.agentic.web_crawler")
+    if web_crawler is not None:
+        await web_crawler.get_web_crawler().close()
+
+async def require_rag_pipeline() -> Any:
+    """
+    Dependency returning the shared RAG pipeline, or 503 while it is initializing.
+    """
+    rag_pipeline = _rag_module.get_rag_pipeline() if _rag_module is not None else None
+    if rag_pipeline is None:
+        # Lazily (re)start initialization, e.g. after a failed startup
+        start_in_background()
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline is not ready yet",
+            headers={"Retry-After": "5"}
+        )
+    return rag_pipeline
 
 @router.post("/query", response_model=RAGResponse)
-async def query_pipeline(request: QueryRequest):
+async def query_pipeline(request: QueryRequest, rag_pipeline: Any = Depends(require_rag_pipeline)):
     """
     Query the RAG pipeline with a question.
     """
@@ -49,52 +111,109 @@ async def query_pipeline(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+@router.post("/query/stream")
+async def stream_query_pipeline(request: QueryRequest, rag_pipeline: Any = Depends(require_rag_pipeline)):
+    """
+    Query the RAG pipeline with a question, streaming the response as server-sent events:
+    a `context` event with the retrieved documents, `token` events while the answer is
+    generated, and a final `metadata` event (or an `error` event on failure).
+    """
+    async def event_stream():
+        try:
+            async for event in rag_pipeline.stream_query(request.question):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Query failed: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+async def answer_cache_stats(rag_pipeline: Any = Depends(require_rag_pipeline)):
+    """
+    Hit rates and saved LLM latency of the RAG answer cache.
+    """
+    if rag_pipeline.answer_cache is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "corpusVersion": rag_pipeline.corpus_version,
+        **rag_pipeline.answer_cache.get_stats()
+    }
+
 @router.post("/add/text")
-async def add_text_document(text_input: TextInput):
+async def add_text_document(text_input: TextInput, rag_pipeline: Any = Depends(require_rag_pipeline)):
     """
     Add a text document to the RAG pipeline.
     """
     try:
         doc_config = DocumentLoaderConfig(type="text", textConfig={"content": text_input.content})
-        await rag_pipeline.add_new_documents(doc_config)
-        return {"message": "Text document added successfully"}
+        report = await rag_pipeline.add_new_documents(doc_config)
+        return {"message": "Text document added successfully", "report": report}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add text document: {str(e)}")
 
 @router.post("/add/web")
-async def add_web_document(web_input: WebInput):
+async def add_web_document(web_input: WebInput, rag_pipeline: Any = Depends(require_rag_pipeline)):
     """
-    Add a web document to the RAG pipeline.
+    Add web documents to the RAG pipeline, crawling the given URLs concurrently.
     """
     try:
-        doc_config = DocumentLoaderConfig(type="web", webConfig={"url": web_input.url, "selector": web_input.selector})
-        await rag_pipeline.add_new_documents(doc_config)
-        return {"message": "Web document added successfully"}
+        doc_config = DocumentLoaderConfig(type="web", webConfig={
+            "url": web_input.url,
+            "urls": web_input.urls,
+            "selector": web_input.selector,
+            "maxDepth": web_input.max_depth,
+            "maxPages": web_input.max_pages
+        })
+        report = await rag_pipeline.add_new_documents(doc_config)
+        return {"message": "Web document added successfully", "report": report}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add web document: {str(e)}")
 
 @router.post("/add/file")
-async def add_file_document(file_input: FileInput):
+async def add_file_document(file_input: FileInput, rag_pipeline: Any = Depends(require_rag_pipeline)):
     """
     Add a document from an S3 presigned URL to the RAG pipeline.
     """
     try:
-        # Fetch file content from presigned URL
-        async with aiohttp.ClientSession() as session:
-            async with session.get(file_input.presigned_url) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=400, detail="Failed to fetch file from presigned URL")
-                content = await response.text()
-        
-        doc_config = DocumentLoaderConfig(type="text", textConfig={"content": content})
-        await rag_pipeline.add_new_documents(doc_config)
-        return {"message": "File document added successfully"}
+        # Stream the file from the presigned URL and parse it according to its type
+        doc_config = DocumentLoaderConfig(type="url", urlConfig={"url": file_input.presigned_url})
+        report = await rag_pipeline.add_new_documents(doc_config)
+        return {"message": "File document added successfully", "report": report}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add file document: {str(e)}")
 
+@router.post("/add/s3")
+async def add_s3_document(s3_input: S3Input, rag_pipeline: Any = Depends(require_rag_pipeline)):
+    """
+    Add a document stored in S3 to the RAG pipeline. PDFs, images (via OCR)
+    and text files are detected from their content.
+    """
+    try:
+        doc_config = DocumentLoaderConfig(type="s3", s3Config={"key": s3_input.key})
+        report = await rag_pipeline.add_new_documents(doc_config)
+        return {"message": "S3 document added successfully", "report": report}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add S3 document: {str(e)}")
+
 @router.get("/health")
 async def health_check():
     """
     Health check endpoint to verify API status.
     """
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint: 200 once the RAG pipeline can serve queries, 503 otherwise.
+    """
+    if _rag_module is None:
+        status = {"ready": False, "state": "not_started", "error": None, "attempts": 0, "initSeconds": None}
+    else:
+        status = _rag_module.get_rag_pipeline_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+Admission control of the expensive endpoints: file uploads (OCR and
+embedding), transcription (ffmpeg and Whisper) and RAG queries (LLM).
+
+Each endpoint class runs at most ``limit`` requests at a time; further
+requests wait in a bounded FIFO queue. A request finding the queue full is
+rejected with 429, one that waited longer than ADMISSION_QUEUE_TIMEOUT with
+503, both with a Retry-After estimated from recent service times. Requests
+are admitted before their body is read, so a burst of uploads is not
+buffered only to be rejected.
+
+With ADMISSION_ADAPTIVE, limits follow observed latency (AIMD): a request
+completing within ADMISSION_LATENCY_TOLERANCE times the lowest recent
+latency of its class raises the limit by about one per limit completions,
+a slower one cuts it by 10%, between 1 and twice the configured limit.
+"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Pattern, Tuple
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.core.metrics import LATENCY_BUCKETS
+import asyncio
+import math
+import re
+import time
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot", ["endpoint_class"],
+    buckets=LATENCY_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Requests shed by admission control", ["endpoint_class", "reason"]
+)
+
+# (method, path pattern, endpoint class)
+ENDPOINT_CLASSES: List[Tuple[str, Pattern[str], str]] = [
+    ("POST", re.compile(r"/api/v1/files/upload"), "upload"),
+    ("POST", re.compile(r"/api/v1/consultations/[^/]+/files"), "upload"),
+    ("POST", re.compile(r"/api/v1/consultations/([^/]+/)?transcribe"), "transcribe"),
+    ("POST", re.compile(r"/api/v1/rag/query(/stream)?"), "rag"),
+]
+
+# Decrease factor of the adaptive limit, and completions between re-reads
+# of the no-load latency (so that it follows changes of the workload)
+_BACKOFF = 0.9
+_BASELINE_WINDOW = 500
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue, for one endpoint class.
+    Used from the event loop only, so its state needs no lock.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float,
+                 adaptive: bool = False, latency_tolerance: float = 2.0):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = 1.0
+        self.max_limit = float(limit * 2 if adaptive else limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Smoothed service time, for Retry-After
+        self.service_time = 1.0
+        self._baseline: Optional[float] = None
+        self._samples = 0
+        self._last_backoff = 0.0
+        self._wait_seconds = ADMISSION_WAIT_SECONDS.labels(name)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current concurrency
+        return max(1, min(60, math.ceil(self.service_time * (self.queued + 1) / max(1, int(self.limit)))))
+
+    def _reject(self, status_code: int, reason: str) -> Rejected:
+        ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        return Rejected(status_code, reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._wait_seconds.observe(0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the wait ended: pass it on
+                self._release_slot()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(503, "timeout")
+            raise
+        self._wait_seconds.observe(time.perf_counter() - start)
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """
+        Free a slot; ``latency`` (seconds, of successful requests) feeds
+        the Retry-After estimate and the adaptive limit
+        """
+        if latency is not None:
+            self.service_time += 0.2 * (latency - self.service_time)
+            if self.adaptive:
+                self._adapt(latency)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adapt(self, latency: float) -> None:
+        self._samples += 1
+        if self._baseline is None or latency < self._baseline or self._samples % _BASELINE_WINDOW == 0:
+            self._baseline = latency
+        now = time.monotonic()
+        if latency > self._baseline * self.latency_tolerance:
+            # At most one decrease per service time, so that the requests
+            # admitted under the previous limit do not cut it repeatedly
+            if now - self._last_backoff >= self.service_time:
+                self.limit = max(self.min_limit, self.limit * _BACKOFF)
+                self._last_backoff = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class AdmissionCollector:
+    """Limits, in-flight and queued requests per endpoint class, read at scrape time"""
+
+    def __init__(self, controllers: Dict[str, AdmissionController]):
+        self.controllers = controllers
+
+    def collect(self):
+        gauges = (
+            ("admission_limit", "Concurrent requests admitted per endpoint class", lambda c: int(c.limit)),
+            ("admission_in_flight", "Admitted requests being handled", lambda c: c.in_flight),
+            ("admission_queued", "Requests waiting for admission", lambda c: c.queued),
+        )
+        for name, documentation, value in gauges:
+            family = GaugeMetricFamily(name, documentation, labels=["endpoint_class"])
+            for controller in self.controllers.values():
+                family.add_metric([controller.name], value(controller))
+            yield family
+
+
+def build_controllers() -> Dict[str, AdmissionController]:
+    limits = {
+        "upload": (settings.ADMISSION_UPLOAD_LIMIT, settings.ADMISSION_UPLOAD_QUEUE),
+        "transcribe": (settings.ADMISSION_TRANSCRIBE_LIMIT, settings.ADMISSION_TRANSCRIBE_QUEUE),
+        "rag": (settings.ADMISSION_RAG_LIMIT, settings.ADMISSION_RAG_QUEUE),
+    }
+    return {
+        name: AdmissionController(
+            name, limit, max_queue, settings.ADMISSION_QUEUE_TIMEOUT,
+            adaptive=settings.ADMISSION_ADAPTIVE, latency_tolerance=settings.ADMISSION_LATENCY_TOLERANCE
+        )
+        for name, (limit, max_queue) in limits.items()
+    }
+
+
+def endpoint_class(method: str, path: str) -> Optional[str]:
+    for class_method, pattern, name in ENDPOINT_CLASSES:
+        if method == class_method and pattern.fullmatch(path):
+            return name
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware holding a slot of the request's endpoint class for
+    the whole request, streamed responses included
+    """
+
+    def __init__(self, app, controllers: Dict[str, AdmissionController]):
+        self.app = app
+        self.controllers = controllers
+
+    async def __call__(self, scope, receive, send):
+        name = endpoint_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controllers[name]
+        try:
+            await controller.acquire()
+        except Rejected as e:
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": f"Too many {name} requests, retry later", "reason": e.reason},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Rejected or failed requests say nothing about how long the work takes
+            controller.release(time.perf_counter() - start if status < 400 else None)
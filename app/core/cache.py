@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Thread-safe LRU mapping whose entries expire ``ttl`` seconds after being set.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a live entry and mark it as most recently used
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Insert or replace an entry, evicting the least recently used ones when full
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """
+        Snapshot of the live entries, least recently used first
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                del self._data[key]
+            return [(key, value) for key, (_, value) in self._data.items()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -26,6 +26,12 @@ class Settings(BaseSettings):
     # Search Configuration
     ELASTICSEARCH_URL: str = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
     ELASTICSEARCH_INDEX: str = os.getenv("ELASTICSEARCH_INDEX", "fileverse")
+    # Hybrid (BM25 + kNN) search: legs still running after the budget are dropped
+    HYBRID_SEARCH_BUDGET_MS: int = int(os.getenv("HYBRID_SEARCH_BUDGET_MS", "500"))
+    # Hits ranked per leg before fusion (at least the end of the requested page). Deeper
+    # windows let weak matches present in both legs outrank a strong single-leg match.
+    HYBRID_SEARCH_RANK_WINDOW: int = int(os.getenv("HYBRID_SEARCH_RANK_WINDOW", "10"))
+    HYBRID_SEARCH_RRF_K: int = int(os.getenv("HYBRID_SEARCH_RRF_K", "60"))
     
     # Security Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -34,14 +40,95 @@ class Settings(BaseSettings):
     # OCR Configuration
     ENABLE_OCR: bool = os.getenv("ENABLE_OCR", "true").lower() == "true"
     OCR_LANGUAGE: str = os.getenv("OCR_LANGUAGE", "eng")
+    # Images are downsampled to this resolution, and to at most this many pixels
+    # (A4 at 300 DPI), before OCR
+    OCR_TARGET_DPI: int = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_MAX_PIXELS: int = int(os.getenv("OCR_MAX_PIXELS", str(2480 * 3508)))
+    # Taller images are split into strips of about this height, OCR'd in parallel
+    OCR_TILE_HEIGHT: int = int(os.getenv("OCR_TILE_HEIGHT", "1200"))
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "0"))  # 0 = one per CPU
+    # Skip OCR of images the ink/separability heuristic finds to have no text.
+    # Off until measured on real scans (python -m benchmarks.ocr_preprocessing
+    # --fixtures ...): a false "no text" drops a scan's text from the index
+    OCR_SKIP_NON_TEXT: bool = os.getenv("OCR_SKIP_NON_TEXT", "false").lower() == "true"
+    PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", "0"))  # 0 = one per CPU
+    # Per-document caps on PDF processing
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "500"))
+    PDF_MAX_OCR_PAGES: int = int(os.getenv("PDF_MAX_OCR_PAGES", "50"))
+    PDF_MAX_TEXT_CHARS: int = int(os.getenv("PDF_MAX_TEXT_CHARS", "2000000"))
+
+    # Background processing of uploads (OCR, PDF text, embedding, indexing)
+    UPLOAD_JOB_EXTRACT_WORKERS: int = int(os.getenv("UPLOAD_JOB_EXTRACT_WORKERS", "2"))
+    UPLOAD_JOB_INDEX_WORKERS: int = int(os.getenv("UPLOAD_JOB_INDEX_WORKERS", "2"))
+    # Queued jobs holding their file in memory; later ones re-read it from S3
+    UPLOAD_JOB_MEMORY_QUEUE: int = int(os.getenv("UPLOAD_JOB_MEMORY_QUEUE", "32"))
+    UPLOAD_JOB_MAX_ATTEMPTS: int = int(os.getenv("UPLOAD_JOB_MAX_ATTEMPTS", "3"))  # per stage
+    UPLOAD_JOB_RETRY_DELAY: float = float(os.getenv("UPLOAD_JOB_RETRY_DELAY", "2.0"))  # doubled on each retry
+    # Worker processes renew the jobs they hold this often, and take over
+    # unfinished jobs not renewed for UPLOAD_JOB_STALE_SECONDS
+    UPLOAD_JOB_HEARTBEAT_SECONDS: float = float(os.getenv("UPLOAD_JOB_HEARTBEAT_SECONDS", "30"))
+    UPLOAD_JOB_STALE_SECONDS: float = float(os.getenv("UPLOAD_JOB_STALE_SECONDS", "120"))
+    # POSTed the job status when a file becomes searchable or fails
+    UPLOAD_JOB_WEBHOOK_URL: str = os.getenv("UPLOAD_JOB_WEBHOOK_URL", "")
+
+    # Image derivatives (WebP thumbnails and previews)
+    IMAGE_DERIVATIVES_ENABLED: bool = os.getenv("IMAGE_DERIVATIVES_ENABLED", "true").lower() == "true"
+    IMAGE_DERIVATIVE_WORKERS: int = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", "2"))  # 0 = one per CPU
+    IMAGE_DERIVATIVE_QUALITY: int = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
     
+    # Admission control of uploads, transcriptions and RAG queries: concurrent
+    # requests per class, requests waiting beyond that (429 when full) and how
+    # long they may wait (503 after)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_UPLOAD_LIMIT: int = int(os.getenv("ADMISSION_UPLOAD_LIMIT", "4"))
+    ADMISSION_UPLOAD_QUEUE: int = int(os.getenv("ADMISSION_UPLOAD_QUEUE", "16"))
+    ADMISSION_TRANSCRIBE_LIMIT: int = int(os.getenv("ADMISSION_TRANSCRIBE_LIMIT", "2"))
+    ADMISSION_TRANSCRIBE_QUEUE: int = int(os.getenv("ADMISSION_TRANSCRIBE_QUEUE", "8"))
+    ADMISSION_RAG_LIMIT: int = int(os.getenv("ADMISSION_RAG_LIMIT", "8"))
+    ADMISSION_RAG_QUEUE: int = int(os.getenv("ADMISSION_RAG_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    # Adapt limits to latency (AIMD) up to twice the configured ones
+    ADMISSION_ADAPTIVE: bool = os.getenv("ADMISSION_ADAPTIVE", "false").lower() == "true"
+    ADMISSION_LATENCY_TOLERANCE: float = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+
+    # Logging: JSON lines (or "text") written off the request path by a queue listener
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Per-logger overrides, e.g. "app.services.transcription_service=DEBUG,elastic_transport=WARNING"
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped
+    # Share of DEBUG records kept
+    LOG_DEBUG_SAMPLE_RATIO: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATIO", "0.1"))
+    # Record fields (``extra``) replaced by their length; empty to log them verbatim
+    LOG_REDACT_FIELDS: str = os.getenv("LOG_REDACT_FIELDS", "transcript")
+
+    # Prometheus metrics on /metrics (set PROMETHEUS_MULTIPROC_DIR with several workers)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # OpenTelemetry tracing: "otlp" (HTTP collector), "file" (JSON lines) or "console"
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "otlp")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_FILE_PATH: str = os.getenv("TRACING_FILE_PATH", "data/traces.jsonl")
+    # Share of new traces recorded; requests carrying a sampled traceparent are always recorded
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "0.05"))
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "file-management-api")
+
     # Cache Configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    # Response cache of read endpoints: "auto" uses Redis when reachable and
+    # falls back to an in-process LRU, "redis" and "memory" force one of them
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "auto")
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
 
     # Chat models API keys
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "your-openai-api-key")
     XAI_API_KEY: str = os.getenv("XAI_API_KEY", "your-xai-api-key")
     MISTRAL_API_KEY: str = os.getenv("MISTRAL_API_KEY", "your-mistral-api-key")
+    # Mistral-compatible API (chat and embeddings), e.g. a local stand-in; empty for api.mistral.ai
+    MISTRAL_BASE_URL: str = os.getenv("MISTRAL_BASE_URL", "")
     
     # LangSmith Configuration
     LANGSMITH_TRACING: str = os.getenv("LANGSMITH_TRACING", "false")
@@ -56,8 +143,54 @@ class Settings(BaseSettings):
     
     # Search and chat models
     SEMANTIC_SEARCH_MODEL: str = os.getenv("SEMANTIC_SEARCH_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # "huggingface" (PyTorch), "onnx" (int8 ONNX Runtime export of the same model)
+    # or "mistralai" (API, see MISTRAL_BASE_URL)
+    SEMANTIC_SEARCH_PROVIDER: str = os.getenv("SEMANTIC_SEARCH_PROVIDER", "huggingface")
+    # Output size of SEMANTIC_SEARCH_MODEL, used for the dense_vector mapping
+    SEMANTIC_SEARCH_DIMS: int = int(os.getenv("SEMANTIC_SEARCH_DIMS", "384"))
+    # Files are embedded per overlapping passage; all-MiniLM-L6-v2 truncates at 256 word pieces
+    SEMANTIC_PASSAGE_WORDS: int = int(os.getenv("SEMANTIC_PASSAGE_WORDS", "150"))
+    SEMANTIC_PASSAGE_OVERLAP: int = int(os.getenv("SEMANTIC_PASSAGE_OVERLAP", "30"))
+    SEMANTIC_MAX_PASSAGES: int = int(os.getenv("SEMANTIC_MAX_PASSAGES", "200"))
+    SEMANTIC_EMBED_BATCH_SIZE: int = int(os.getenv("SEMANTIC_EMBED_BATCH_SIZE", "32"))
+    SEMANTIC_QUERY_CACHE_SIZE: int = int(os.getenv("SEMANTIC_QUERY_CACHE_SIZE", "4096"))
+    SEMANTIC_QUERY_CACHE_TTL: int = int(os.getenv("SEMANTIC_QUERY_CACHE_TTL", "86400"))
+    # Share one embedding and one ES request between identical concurrent searches
+    SEMANTIC_SEARCH_COALESCE: bool = os.getenv("SEMANTIC_SEARCH_COALESCE", "true").lower() == "true"
     HUGGINGFACEHUB_API_TOKEN: str = os.getenv("HUGGINGFACEHUB_API_TOKEN", "")
-    
+    # Comma-separated "provider:model" pairs loaded at import time (before a pre-fork server forks)
+    PRELOAD_EMBEDDING_MODELS: str = os.getenv("PRELOAD_EMBEDDING_MODELS", "")
+
+    # ONNX Runtime embeddings Configuration
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "data/onnx")
+    ONNX_BATCH_SIZE: int = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+    ONNX_MAX_LENGTH: int = int(os.getenv("ONNX_MAX_LENGTH", "256"))
+    ONNX_INTRA_OP_THREADS: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+
+    # RAG pipeline Configuration
+    # Web page crawled into the RAG corpus
+    RAG_SOURCE_URL: str = os.getenv("RAG_SOURCE_URL", "https://lilianweng.github.io/posts/2023-06-23-agent/")
+    RAG_SNAPSHOT_DIR: str = os.getenv("RAG_SNAPSHOT_DIR", "data/rag")
+    RAG_INIT_MAX_RETRIES: int = int(os.getenv("RAG_INIT_MAX_RETRIES", "5"))
+    RAG_INIT_RETRY_DELAY: float = float(os.getenv("RAG_INIT_RETRY_DELAY", "2.0"))
+    RAG_CACHE_ENABLED: bool = os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true"
+    RAG_CACHE_MAX_ENTRIES: int = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "512"))
+    RAG_CACHE_TTL_SECONDS: float = float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+    RAG_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("RAG_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    RAG_RETRIEVAL_THREADS: int = int(os.getenv("RAG_RETRIEVAL_THREADS", "8"))
+    RAG_EMBED_BATCH_SIZE: int = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+    RAG_EMBED_BATCH_WAIT_MS: float = float(os.getenv("RAG_EMBED_BATCH_WAIT_MS", "5"))
+    RAG_INGEST_BATCH_SIZE: int = int(os.getenv("RAG_INGEST_BATCH_SIZE", "64"))
+    RAG_INGEST_EMBED_WORKERS: int = int(os.getenv("RAG_INGEST_EMBED_WORKERS", "2"))
+    RAG_INGEST_QUEUE_SIZE: int = int(os.getenv("RAG_INGEST_QUEUE_SIZE", "8"))
+
+    # Web crawler Configuration
+    CRAWLER_MAX_CONCURRENCY: int = int(os.getenv("CRAWLER_MAX_CONCURRENCY", "10"))
+    CRAWLER_PER_HOST_CONCURRENCY: int = int(os.getenv("CRAWLER_PER_HOST_CONCURRENCY", "2"))
+    CRAWLER_PER_HOST_INTERVAL: float = float(os.getenv("CRAWLER_PER_HOST_INTERVAL", "0.5"))
+    CRAWLER_TIMEOUT: float = float(os.getenv("CRAWLER_TIMEOUT", "30"))
+    CRAWLER_USER_AGENT: str = os.getenv("CRAWLER_USER_AGENT", "ReachyAI-RAG-Crawler/1.0")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
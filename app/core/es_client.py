@@ -0,0 +1,24 @@
+"""
+Elasticsearch client timing and tracing every request. Kept apart from
+app.core.metrics so that importing the metrics does not import the
+Elasticsearch client and its HTTP stack.
+"""
+from typing import Optional
+from elasticsearch import AsyncElasticsearch
+from opentelemetry.trace import SpanKind
+from app.core.metrics import ES_ERRORS, ES_REQUEST_SECONDS, track
+from app.core.tracing import tracer
+
+
+class InstrumentedAsyncElasticsearch(AsyncElasticsearch):
+    """
+    AsyncElasticsearch timing and tracing every request by API endpoint
+    (search, index, ...). Clients derived with ``options()`` keep the
+    instrumentation.
+    """
+
+    async def perform_request(self, method: str, path: str, *, endpoint_id: Optional[str] = None, **kwargs):
+        endpoint = endpoint_id or "other"
+        with tracer.start_as_current_span(f"elasticsearch.{endpoint}", kind=SpanKind.CLIENT), \
+                track(ES_REQUEST_SECONDS, ES_ERRORS, endpoint):
+            return await super().perform_request(method, path, endpoint_id=endpoint_id, **kwargs)
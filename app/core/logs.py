@@ -0,0 +1,187 @@
+"""
+Logging setup: structured records written off the request path.
+
+Loggers hand records to a QueueHandler, which only puts them on an in-memory
+queue; a QueueListener thread formats them (JSON lines by default) and writes
+them to stderr. When the queue is full, records are dropped and counted
+rather than blocking the request.
+
+Records pass three filters before being queued:
+
+- DEBUG records are sampled (LOG_DEBUG_SAMPLE_RATIO), so that per-request
+  debug events can stay enabled under load; kept ones carry ``sample_rate``.
+- Fields passed as ``extra`` that are listed in LOG_REDACT_FIELDS
+  (``transcript`` by default) are replaced by their length. Sensitive content
+  should be logged through such fields, never interpolated into the message.
+- The current trace and span ids are attached, to correlate logs with traces.
+
+    logger.debug("Transcription received", extra={"transcript": transcript})
+"""
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from opentelemetry import trace
+from app.core.config import settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Client libraries logging every request at INFO; LOG_LEVELS can lower them
+LIBRARY_LEVELS = {"httpx": "WARNING", "elastic_transport": "WARNING"}
+
+# Attributes every LogRecord has; anything else was passed as ``extra``
+# (uvicorn's ANSI-coloured copy of its messages is dropped too)
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "color_message"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with ``extra`` fields as top-level keys
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of DEBUG records; other levels always pass
+    """
+
+    def __init__(self, ratio: float):
+        super().__init__()
+        self.ratio = ratio
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.ratio >= 1:
+            return True
+        if random.random() >= self.ratio:
+            return False
+        record.sample_rate = self.ratio
+        return True
+
+
+class RedactionFilter(logging.Filter):
+    """
+    Replace sensitive ``extra`` fields by their length
+    """
+
+    def __init__(self, fields):
+        super().__init__()
+        self.fields = frozenset(fields)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field in self.fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                setattr(record, field, f"[redacted, {len(str(value))} chars]")
+        return True
+
+
+class TraceContextFilter(logging.Filter):
+    """
+    Attach the ids of the span current when the record was made; the
+    listener thread formatting it no longer has that context
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            record.trace_id = format(span_context.trace_id, "032x")
+            record.span_id = format(span_context.span_id, "016x")
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records when the queue is full instead of
+    reporting an error for each
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting, including tracebacks, is left to the listener; only the
+        # message is resolved now, as its arguments may change after the call
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    Parse "logger=LEVEL,other.logger=LEVEL" into a mapping
+    """
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """
+    Route every logger, uvicorn's included, through the queue, once per process
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(settings.LOG_DEBUG_SAMPLE_RATIO))
+    redacted = [field.strip() for field in settings.LOG_REDACT_FIELDS.split(",") if field.strip()]
+    if redacted:
+        handler.addFilter(RedactionFilter(redacted))
+    handler.addFilter(TraceContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # uvicorn installs its own stream handlers before importing the app; a
+    # logger without any (e.g. access logs with --no-access-log) stays silent
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+    for name, level in {**LIBRARY_LEVELS, **parse_levels(settings.LOG_LEVELS)}.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
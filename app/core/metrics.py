@@ -0,0 +1,240 @@
+"""
+Prometheus metrics: per-route request latency and in-flight requests from an
+ASGI middleware, plus the latency and errors of what requests wait on
+(database pool, S3, Elasticsearch, embedding models, transcription and the
+RAG retrieve and generate stages).
+
+Exposed in the Prometheus text format on /metrics. With several worker
+processes, set PROMETHEUS_MULTIPROC_DIR so that every worker writes its
+samples there and /metrics aggregates them.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+import os
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+HTTP_REQUEST_SECONDS_DOC = "HTTP request latency, to the end of the response body"
+HTTP_REQUESTS_IN_FLIGHT_DOC = "HTTP requests being handled"
+S3_REQUEST_SECONDS = Histogram(
+    "s3_request_duration_seconds", "S3 API call latency", ["operation"], buckets=LATENCY_BUCKETS
+)
+S3_ERRORS = Counter("s3_errors_total", "Failed S3 API calls", ["operation"])
+ES_REQUEST_SECONDS = Histogram(
+    "elasticsearch_request_duration_seconds", "Elasticsearch request latency", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+ES_ERRORS = Counter("elasticsearch_errors_total", "Failed Elasticsearch requests", ["endpoint"])
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size", "Texts per embedding model call", ["model"], buckets=BATCH_SIZE_BUCKETS
+)
+EMBEDDING_SECONDS = Histogram(
+    "embedding_duration_seconds", "Embedding model call latency", ["model"], buckets=LATENCY_BUCKETS
+)
+TRANSCRIPTION_SECONDS = Histogram(
+    "transcription_duration_seconds", "Transcription latency, including audio conversion", buckets=LATENCY_BUCKETS
+)
+TRANSCRIPTION_ERRORS = Counter("transcription_errors_total", "Failed transcriptions")
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "RAG pipeline stage latency", ["stage"], buckets=LATENCY_BUCKETS
+)
+RAG_QUERIES = Counter("rag_queries_total", "RAG queries by answer cache outcome", ["cache"])
+UPLOAD_JOB_STAGE_SECONDS = Histogram(
+    "upload_job_stage_duration_seconds", "Upload processing stage latency", ["stage"], buckets=LATENCY_BUCKETS
+)
+UPLOAD_JOB_STAGE_ERRORS = Counter("upload_job_stage_errors_total", "Failed upload processing stage attempts", ["stage"])
+UPLOAD_JOBS_FINISHED = Counter("upload_jobs_finished_total", "Upload processing jobs finished", ["status"])
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Collectors of this process's state (e.g. the database pool), which the
+# multiprocess collector does not aggregate
+_process_collectors: List[Any] = []
+
+
+class RequestMetricsCollector:
+    """
+    HTTP request latency histogram and in-flight count, updated by the
+    middleware on the event loop thread only and therefore kept in plain
+    Python counters: the locks of prometheus_client metrics cost more than
+    the rest of the instrumentation on a fast route. Exported at scrape time.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # (method, route, status) -> per-bucket counts (the last one +Inf), then the sum
+        self.series: Dict[Tuple[str, str, str], List[float]] = {}
+        self.in_flight = 0
+
+    def observe(self, key: Tuple[str, str, str], seconds: float) -> None:
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def collect(self):
+        histogram = HistogramMetricFamily(
+            "http_request_duration_seconds", HTTP_REQUEST_SECONDS_DOC, labels=["method", "route", "status"]
+        )
+        for key, series in list(self.series.items()):
+            cumulative, buckets = 0, []
+            for bound, count in zip((*map(str, self.buckets), "+Inf"), series[:-1]):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            histogram.add_metric(list(key), buckets, sum_value=series[-1])
+        yield histogram
+        yield GaugeMetricFamily("http_requests_in_flight", HTTP_REQUESTS_IN_FLIGHT_DOC, value=self.in_flight)
+
+
+if MULTIPROCESS:
+    # Samples must go through prometheus_client to be shared between workers
+    HTTP_REQUEST_SECONDS = Histogram(
+        "http_request_duration_seconds", HTTP_REQUEST_SECONDS_DOC, ["method", "route", "status"], buckets=LATENCY_BUCKETS
+    )
+    HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", HTTP_REQUESTS_IN_FLIGHT_DOC, multiprocess_mode="livesum")
+    REQUEST_METRICS = None
+else:
+    REQUEST_METRICS = RequestMetricsCollector()
+    REGISTRY.register(REQUEST_METRICS)
+
+
+@contextmanager
+def track(histogram: Histogram, errors: Optional[Counter] = None, *labels: str) -> Iterator[None]:
+    """
+    Time a block into ``histogram``, counting it in ``errors`` if it raises
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            (errors.labels(*labels) if labels else errors).inc()
+        raise
+    finally:
+        (histogram.labels(*labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task and stream overhead)
+    recording the latency of every request by method, route template and
+    status, and the number of requests in flight
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Labelled children, resolved once per (method, route, status)
+        self._children: Dict[Tuple[str, str, str], Any] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        metrics = REQUEST_METRICS
+        if metrics is not None:
+            metrics.in_flight += 1
+        else:
+            HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Set by the router on the shared scope; the template rather than
+            # the path keeps the label cardinality bounded
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched", status)
+            if metrics is not None:
+                metrics.in_flight -= 1
+                metrics.observe(key, elapsed)
+            else:
+                HTTP_REQUESTS_IN_FLIGHT.dec()
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = HTTP_REQUEST_SECONDS.labels(*key)
+                child.observe(elapsed)
+
+
+class DBPoolCollector:
+    """Connection pool state of a SQLAlchemy engine, read at scrape time"""
+
+    GAUGES = (
+        ("db_pool_size", "size", "Connections the pool keeps open"),
+        ("db_pool_checked_out", "checkedout", "Connections in use"),
+        ("db_pool_checked_in", "checkedin", "Idle connections in the pool"),
+        ("db_pool_overflow", "overflow", "Connections open beyond the pool size"),
+    )
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        for name, method, documentation in self.GAUGES:
+            # Not every pool class tracks every figure (StaticPool has none,
+            # SingletonThreadPool's size is a plain attribute)
+            figure = getattr(pool, method, None)
+            if callable(figure):
+                yield GaugeMetricFamily(name, documentation, value=figure())
+
+
+def register_process_collector(collector: Any) -> None:
+    _process_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    The metrics of this process, or of every worker in multiprocess mode,
+    with their content type
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _process_collectors:
+        registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def instrument_s3_client(client) -> None:
+    """
+    Time every API call of a boto3 S3 client through its event hooks, by
+    operation (PutObject, HeadObject, ...)
+    """
+    def before_call(model, context, **kwargs):
+        context["metrics_operation"] = model.name
+        context["metrics_start"] = time.perf_counter()
+
+    def after_call(http_response, context, **kwargs):
+        operation = context.get("metrics_operation", "unknown")
+        S3_REQUEST_SECONDS.labels(operation).observe(time.perf_counter() - context.get("metrics_start", time.perf_counter()))
+        if http_response.status_code >= 400:
+            S3_ERRORS.labels(operation).inc()
+
+    def after_call_error(context, **kwargs):
+        # Connection errors and timeouts: no HTTP response
+        operation = context.get("metrics_operation", "unknown")
+        S3_REQUEST_SECONDS.labels(operation).observe(time.perf_counter() - context.get("metrics_start", time.perf_counter()))
+        S3_ERRORS.labels(operation).inc()
+
+    client.meta.events.register("before-call.s3", before_call)
+    client.meta.events.register("after-call.s3", after_call)
+    client.meta.events.register("after-call-error.s3", after_call_error)
+
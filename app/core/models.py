@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
@@ -75,3 +75,32 @@ class AlertDB(Base):
     severity = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     resolved_at = Column(DateTime)
+
+class FileObjectDB(Base):
+    __tablename__ = "file_objects"
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    s3_key = Column(String, nullable=False)
+    content_type = Column(String)
+    size = Column(BigInteger, nullable=False)
+    file_metadata = Column("metadata", JSON)  # process_file output, reused on duplicate uploads
+    processing_seconds = Column(Float, default=0.0)  # OCR, embedding and upload time of the first upload
+    upload_count = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_uploaded_at = Column(DateTime, default=datetime.utcnow)
+
+class FileJobDB(Base):
+    __tablename__ = "file_jobs"
+    id = Column(String(32), primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    s3_key = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    status = Column(String, nullable=False, default="queued", index=True)  # 'queued', 'processing', 'indexed' or 'failed'
+    stage = Column(String)  # pipeline stage running or last run: 'extract' or 'index'
+    attempts = Column(Integer, default=0)  # of the current stage
+    error = Column(Text)
+    owner = Column(String(32))  # worker process holding the job, renewing updated_at while it does
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime)
@@ -0,0 +1,310 @@
+"""
+Response cache for read-heavy GET endpoints, in Redis or, when Redis is not
+available, an in-process LRU.
+
+Cached responses are stored as their serialized JSON body with an ETag, so
+hits skip the database or S3 call and the serialization, and clients that
+send ``If-None-Match`` get a ``304 Not Modified``.
+
+Invalidation is by tag generation: every cached response is keyed by the
+current generation of its tags (e.g. ``consultation:42``), and write paths
+bump the generation of the tags they affect. Stale entries are never read
+again and expire with their TTL, so invalidation is a single INCR rather
+than a scan of the keyspace. With the in-process backend, invalidation only
+reaches the worker that handled the write, so TTLs bound the staleness seen
+by the others.
+
+    @router.get("/{consultation_id}", response_model=ConsultationResponse)
+    @cached(ttl=30, tags=["consultation:{consultation_id}"], response_model=ConsultationResponse)
+    def get_consultation(consultation_id: int, db: Session = Depends(get_db)):
+        ...
+
+    @router.put("/{consultation_id}", response_model=ConsultationResponse)
+    @invalidates("consultation:{consultation_id}", "consultations")
+    def update_consultation(consultation_id: int, ...):
+        ...
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from app.core.cache import TTLCache
+from app.core.config import settings
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Clients revalidate on every use (cheap with ETags), since entries are
+# invalidated server-side on writes
+CACHE_CONTROL = "private, no-cache"
+REQUEST_PARAM = "_cache_request"
+
+
+class MemoryBackend:
+    """In-process LRU of responses, with local tag generations"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self.entries = TTLCache(maxsize, settings.RESPONSE_CACHE_TTL)
+        self.generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        self.entries.set(key, entry, ttl)
+
+    async def get_generations(self, tags: Sequence[str]) -> List[int]:
+        return [self.generations.get(tag, 0) for tag in tags]
+
+    async def bump(self, tags: Sequence[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Responses and tag generations shared by every worker through Redis"""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "response-cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.client.get(f"{self.prefix}entry:{key}")
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        await self.client.set(f"{self.prefix}entry:{key}", json.dumps(entry), ex=ttl)
+
+    async def get_generations(self, tags: Sequence[str]) -> List[int]:
+        if not tags:
+            return []
+        values = await self.client.mget([f"{self.prefix}gen:{tag}" for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def bump(self, tags: Sequence[str]) -> None:
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for tag in tags:
+                pipeline.incr(f"{self.prefix}gen:{tag}")
+            await pipeline.execute()
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as for GET requests
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self):
+        self._backend = None
+        self._backend_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def backend(self):
+        """
+        Connect on first use: Redis when configured and reachable, otherwise
+        the in-process LRU
+        """
+        if self._backend is not None:
+            return self._backend
+        async with self._backend_lock:
+            if self._backend is None:
+                self._backend = await self._connect()
+        return self._backend
+
+    async def _connect(self):
+        if settings.RESPONSE_CACHE_BACKEND != "memory":
+            try:
+                import redis.asyncio as redis
+                client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+                await client.ping()
+                logger.info(f"Response cache using Redis at {settings.REDIS_URL}")
+                return RedisBackend(client)
+            except Exception as e:
+                if settings.RESPONSE_CACHE_BACKEND == "redis":
+                    raise Exception(f"Error connecting to the response cache: {str(e)}")
+                logger.warning(f"Redis unavailable ({str(e)}), response cache is in-process only")
+        return MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+    async def _key(self, backend, request: Request, tags: Sequence[str]) -> str:
+        generations = await backend.get_generations(tags)
+        query = "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+        versions = ",".join(f"{tag}@{generation}" for tag, generation in zip(tags, generations))
+        return hashlib.sha1(f"{request.url.path}?{query}|{versions}".encode()).hexdigest()
+
+    async def lookup(self, request: Request, tags: Sequence[str]):
+        """
+        The cache key of a request and its cached entry, if any. Backend
+        errors are logged and treated as misses.
+        """
+        try:
+            backend = await self.backend()
+            key = await self._key(backend, request, tags)
+            return key, await backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error reading the response cache: {str(e)}")
+            return None, None
+
+    async def store(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        try:
+            await (await self.backend()).set(key, entry, ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error writing the response cache: {str(e)}")
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        Invalidate every cached response tagged with any of ``tags``
+        """
+        try:
+            await (await self.backend()).bump(tags)
+            self.invalidations += len(tags)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error invalidating the response cache for {tags}: {str(e)}")
+
+    def respond(self, request: Request, entry: Dict[str, Any], status: str) -> Response:
+        headers = {"ETag": entry["etag"], "Cache-Control": CACHE_CONTROL, "X-Cache": status}
+        if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self._backend.name if self._backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "notModified": self.not_modified,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def _with_request_param(fn: Callable, wrapper: Callable) -> Optional[str]:
+    """
+    Give ``wrapper`` the signature of ``fn`` plus a Request parameter (unless
+    it has one), so FastAPI injects the request. Returns the name of the
+    request parameter that was added.
+    """
+    signature = inspect.signature(fn)
+    for parameter in signature.parameters.values():
+        if parameter.annotation is Request:
+            wrapper.__signature__ = signature
+            return None
+    request_parameter = inspect.Parameter(REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request_parameter])
+    return REQUEST_PARAM
+
+
+async def _call(fn: Callable, kwargs: Dict[str, Any]) -> Any:
+    if inspect.iscoroutinefunction(fn):
+        return await fn(**kwargs)
+    # Sync endpoints (database access) stay off the event loop
+    return await run_in_threadpool(fn, **kwargs)
+
+
+def _request_of(kwargs: Dict[str, Any], added: Optional[str]) -> Request:
+    if added:
+        return kwargs.pop(added)
+    return next(value for value in kwargs.values() if isinstance(value, Request))
+
+
+def cached(ttl: Optional[int] = None, tags: Sequence[str] = (), response_model: Any = None):
+    """
+    Cache the JSON response of a GET endpoint for ``ttl`` seconds.
+
+    ``tags`` are format strings over the endpoint's parameters (e.g.
+    ``"consultation:{consultation_id}"``) naming what the response depends
+    on. ``response_model`` serializes the endpoint's return value the way
+    the route's response_model would (needed for ORM objects).
+    """
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            request = _request_of(kwargs, added)
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return await _call(fn, kwargs)
+
+            cache = get_response_cache()
+            entry_tags = [tag.format(**kwargs) for tag in tags]
+            key, entry = await cache.lookup(request, entry_tags)
+            if entry is not None:
+                cache.hits += 1
+                return cache.respond(request, entry, "HIT")
+            cache.misses += 1
+
+            result = await _call(fn, kwargs)
+            if isinstance(result, Response):
+                return result
+            if adapter is not None:
+                body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+            else:
+                body = json.dumps(jsonable_encoder(result)).encode()
+            entry = {"etag": make_etag(body), "body": body.decode()}
+            if key is not None:
+                await cache.store(key, entry, ttl or settings.RESPONSE_CACHE_TTL)
+            return cache.respond(request, entry, "MISS")
+
+        added = _with_request_param(fn, wrapper)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags: str):
+    """
+    Invalidate cached responses tagged with ``tags`` (format strings over the
+    endpoint's parameters) once the decorated write endpoint has run, also
+    when it fails part way, since it may have committed some changes
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            try:
+                return await _call(fn, kwargs)
+            finally:
+                await get_response_cache().invalidate(*(tag.format(**kwargs) for tag in tags))
+
+        wrapper.__signature__ = inspect.signature(fn)
+        return wrapper
+    return decorator
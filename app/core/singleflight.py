@@ -0,0 +1,49 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls with the same key: the first caller runs
+    the function, later callers arriving while it is in flight await the same
+    result instead of running it again.
+
+    The shared call runs as its own task, so a caller that is cancelled (e.g.
+    a client disconnecting) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def coalesced(self) -> int:
+        return self.calls - self.executions
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "inFlight": len(self._inflight),
+        }
@@ -0,0 +1,182 @@
+"""
+OpenTelemetry tracing of requests and of the work they fan out to (file
+processing, S3, embeddings, Elasticsearch, transcription, RAG stages).
+
+Spans are recorded only when TRACING_ENABLED is set; otherwise the tracer is
+OpenTelemetry's no-op and instrumented code pays for little more than a
+function call. Traces are sampled at the root by TRACING_SAMPLE_RATIO, and
+requests carrying a ``traceparent`` header follow the caller's decision.
+
+Exporters: ``otlp`` batches spans to a collector over HTTP (needs the
+``tracing`` extra), ``file`` writes one JSON span per line (for tests and
+local runs) and ``console`` prints them.
+
+    @traced("s3.get_object", {"s3.key": "file_key"})
+    async def get_object(self, file_key: str) -> dict:
+        ...
+"""
+from typing import Any, Callable, Dict, Optional
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from app.core.config import settings
+import functools
+import importlib.util
+import inspect
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("app")
+
+# Recent FastAPI releases trace requests themselves (server, dependency and
+# endpoint spans) whenever OpenTelemetry is installed; TracingMiddleware is
+# only needed with older ones
+NATIVE_FASTAPI_TELEMETRY = importlib.util.find_spec("fastapi.telemetry") is not None
+
+_configured = False
+
+
+def _exporter():
+    if settings.TRACING_EXPORTER == "file":
+        directory = os.path.dirname(settings.TRACING_FILE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        out = open(settings.TRACING_FILE_PATH, "a", buffering=1)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if settings.TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("OTLP exporter not installed (pip install .[tracing]), traces are not exported")
+            return None
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    logger.warning(f"Unknown TRACING_EXPORTER {settings.TRACING_EXPORTER!r}, traces are not exported")
+    return None
+
+
+def configure_tracing() -> None:
+    """
+    Install the tracer provider, once per process, when tracing is enabled
+    """
+    global _configured
+    if _configured or not settings.TRACING_ENABLED:
+        return
+    _configured = True
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    exporter = _exporter()
+    if exporter is not None:
+        # Files and the console are written as spans end, so that they can be
+        # read back straight away; the collector gets batches off the request path
+        processor = BatchSpanProcessor(exporter) if settings.TRACING_EXPORTER == "otlp" else SimpleSpanProcessor(exporter)
+        provider.add_span_processor(processor)
+    trace.set_tracer_provider(provider)
+    logger.info(
+        f"Tracing to {settings.TRACING_EXPORTER}, sampling {settings.TRACING_SAMPLE_RATIO:.0%} of new traces"
+    )
+
+
+def _attribute(value: Any) -> Any:
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+def mark_error(exception: BaseException) -> None:
+    """
+    Record a handled exception on the current span, for code that catches
+    its errors rather than letting them end the span
+    """
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.record_exception(exception)
+        span.set_status(Status(StatusCode.ERROR, str(exception)))
+
+
+def traced(name: str, attributes: Optional[Dict[str, str]] = None):
+    """
+    Run the decorated function (sync or async) in a span. ``attributes`` maps
+    span attribute names to the names of the parameters they are taken from;
+    they are only read when the span is sampled.
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        def start(args, kwargs):
+            span = tracer.start_span(name)
+            if attributes and span.is_recording():
+                arguments = signature.bind(*args, **kwargs).arguments
+                for attribute, parameter in attributes.items():
+                    if arguments.get(parameter) is not None:
+                        span.set_attribute(attribute, _attribute(arguments[parameter]))
+            return span
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with trace.use_span(start(args, kwargs), end_on_exit=True):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with trace.use_span(start(args, kwargs), end_on_exit=True):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware starting a server span per HTTP request, named after
+    the route template, and continuing the caller's trace when the request
+    carries a ``traceparent`` header
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        span = tracer.start_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        )
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = context.attach(trace.set_span_in_context(span))
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            context.detach(token)
+            if span.is_recording():
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
+                span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+            span.end()
@@ -1,6 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
+from app.core.admission import AdmissionCollector, AdmissionMiddleware, build_controllers
+from app.core.config import settings
+from app.core.db import engine
+from app.core.logs import configure_logging
+from app.core.metrics import DBPoolCollector, PrometheusMiddleware, register_process_collector, render_metrics
+from app.core.tracing import NATIVE_FASTAPI_TELEMETRY, TracingMiddleware, configure_tracing
+
+configure_logging()
+configure_tracing()
+
+# Load configured models at import time so pre-forked workers share them;
+# without any, the embedding libraries are only imported on first use
+if settings.PRELOAD_EMBEDDING_MODELS.strip():
+    from app.services.model_registry import preload_configured_models
+    preload_configured_models()
 
 app = FastAPI(
     title="Intelligent File Management System",
@@ -18,6 +33,12 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Inside CORS, so that browsers can read rejections
+if settings.ADMISSION_ENABLED:
+    admission_controllers = build_controllers()
+    app.add_middleware(AdmissionMiddleware, controllers=admission_controllers)
+    register_process_collector(AdmissionCollector(admission_controllers))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,9 +48,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.TRACING_ENABLED and not NATIVE_FASTAPI_TELEMETRY:
+    app.add_middleware(TracingMiddleware)
+
+# Outermost, so that latency includes the other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+    register_process_collector(DBPoolCollector(engine))
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 @app.get("/")
 async def root():
     return {
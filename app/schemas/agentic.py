@@ -1,4 +1,4 @@
-from typing import Literal, Optional, Union, List
+from typing import Dict, Literal, Optional, Union, List
 from pydantic import BaseModel
 
 class PineconeConfig(BaseModel):
@@ -10,8 +10,11 @@ class VectorStoreConfig(BaseModel):
     pineconeConfig: Optional[PineconeConfig] = None
 
 class WebConfig(BaseModel):
-    url: str
+    url: Optional[str] = None
+    urls: Optional[List[str]] = None
     selector: Optional[str] = None
+    maxDepth: int = 0
+    maxPages: int = 100
 
 class FileConfig(BaseModel):
     path: str
@@ -20,18 +23,26 @@ class FileConfig(BaseModel):
 class TextConfig(BaseModel):
     content: str
 
+class S3Config(BaseModel):
+    key: str
+
+class UrlConfig(BaseModel):
+    url: str
+
 class DocumentLoaderConfig(BaseModel):
-    type: Union[Literal['web'], Literal['file'], Literal['text'],Literal['image']]
+    type: Union[Literal['web'], Literal['file'], Literal['text'],Literal['image'], Literal['s3'], Literal['url']]
     webConfig: Optional[WebConfig] = None
     fileConfig: Optional[FileConfig] = None
     textConfig: Optional[TextConfig] = None
+    s3Config: Optional[S3Config] = None
+    urlConfig: Optional[UrlConfig] = None
 
 class LLMConfig(BaseModel):
     model: str
     temperature: float
 
 class EmbeddingsConfig(BaseModel):
-    provider: Literal['mistralai', 'openai', 'huggingface']
+    provider: Literal['mistralai', 'openai', 'huggingface', 'onnx']
     model: str
 
 class ChunkingConfig(BaseModel):
@@ -48,8 +59,26 @@ class RAGConfig(BaseModel):
 class Metadata(BaseModel):
     retrievedDocs: int
     processingTime: float
+    # Pipeline stages, absent for cached answers
+    retrievalTime: Optional[float] = None
+    generationTime: Optional[float] = None
+    cacheHit: Optional[Literal['exact', 'semantic']] = None
 
 class RAGResponse(BaseModel):
     answer: str
     context: List[str]
-    metadata: Metadata
\ No newline at end of file
+    metadata: Metadata
+
+class IngestionStageStats(BaseModel):
+    items: int
+    seconds: float
+    itemsPerSecond: float
+
+class IngestionReport(BaseModel):
+    documents: int
+    chunks: int
+    embedded: int
+    skipped: int
+    deleted: int
+    seconds: float
+    stages: Dict[str, IngestionStageStats]
\ No newline at end of file
@@ -1,9 +1,55 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 
 class FileResponse(BaseModel):
     filename: str
+    # Listings only: the S3 key to download or delete the file by
+    key: Optional[str] = None
     url: str
     content_type: Optional[str] = None
     size: Optional[int] = None
-    created_at: Optional[str] = None 
\ No newline at end of file
+    created_at: Optional[str] = None
+    # Semantic search only: the passage of the file that matched best
+    best_passage: Optional[Dict[str, Any]] = None
+    # Uploads only: content hash, and whether the content had been uploaded before
+    sha256: Optional[str] = None
+    deduplicated: Optional[bool] = None
+    # Images only: downscaled WebP derivatives
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    # Uploads only: background processing job, and whether the file is searchable yet
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+    status_url: Optional[str] = None
+
+
+class FileJobResponse(BaseModel):
+    id: str
+    filename: str
+    sha256: str
+    s3_key: str
+    content_type: Optional[str] = None
+    status: str
+    stage: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    completed_at: Optional[str] = None
+
+
+class HybridSearchRequest(BaseModel):
+    query: str
+    filters: Optional[Dict[str, Any]] = None
+    page: int = Field(1, ge=1)
+    size: int = Field(10, ge=1, le=100)
+    budget_ms: Optional[int] = Field(None, ge=1)
+
+
+class HybridSearchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    total: int
+    page: int
+    size: int
+    legs: Dict[str, Dict[str, Any]]
+    took_ms: float
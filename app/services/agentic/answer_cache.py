@@ -0,0 +1,104 @@
+from typing import Any, Dict, List, Optional
+from app.core.cache import TTLCache
+from app.schemas.agentic import RAGResponse
+import numpy as np
+import re
+import threading
+
+
+class CachedAnswer:
+    def __init__(self, response: RAGResponse, embedding: Optional[np.ndarray], corpus_version: int, llm_seconds: float):
+        self.response = response
+        self.embedding = embedding
+        self.corpus_version = corpus_version
+        self.llm_seconds = llm_seconds
+
+
+class AnswerCache:
+    """
+    Two-level cache of RAG answers.
+
+    Level one is an exact match on the normalized question and the corpus
+    version. Level two is a semantic match: the cached question whose embedding
+    has the highest cosine similarity with the incoming one, if it is above
+    ``similarity_threshold``. Both levels are TTL/LRU bounded and are cleared
+    whenever the corpus changes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.similarity_threshold = similarity_threshold
+        self._exact = TTLCache(max_entries, ttl_seconds)
+        self._semantic = TTLCache(max_entries, ttl_seconds)
+        self._lock = threading.Lock()
+        self._stats = {
+            "exactHits": 0,
+            "semanticHits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "savedLlmSeconds": 0.0,
+        }
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """
+        Normalize a question for exact matching: case, whitespace and trailing punctuation
+        """
+        return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+    def get_exact(self, question: str, corpus_version: int) -> Optional[CachedAnswer]:
+        entry = self._exact.get((self.normalize(question), corpus_version))
+        if entry is not None:
+            self._record_hit("exactHits", entry)
+        return entry
+
+    def get_semantic(self, embedding: List[float], corpus_version: int) -> Optional[CachedAnswer]:
+        """
+        Get the most similar cached answer above the similarity threshold, counting a miss otherwise
+        """
+        query = self._unit(embedding)
+        entries = [entry for _, entry in self._semantic.items() if entry.corpus_version == corpus_version]
+        if entries:
+            similarities = np.vstack([entry.embedding for entry in entries]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                self._record_hit("semanticHits", entries[best])
+                return entries[best]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, question: str, embedding: List[float], corpus_version: int, response: RAGResponse, llm_seconds: float) -> None:
+        entry = CachedAnswer(response, self._unit(embedding), corpus_version, llm_seconds)
+        normalized = self.normalize(question)
+        self._exact.set((normalized, corpus_version), entry)
+        self._semantic.set((normalized, corpus_version), entry)
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached answer, e.g. after the corpus changed
+        """
+        self._exact.clear()
+        self._semantic.clear()
+        with self._lock:
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["exactHits"] + stats["semanticHits"] + stats["misses"]
+        stats["entries"] = len(self._exact)
+        stats["hitRate"] = (stats["exactHits"] + stats["semanticHits"]) / lookups if lookups else 0.0
+        stats["exactHitRate"] = stats["exactHits"] / lookups if lookups else 0.0
+        stats["semanticHitRate"] = stats["semanticHits"] / lookups if lookups else 0.0
+        return stats
+
+    def _record_hit(self, counter: str, entry: CachedAnswer) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+            self._stats["savedLlmSeconds"] += entry.llm_seconds
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,137 @@
+from typing import AsyncIterator, List
+from contextlib import aclosing
+from langchain_core.documents import Document
+from urllib.parse import urlsplit, urlunsplit
+from PIL import Image
+from app.services.ocr import ocr_image
+from app.services.pdf_extraction import iter_pdf_pages
+from app.services.s3_service import get_s3_service
+import aiohttp
+import asyncio
+import codecs
+import magic
+import os
+import tempfile
+
+# Bytes read to sniff the content type
+SNIFF_BYTES = 8192
+# Text files are decoded incrementally in blocks of this size
+TEXT_BLOCK_BYTES = 1024 * 1024
+
+
+def sniff_mime_type(path: str) -> str:
+    with open(path, "rb") as f:
+        return magic.from_buffer(f.read(SNIFF_BYTES), mime=True)
+
+
+def _ocr_image(path: str) -> str:
+    with Image.open(path) as image:
+        return ocr_image(image)["text"]
+
+
+def _read_text(path: str) -> str:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    with open(path, "rb") as f:
+        while block := f.read(TEXT_BLOCK_BYTES):
+            parts.append(decoder.decode(block))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+class BinaryDocumentLoader:
+    """
+    Load a local file of unknown type: sniff its content type and route it to
+    the matching parser (PDF pages in parallel, OCR for images, text decoding).
+
+    When ``delete_after`` is set the file is removed once loading finishes
+    or the generator is closed, which the S3 and URL loaders use for their
+    temporary downloads; consumers that may stop early close it with
+    ``contextlib.aclosing``.
+    """
+
+    def __init__(self, path: str, source: str, delete_after: bool = False):
+        self.path = path
+        self.source = source
+        self.delete_after = delete_after
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        loop = asyncio.get_running_loop()
+        try:
+            mime_type = await loop.run_in_executor(None, sniff_mime_type, self.path)
+            metadata = {"source": self.source, "content_type": mime_type}
+
+            if mime_type == "application/pdf":
+                async for page in iter_pdf_pages(self.path):
+                    if page["text"].strip():
+                        yield Document(page_content=page["text"], metadata={**metadata, "page": page["page"]})
+            elif mime_type.startswith("image/"):
+                text = await loop.run_in_executor(None, _ocr_image, self.path)
+                if text.strip():
+                    yield Document(page_content=text, metadata=metadata)
+            elif mime_type.startswith("text/") or mime_type in ("application/json", "application/xml"):
+                text = await loop.run_in_executor(None, _read_text, self.path)
+                yield Document(page_content=text, metadata=metadata)
+            else:
+                raise ValueError(f"Unsupported file type: {mime_type}")
+        finally:
+            if self.delete_after:
+                os.unlink(self.path)
+
+    async def load(self) -> List[Document]:
+        return [doc async for doc in self.alazy_load()]
+
+
+class S3DocumentLoader:
+    """
+    Load an object from the configured S3 bucket by key, streaming it to a
+    temporary file rather than holding it in memory.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        s3_service = get_s3_service()
+        path = await s3_service.download_to_tempfile(self.key)
+        source = f"s3://{s3_service.bucket_name}/{self.key}"
+        async with aclosing(BinaryDocumentLoader(path, source, delete_after=True).alazy_load()) as docs:
+            async for doc in docs:
+                yield doc
+
+    async def load(self) -> List[Document]:
+        return [doc async for doc in self.alazy_load()]
+
+
+class UrlDocumentLoader:
+    """
+    Load a file from a URL (e.g. an S3 presigned URL), streaming the body to a
+    temporary file. The query string is dropped from the source so that
+    re-signed URLs of the same object map to the same document.
+    """
+
+    def __init__(self, url: str, chunk_size: int = 64 * 1024):
+        self.url = url
+        self.chunk_size = chunk_size
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        try:
+            with temp_file:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(self.url) as response:
+                        if response.status != 200:
+                            raise ValueError(f"Failed to fetch file: HTTP {response.status}")
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            temp_file.write(chunk)
+        except Exception:
+            os.unlink(temp_file.name)
+            raise
+        parts = urlsplit(self.url)
+        source = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+        async with aclosing(BinaryDocumentLoader(temp_file.name, source, delete_after=True).alazy_load()) as docs:
+            async for doc in docs:
+                yield doc
+
+    async def load(self) -> List[Document]:
+        return [doc async for doc in self.alazy_load()]
@@ -1,11 +1,17 @@
-from typing import List, Union
+from typing import AsyncIterator, List, Union
+from contextlib import aclosing
 from pydantic import ValidationError
-from langchain_community.document_loaders import WebBaseLoader, TextLoader, PyPDFLoader
+from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain_community.document_loaders.parsers import TesseractBlobParser
 from langchain_core.documents import Document
 import bs4
-from io import BytesIO
+import asyncio
+import hashlib
+import inspect
+import os
 from app.schemas.agentic import DocumentLoaderConfig, WebConfig, FileConfig, TextConfig
+from app.services.agentic.binary_loader import S3DocumentLoader, UrlDocumentLoader
+from app.services.agentic.web_crawler import WebCrawlerLoader
 from typing import Literal
 
 class DocumentLoaderFactory:
@@ -17,8 +23,14 @@ class DocumentLoaderFactory:
         if config.type == "web":
             if not config.webConfig:
                 raise ValueError("Web config required for web loader")
-            return WebBaseLoader(
-                web_path=config.webConfig.url
+            urls = ([config.webConfig.url] if config.webConfig.url else []) + (config.webConfig.urls or [])
+            if not urls:
+                raise ValueError("At least one URL required for web loader")
+            return WebCrawlerLoader(
+                urls,
+                selector=config.webConfig.selector,
+                max_depth=config.webConfig.maxDepth,
+                max_pages=config.webConfig.maxPages
             )
 
         elif config.type == "file":
@@ -27,10 +39,7 @@ class DocumentLoaderFactory:
             
             # verify file path exists
             file_path = config.fileConfig.path
-            try:
-                with open(file_path, 'rb') as f:
-                    file_like = BytesIO(f.read())
-            except FileNotFoundError:
+            if not os.path.isfile(file_path):
                 raise ValueError(f"File not found: {file_path}")
             
             if config.fileConfig.type == "pdf":
@@ -44,16 +53,29 @@ class DocumentLoaderFactory:
             else:
                 raise ValueError(f"Unsupported file type: {config.fileConfig.type}")
 
+        elif config.type == "s3":
+            if not config.s3Config:
+                raise ValueError("S3 config required for S3 loader")
+            return S3DocumentLoader(config.s3Config.key)
+
+        elif config.type == "url":
+            if not config.urlConfig:
+                raise ValueError("URL config required for URL loader")
+            return UrlDocumentLoader(config.urlConfig.url)
+
         elif config.type == "text":
             if not config.textConfig:
                 raise ValueError("Text config required for text loader")
             
+            # Content-derived source so that separate text inputs are tracked as separate documents
+            source = f"text-input:{hashlib.sha256(config.textConfig.content.encode()).hexdigest()[:16]}"
+
             class TextContentLoader:
                 async def load(self) -> List[Document]:
                     return [
                         Document(
                             page_content=config.textConfig.content,
-                            metadata={"source": "text-input"}
+                            metadata={"source": source}
                         )
                     ]
             
@@ -68,4 +90,24 @@ class DocumentLoaderFactory:
         Load documents using the appropriate loader based on configuration.
         """
         loader = await DocumentLoaderFactory.create_loader(config)
-        return  loader.load()
\ No newline at end of file
+        if inspect.iscoroutinefunction(loader.load):
+            return await loader.load()
+        # Langchain loaders fetch and parse synchronously, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, loader.load)
+
+    @staticmethod
+    async def stream_documents(config: DocumentLoaderConfig) -> AsyncIterator[Document]:
+        """
+        Stream documents one at a time (e.g. PDF pages) as the loader produces them.
+        """
+        loader = await DocumentLoaderFactory.create_loader(config)
+        if hasattr(loader, "alazy_load"):
+            # Langchain loaders: lazy_load runs in the default executor, one document per step.
+            # Closed along with this generator, so that loaders remove their temporary files
+            async with aclosing(loader.alazy_load()) as docs:
+                async for doc in docs:
+                    yield doc
+        else:
+            for doc in await loader.load():
+                yield doc
\ No newline at end of file
@@ -0,0 +1,76 @@
+from concurrent.futures import Executor
+from langchain_core.embeddings import Embeddings
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces concurrent query embeddings into batched ``embed_documents`` calls.
+
+    Queries arriving within ``max_wait`` seconds of each other (up to
+    ``max_batch_size``) share one embeddings call, which runs on ``executor`` so
+    neither the model nor the HTTP client blocks the event loop. Identical texts
+    within a batch are embedded once.
+
+    Note: batching goes through ``embed_documents``, so this is only suitable
+    for providers that embed queries and documents the same way (Mistral,
+    OpenAI and sentence-transformers without query instructions).
+    """
+
+    def __init__(self, embeddings: Embeddings, executor: Executor, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.embeddings = embeddings
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Batches in flight: the event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {"requests": 0, "batches": 0, "embedded": 0}
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a single query, sharing the embeddings call with concurrent callers
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self._stats["requests"] += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._embed_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self._stats["batches"] += 1
+        self._stats["embedded"] += len(texts)
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.embeddings.embed_documents, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["meanBatchSize"] = stats["embedded"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
@@ -1,22 +1,17 @@
-from langchain_mistralai import MistralAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.embeddings import Embeddings
-from langchain_huggingface import HuggingFaceEmbeddings
 from app.schemas.agentic import EmbeddingsConfig
-from typing import Union
+from app.services.model_registry import get_model_registry
+import asyncio
 
 class EmbeddingsFactory:
     @staticmethod
     async def create_embeddings(config: EmbeddingsConfig) -> Embeddings:
         """
-        Create an embeddings instance based on the provided configuration.
+        Get the shared embeddings instance for the provided configuration.
+        Models are loaded once per process by the model registry.
         """
-        if config.provider.startswith("mistral"):
-            return MistralAIEmbeddings(model=config.model)
-        elif config.provider.startswith("openai"):
-           
-            return OpenAIEmbeddings(model=config.model)
-        elif config.provider.startswith("huggingface"):
-            return HuggingFaceEmbeddings(model_name=config.model)
-        else:
-            raise ValueError(f"Unsupported embeddings model: {config.model}")
\ No newline at end of file
+        loop = asyncio.get_running_loop()
+        # Loading local models is slow and blocking, keep it off the event loop
+        return await loop.run_in_executor(
+            None, get_model_registry().get_embeddings, config.provider, config.model
+        )
@@ -0,0 +1,217 @@
+from concurrent.futures import Executor
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+from langchain_pinecone import PineconeVectorStore
+from langchain_text_splitters import TextSplitter
+from app.schemas.agentic import IngestionReport, IngestionStageStats
+from typing import AsyncIterable, Dict, List, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+def chunk_id(chunk: Document) -> str:
+    """
+    Stable id of a chunk: the hash of its source and content, so re-ingesting
+    an unchanged chunk maps onto the id it was first indexed under.
+    """
+    source = str(chunk.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\x00{chunk.page_content}".encode()).hexdigest()
+
+
+class _StageTimer:
+    def __init__(self):
+        self.items = 0
+        self.seconds = 0.0
+
+    def record(self, items: int, started: float) -> None:
+        self.items += items
+        self.seconds += time.perf_counter() - started
+
+    def stats(self) -> IngestionStageStats:
+        return IngestionStageStats(
+            items=self.items,
+            seconds=self.seconds,
+            itemsPerSecond=self.items / self.seconds if self.seconds else 0.0
+        )
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: load -> split -> dedupe -> embed (batched) -> upsert.
+
+    Stages run concurrently and are connected by bounded queues, so a large
+    document is embedded and upserted batch by batch while later pages are
+    still being loaded and split. Chunks get stable content-derived ids;
+    chunks already indexed are skipped and chunks that disappeared from a
+    re-ingested source are deleted.
+
+    ``registry`` maps each source to the chunk ids currently indexed for it and
+    is updated in place; callers must serialize runs that share a registry.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embeddings: Embeddings,
+        splitter: TextSplitter,
+        executor: Executor,
+        registry: Dict[str, Set[str]],
+        batch_size: int = 64,
+        embed_workers: int = 2,
+        queue_size: int = 8
+    ):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.splitter = splitter
+        self.executor = executor
+        self.registry = registry
+        self.batch_size = batch_size
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+
+    async def run(self, documents: AsyncIterable[Document]) -> IngestionReport:
+        """
+        Ingest a stream of documents and report per-stage throughput
+        """
+        start_time = time.perf_counter()
+        timers = {name: _StageTimer() for name in ("load", "split", "dedupe", "embed", "upsert")}
+        docs_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        chunks_queue: asyncio.Queue = asyncio.Queue(self.queue_size * self.batch_size)
+        batches_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        vectors_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        seen: Dict[str, Set[str]] = {}
+        counts = {"skipped": 0}
+        loop = asyncio.get_running_loop()
+
+        async def load() -> None:
+            iterator = documents.__aiter__()
+            while True:
+                started = time.perf_counter()
+                try:
+                    doc = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                timers["load"].record(1, started)
+                await docs_queue.put(doc)
+            await docs_queue.put(_DONE)
+
+        async def split() -> None:
+            while (doc := await docs_queue.get()) is not _DONE:
+                started = time.perf_counter()
+                chunks = await loop.run_in_executor(self.executor, self.splitter.split_documents, [doc])
+                timers["split"].record(len(chunks), started)
+                for chunk in chunks:
+                    await chunks_queue.put(chunk)
+            await chunks_queue.put(_DONE)
+
+        async def dedupe() -> None:
+            batch: List[Tuple[str, Document]] = []
+            while (chunk := await chunks_queue.get()) is not _DONE:
+                started = time.perf_counter()
+                source = str(chunk.metadata.get("source", ""))
+                cid = chunk_id(chunk)
+                source_ids = seen.setdefault(source, set())
+                duplicate = cid in source_ids or cid in self.registry.get(source, ())
+                source_ids.add(cid)
+                timers["dedupe"].record(1, started)
+                if duplicate:
+                    counts["skipped"] += 1
+                    continue
+                batch.append((cid, chunk))
+                if len(batch) >= self.batch_size:
+                    await batches_queue.put(batch)
+                    batch = []
+            if batch:
+                await batches_queue.put(batch)
+            for _ in range(self.embed_workers):
+                await batches_queue.put(_DONE)
+
+        async def embed() -> None:
+            while (batch := await batches_queue.get()) is not _DONE:
+                started = time.perf_counter()
+                texts = [chunk.page_content for _, chunk in batch]
+                vectors = await loop.run_in_executor(self.executor, self.embeddings.embed_documents, texts)
+                timers["embed"].record(len(batch), started)
+                await vectors_queue.put((batch, vectors))
+            await vectors_queue.put(_DONE)
+
+        async def upsert() -> None:
+            remaining_workers = self.embed_workers
+            while remaining_workers:
+                item = await vectors_queue.get()
+                if item is _DONE:
+                    remaining_workers -= 1
+                    continue
+                started = time.perf_counter()
+                batch, vectors = item
+                await loop.run_in_executor(self.executor, self._upsert, batch, vectors)
+                for cid, chunk in batch:
+                    self.registry.setdefault(str(chunk.metadata.get("source", "")), set()).add(cid)
+                timers["upsert"].record(len(batch), started)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(load())
+                group.create_task(split())
+                group.create_task(dedupe())
+                for _ in range(self.embed_workers):
+                    group.create_task(embed())
+                group.create_task(upsert())
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+
+        # Drop chunks that are no longer part of a re-ingested source
+        stale = [cid for source, ids in seen.items() for cid in self.registry.get(source, set()) - ids]
+        if stale:
+            started = time.perf_counter()
+            await loop.run_in_executor(self.executor, lambda: self.vector_store.delete(ids=stale))
+            for source, ids in seen.items():
+                if source in self.registry:
+                    self.registry[source] &= ids
+            timers["upsert"].record(0, started)
+
+        report = IngestionReport(
+            documents=timers["load"].items,
+            chunks=timers["split"].items,
+            embedded=timers["embed"].items,
+            skipped=counts["skipped"],
+            deleted=len(stale),
+            seconds=time.perf_counter() - start_time,
+            stages={name: timer.stats() for name, timer in timers.items()}
+        )
+        logger.info(
+            "Ingested %d documents: %d chunks, %d embedded, %d unchanged, %d deleted in %.2fs",
+            report.documents, report.chunks, report.embedded, report.skipped, report.deleted, report.seconds
+        )
+        return report
+
+    def _upsert(self, batch: List[Tuple[str, Document]], vectors: List[List[float]]) -> None:
+        """
+        Write pre-computed embeddings, bypassing the store's own embedding call where possible
+        """
+        ids = [cid for cid, _ in batch]
+        docs = [chunk for _, chunk in batch]
+        if isinstance(self.vector_store, InMemoryVectorStore):
+            for cid, doc, vector in zip(ids, docs, vectors):
+                self.vector_store.store[cid] = {
+                    "id": cid,
+                    "vector": vector,
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                }
+        elif isinstance(self.vector_store, PineconeVectorStore):
+            text_key = self.vector_store._text_key
+            self.vector_store.index.upsert(vectors=[
+                (cid, vector, {**doc.metadata, text_key: doc.page_content})
+                for cid, doc, vector in zip(ids, docs, vectors)
+            ])
+        else:
+            self.vector_store.add_documents(docs, ids=ids)
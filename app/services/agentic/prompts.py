@@ -0,0 +1,15 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+# Vendored copy of the "rlm/rag-prompt" template from the LangChain hub so that
+# building the pipeline never depends on network access to the hub.
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    (
+        "human",
+        "You are an assistant for question-answering tasks. Use the following pieces of "
+        "retrieved context to answer the question. If you don't know the answer, just say "
+        "that you don't know. Use three sentences maximum and keep the answer concise.\n"
+        "Question: {question} \n"
+        "Context: {context} \n"
+        "Answer:"
+    )
+])
@@ -1,18 +1,35 @@
 from langchain_mistralai import ChatMistralAI
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.hub import pull
+from langchain_core.vectorstores import InMemoryVectorStore
 from langgraph.graph import StateGraph, START
+from opentelemetry import trace
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chat_models import init_chat_model
+from app.core.config import settings
+from app.core.metrics import RAG_QUERIES, RAG_STAGE_SECONDS
+from app.core.tracing import traced, tracer
 from app.services.agentic.document_loader import DocumentLoaderFactory
 from app.services.agentic.vector_store import VectorStoreFactory
 from app.services.agentic.embeddings_factory import EmbeddingsFactory
-from app.schemas.agentic import RAGConfig, RAGResponse, DocumentLoaderConfig
-from typing import List, TypedDict
+from app.services.agentic.prompts import RAG_PROMPT
+from app.services.agentic.answer_cache import AnswerCache, CachedAnswer
+from app.services.agentic.embedding_batcher import QueryEmbeddingBatcher
+from app.services.agentic.ingestion import IngestionPipeline
+from app.services.agentic.web_crawler import get_web_crawler
+from app.schemas.agentic import RAGConfig, RAGResponse, DocumentLoaderConfig, IngestionReport
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Set, Tuple, TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+import hashlib
+import json
+import logging
+import os
 import time
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 class RAGPipeline:
     def __init__(self, config: RAGConfig):
         """
@@ -22,12 +39,34 @@ class RAGPipeline:
         # Corrected to use llm config fields
         self.llm = init_chat_model(
             model=self.config.llm.model,
-            model_provider="mistralai"
+            model_provider="mistralai",
+            base_url=settings.MISTRAL_BASE_URL or None
         )
         self.embeddings = None
+        self.query_embedder = None
         self.vector_store = None
+        # Dedicated, bounded pool for blocking embedding and vector search calls
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_RETRIEVAL_THREADS,
+            thread_name_prefix="rag-retrieval"
+        )
+        # Separate pool for ingestion so bulk embedding never starves queries
+        self.ingestion_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_INGEST_EMBED_WORKERS + 2,
+            thread_name_prefix="rag-ingestion"
+        )
         self.prompt_template = None
         self.graph = None
+        # Bumped whenever the indexed corpus changes, invalidating cached answers
+        self.corpus_version = 0
+        # Chunk ids indexed per document source, used to skip unchanged chunks on re-ingestion
+        self.chunk_registry: Dict[str, Set[str]] = {}
+        self._ingest_lock = asyncio.Lock()
+        self.answer_cache = AnswerCache(
+            max_entries=settings.RAG_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RAG_CACHE_TTL_SECONDS,
+            similarity_threshold=settings.RAG_CACHE_SIMILARITY_THRESHOLD
+        ) if settings.RAG_CACHE_ENABLED else None
 
     async def initialize(self) -> None:
         """
@@ -35,62 +74,151 @@ class RAGPipeline:
         """
         # Initialize embeddings
         self.embeddings = await EmbeddingsFactory.create_embeddings(self.config.embeddings)
+        self.query_embedder = QueryEmbeddingBatcher(
+            self.embeddings,
+            self.retrieval_executor,
+            max_batch_size=settings.RAG_EMBED_BATCH_SIZE,
+            max_wait=settings.RAG_EMBED_BATCH_WAIT_MS / 1000
+        )
 
         # Initialize vector store
         self.vector_store = await VectorStoreFactory.create_vector_store(
             self.config.vectorStore, self.embeddings
         )
 
-        # Load and process documents
-        await self.load_and_index_documents()
+        # Preload the corpus from a persisted snapshot, falling back to the
+        # configured document loader (and snapshotting the result) on a cold cache
+        if not await self.load_snapshot():
+            await self.load_and_index_documents()
+            await self.save_snapshot()
 
-        # Load prompt template asynchronously
-        self.prompt_template =  pull("rlm/rag-prompt")
+        # Vendored prompt template, no hub round-trip
+        self.prompt_template = RAG_PROMPT
 
         # Build the graph
         self._build_graph()
 
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        """
+        Path of the persisted vector store snapshot, or None when the vector
+        store is already durable (e.g. Pinecone).
+
+        The file name embeds a fingerprint of the corpus, chunking and embeddings
+        configuration so that a config change never loads a stale snapshot.
+        """
+        if self.config.vectorStore.type != "memory":
+            return None
+        fingerprint = hashlib.sha256(json.dumps({
+            "documentLoader": self.config.documentLoader.model_dump(),
+            "chunking": self.config.chunking.model_dump(),
+            "embeddings": self.config.embeddings.model_dump(),
+        }, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(settings.RAG_SNAPSHOT_DIR, f"corpus-{fingerprint}.json")
+
+    async def load_snapshot(self) -> bool:
+        """
+        Restore the in-memory vector store from its snapshot, if one exists.
+        """
+        path = self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            vector_store = await loop.run_in_executor(
+                None, lambda: InMemoryVectorStore.load(path, self.embeddings)
+            )
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable RAG snapshot {path}: {str(e)}")
+            return False
+        if not vector_store.store:
+            # Written by an earlier version from a failed load; reload the corpus
+            logger.warning(f"Ignoring empty RAG snapshot {path}")
+            return False
+        self.vector_store = vector_store
+        self.chunk_registry = {}
+        for entry in self.vector_store.store.values():
+            source = str(entry["metadata"].get("source", ""))
+            self.chunk_registry.setdefault(source, set()).add(entry["id"])
+        logger.info(f"Loaded {len(self.vector_store.store)} document chunks from snapshot")
+        return True
+
+    async def save_snapshot(self) -> None:
+        """
+        Persist the in-memory vector store so the next start can skip loading
+        and embedding the corpus.
+        """
+        path = self.snapshot_path
+        if not path:
+            return
+        if not self.vector_store.store:
+            # An empty corpus means the documents failed to load (the default
+            # corpus is never empty); snapshotting it would stick across restarts
+            logger.warning(f"Not writing RAG snapshot {path}: the corpus is empty")
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, lambda: self.vector_store.dump(path))
+        except Exception as e:
+            logger.warning(f"Failed to write RAG snapshot {path}: {str(e)}")
+
     async def load_and_index_documents(self) -> None:
         """
         Load and index documents into the vector store.
         """
-        docs = await DocumentLoaderFactory.load_documents(self.config.documentLoader)
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.config.chunking.chunkSize,
-            chunk_overlap=self.config.chunking.chunkOverlap
-        )
-        all_splits = splitter.split_documents(docs)  # Synchronous call
-        await self.add_split_documents(all_splits)
-        print(f"✅ Indexed {len(all_splits)} document chunks")
+        report = await self.ingest(DocumentLoaderFactory.stream_documents(self.config.documentLoader))
+        logger.info(f"Indexed {report.chunks} document chunks")
 
     def _build_graph(self) -> None:
         """
         Build the LangGraph for the RAG pipeline.
         """
-        class State(TypedDict):
+        class State(TypedDict, total=False):
             question: str
+            embedding: List[float]
             context: List[Document]
             answer: str
+            retrievalTime: float
+            generationTime: float
 
         # Define application steps
+        @traced("rag.retrieve")
         async def retrieve(state: State) -> dict:
-            retrieved_docs =  self.vector_store.similarity_search(state["question"], k=4)
-            return {"context": retrieved_docs}
+            start_time = time.time()
+            # Reuse the question embedding computed for the answer cache if there is one
+            embedding = state.get("embedding")
+            if not embedding:
+                with tracer.start_as_current_span("rag.embed_question"):
+                    embedding = await self.query_embedder.embed(state["question"])
+            loop = asyncio.get_running_loop()
+            retrieved_docs = await loop.run_in_executor(
+                self.retrieval_executor,
+                lambda: self.vector_store.similarity_search_by_vector(embedding, k=4)
+            )
+            retrieval_time = time.time() - start_time
+            RAG_STAGE_SECONDS.labels("retrieve").observe(retrieval_time)
+            trace.get_current_span().set_attribute("rag.documents", len(retrieved_docs))
+            return {"context": retrieved_docs, "retrievalTime": retrieval_time}
 
+        @traced("rag.generate")
         async def generate(state: State) -> dict:
             docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-            messages =  self.prompt_template.invoke({
+            messages = await self.prompt_template.ainvoke({
                 "question": state["question"],
                 "context": docs_content
             })
-            response = await self.llm.ainvoke(messages)
-            return {"answer": response.content}
+            start_time = time.time()
+            with tracer.start_as_current_span("rag.llm"):
+                response = await self.llm.ainvoke(messages)
+            generation_time = time.time() - start_time
+            RAG_STAGE_SECONDS.labels("generate").observe(generation_time)
+            return {"answer": response.content, "generationTime": generation_time}
 
         # Compile the graph
         graph_builder = StateGraph(State).add_sequence([retrieve, generate])
         graph_builder.add_edge(START, "retrieve")
         self.graph = graph_builder.compile()
-        print("✅ RAG pipeline graph built successfully")
+        logger.info("RAG pipeline graph built")
 
     async def query(self, question: str) -> RAGResponse:
         """
@@ -98,38 +226,206 @@ class RAGPipeline:
         """
         start_time = time.time()
         try:
+            corpus_version = self.corpus_version
+            cached, hit, embedding = await self._lookup_cache(question, corpus_version)
+            RAG_QUERIES.labels(hit if cached is not None else "miss").inc()
+            if cached is not None:
+                return self._cached_response(cached.response, hit, time.time() - start_time)
+
             # Use ainvoke for async graph execution
-            result = await self.graph.ainvoke({"question": question})
-            processing_time = time.time() - start_time
-            return RAGResponse(
-                answer=result["answer"],
-                context=[doc.page_content for doc in result["context"]],
-                metadata={
-                    "retrievedDocs": len(result["context"]),
-                    "processingTime": processing_time
-                }
-            )
+            result = await self.graph.ainvoke(self._graph_input(question, embedding))
+            response = self._build_response(result, time.time() - start_time)
+            self._store_answer(question, embedding, corpus_version, response, result.get("generationTime", 0.0))
+            return response
         except Exception as e:
             raise RuntimeError(f"RAG query failed: {str(e)}")
 
-    async def add_split_documents(self, docs: List[Document]) -> None:
+    async def stream_query(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a query through the RAG pipeline, yielding events as they become available:
+        the retrieved context, then each generated token, then the response metadata.
+        """
+        start_time = time.time()
+        corpus_version = self.corpus_version
+        cached, hit, embedding = await self._lookup_cache(question, corpus_version)
+        RAG_QUERIES.labels(hit if cached is not None else "miss").inc()
+        if cached is not None:
+            response = self._cached_response(cached.response, hit, time.time() - start_time)
+            yield {"event": "context", "data": {"context": response.context}}
+            yield {"event": "token", "data": {"token": response.answer}}
+            yield {"event": "metadata", "data": response.metadata.model_dump()}
+            return
+
+        result: Dict[str, Any] = {"context": [], "answer": ""}
+        async for mode, chunk in self.graph.astream(
+            self._graph_input(question, embedding), stream_mode=["updates", "messages"]
+        ):
+            if mode == "updates":
+                for update in chunk.values():
+                    result.update(update or {})
+                if "retrieve" in chunk:
+                    yield {"event": "context", "data": {"context": [doc.page_content for doc in result["context"]]}}
+            elif mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "generate" and message.content:
+                    yield {"event": "token", "data": {"token": message.content}}
+
+        response = self._build_response(result, time.time() - start_time)
+        self._store_answer(question, embedding, corpus_version, response, result.get("generationTime", 0.0))
+        yield {"event": "metadata", "data": response.metadata.model_dump()}
+
+    async def _lookup_cache(self, question: str, corpus_version: int) -> Tuple[Optional[CachedAnswer], Optional[str], Optional[List[float]]]:
         """
-        Add split documents to the vector store.
+        Look up a cached answer, returning it with the level that hit and the
+        question embedding (computed on an exact miss, reused for retrieval).
         """
-        # Run synchronous add_documents in a thread pool
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: self.vector_store.add_documents(docs))
-        print(f"✅ Added {len(docs)} new document chunks")
+        if self.answer_cache is None:
+            return None, None, None
+        cached = self.answer_cache.get_exact(question, corpus_version)
+        if cached is not None:
+            return cached, "exact", None
+        embedding = await self.query_embedder.embed(question)
+        return self.answer_cache.get_semantic(embedding, corpus_version), "semantic", embedding
+
+    def _store_answer(self, question: str, embedding: Optional[List[float]], corpus_version: int,
+                      response: RAGResponse, llm_seconds: float) -> None:
+        # Skip answers computed against a corpus that changed in the meantime
+        if self.answer_cache is not None and embedding is not None and corpus_version == self.corpus_version:
+            self.answer_cache.set(question, embedding, corpus_version, response, llm_seconds)
 
-    async def add_new_documents(self, config: DocumentLoaderConfig) -> None:
+    @staticmethod
+    def _graph_input(question: str, embedding: Optional[List[float]]) -> Dict[str, Any]:
+        if embedding is None:
+            return {"question": question}
+        return {"question": question, "embedding": embedding}
+
+    def _build_response(self, result: Dict[str, Any], processing_time: float) -> RAGResponse:
+        return RAGResponse(
+            answer=result["answer"],
+            context=[doc.page_content for doc in result["context"]],
+            metadata={
+                "retrievedDocs": len(result["context"]),
+                "processingTime": processing_time,
+                "retrievalTime": result.get("retrievalTime"),
+                "generationTime": result.get("generationTime")
+            }
+        )
+
+    def _cached_response(self, response: RAGResponse, hit: str, processing_time: float) -> RAGResponse:
+        return response.model_copy(update={
+            "metadata": response.metadata.model_copy(update={
+                "processingTime": processing_time,
+                "retrievalTime": None,
+                "generationTime": None,
+                "cacheHit": hit
+            })
+        })
+
+    async def ingest(self, documents: AsyncIterable[Document]) -> IngestionReport:
         """
-        Load and index new documents into the vector store.
+        Run documents through the streaming ingestion pipeline (split, dedupe,
+        batched embedding and upsert), invalidating cached answers if the
+        corpus changed.
         """
-        docs = await DocumentLoaderFactory.load_documents(config)
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config.chunking.chunkSize,
             chunk_overlap=self.config.chunking.chunkOverlap
         )
-        all_splits = splitter.split_documents(docs)  # Synchronous call
-        await self.add_split_documents(all_splits)
-        print(f"✅ Added {len(all_splits)} new document chunks")
\ No newline at end of file
+        pipeline = IngestionPipeline(
+            self.vector_store,
+            self.embeddings,
+            splitter,
+            self.ingestion_executor,
+            self.chunk_registry,
+            batch_size=settings.RAG_INGEST_BATCH_SIZE,
+            embed_workers=settings.RAG_INGEST_EMBED_WORKERS,
+            queue_size=settings.RAG_INGEST_QUEUE_SIZE
+        )
+        sources: Set[str] = set()
+
+        async def tracked() -> AsyncIterator[Document]:
+            try:
+                async for doc in documents:
+                    sources.add(str(doc.metadata.get("source", "")))
+                    yield doc
+            finally:
+                # Loaders remove their temporary files when closed
+                if hasattr(documents, "aclose"):
+                    await documents.aclose()
+
+        async with self._ingest_lock:
+            # Closed even when the pipeline fails before consuming every document
+            async with aclosing(tracked()) as stream:
+                report = await pipeline.run(stream)
+            # Crawled pages are only skipped as unchanged once they are indexed
+            get_web_crawler().commit(sources)
+            if report.embedded or report.deleted:
+                self.corpus_version += 1
+                if self.answer_cache is not None:
+                    self.answer_cache.invalidate()
+        return report
+
+    async def add_new_documents(self, config: DocumentLoaderConfig) -> IngestionReport:
+        """
+        Load and index new documents into the vector store.
+        """
+        report = await self.ingest(DocumentLoaderFactory.stream_documents(config))
+        if report.embedded or report.deleted:
+            await self.save_snapshot()
+        logger.info(f"Added {report.embedded} new document chunks ({report.skipped} unchanged, {report.deleted} removed)")
+        return report
+
+
+# Shared pipeline, initialized in the background
+_rag_pipeline: Optional[RAGPipeline] = None
+_rag_init_task: Optional[asyncio.Task] = None
+_rag_status: Dict[str, Any] = {"state": "not_started", "error": None, "attempts": 0, "initSeconds": None}
+
+
+async def _initialize_rag_pipeline(config: RAGConfig) -> None:
+    """
+    Build the shared pipeline, retrying with exponential backoff so that a
+    transient network failure does not leave the service permanently unready.
+    """
+    global _rag_pipeline
+    start_time = time.time()
+    delay = settings.RAG_INIT_RETRY_DELAY
+    for attempt in range(1, settings.RAG_INIT_MAX_RETRIES + 1):
+        _rag_status.update(state="initializing", attempts=attempt)
+        try:
+            pipeline = RAGPipeline(config)
+            await pipeline.initialize()
+            _rag_pipeline = pipeline
+            _rag_status.update(state="ready", error=None, initSeconds=time.time() - start_time)
+            return
+        except Exception as e:
+            _rag_status["error"] = str(e)
+            logger.warning(f"RAG pipeline initialization attempt {attempt} failed: {str(e)}")
+            if attempt < settings.RAG_INIT_MAX_RETRIES:
+                await asyncio.sleep(delay)
+                delay *= 2
+    _rag_status["state"] = "failed"
+
+
+def start_rag_pipeline(config: RAGConfig) -> None:
+    """
+    Schedule background initialization of the shared pipeline. Safe to call
+    repeatedly: it is a no-op while initialization is running or once the
+    pipeline is ready, and restarts a failed initialization.
+    """
+    global _rag_init_task
+    if _rag_pipeline is not None:
+        return
+    if _rag_init_task is not None and not _rag_init_task.done():
+        return
+    _rag_init_task = asyncio.create_task(_initialize_rag_pipeline(config))
+
+
+def get_rag_pipeline() -> Optional[RAGPipeline]:
+    """Get the shared pipeline, or None while it is not ready."""
+    return _rag_pipeline
+
+
+def get_rag_pipeline_status() -> Dict[str, Any]:
+    """Get the initialization status of the shared pipeline."""
+    return {"ready": _rag_pipeline is not None, **_rag_status}
@@ -0,0 +1,230 @@
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlsplit, urldefrag
+from langchain_core.documents import Document
+from bs4 import BeautifulSoup
+from app.core.config import settings
+import aiohttp
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# End-of-crawl marker on the results queue
+_DONE = object()
+
+
+class _HostRateLimiter:
+    """
+    Spaces out requests to one host by at least ``interval`` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_allowed = 0.0
+
+    async def wait(self) -> None:
+        async with self._lock:
+            delay = self._next_allowed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_allowed = time.monotonic() + self.interval
+
+
+def _parse_html(url: str, html: str, selector: Optional[str]) -> Tuple[Optional[Document], List[str]]:
+    """
+    Extract the text matched by ``selector`` (the whole page without one) and
+    the outgoing links of a page.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if selector:
+        text = "\n".join(element.get_text(" ", strip=True) for element in soup.select(selector))
+    else:
+        text = soup.get_text("\n", strip=True)
+    links = [urldefrag(urljoin(url, a["href"]))[0] for a in soup.find_all("a", href=True)]
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    doc = Document(page_content=text, metadata={"source": url, "title": title}) if text.strip() else None
+    return doc, links
+
+
+class WebCrawler:
+    """
+    Concurrent web crawler over a pooled aiohttp session.
+
+    Requests are bounded globally and per host, and each host is rate limited.
+    ETag/Last-Modified validators are remembered per URL so a recrawl only
+    downloads (and yields) pages that changed since the last crawl. The
+    validators of a yielded page only take effect once the consumer commits
+    them (see ``commit``), after it has ingested the page: a page whose
+    ingestion failed is downloaded again by the next crawl rather than
+    answered with 304.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        per_host_concurrency: int = 2,
+        per_host_interval: float = 0.5,
+        timeout: float = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_limiters: Dict[str, _HostRateLimiter] = {}
+        self._validators: Dict[str, Dict[str, str]] = {}
+        # Validators of fetched pages not committed yet
+        self._pending: Dict[str, Dict[str, str]] = {}
+        # Outgoing links of each crawled page, so unchanged pages can still be followed
+        self._links: Dict[str, List[str]] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": settings.CRAWLER_USER_AGENT}
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """
+        Fetch a page, returning None if it is unchanged since the last
+        committed fetch
+        """
+        host = urlsplit(url).netloc
+        limiter = self._host_limiters.setdefault(host, _HostRateLimiter(self.per_host_interval))
+        await limiter.wait()
+
+        headers = {}
+        validators = self._validators.get(url, {})
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        async with self._get_session().get(url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            html = await response.text()
+            validators = {}
+            if response.headers.get("ETag"):
+                validators["etag"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                validators["last_modified"] = response.headers["Last-Modified"]
+            self._pending[url] = validators
+            return html
+
+    def commit(self, urls: Iterable[str]) -> None:
+        """
+        Make the validators of fetched pages current, once their content is
+        ingested; later crawls then skip them while they are unchanged
+        """
+        for url in urls:
+            validators = self._pending.pop(url, None)
+            if validators is not None:
+                self._validators[url] = validators
+
+    async def crawl(
+        self,
+        seeds: List[str],
+        selector: Optional[str] = None,
+        max_depth: int = 0,
+        max_pages: int = 100
+    ) -> AsyncIterator[Document]:
+        """
+        Crawl from the seed URLs, following same-host links up to ``max_depth``,
+        and yield a document per changed page as soon as it is parsed.
+        """
+        loop = asyncio.get_running_loop()
+        frontier: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue(self.max_concurrency)
+        seen: Set[str] = set()
+        for url in seeds:
+            if url not in seen and len(seen) < max_pages:
+                seen.add(url)
+                frontier.put_nowait((url, 0))
+
+        async def worker() -> None:
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    html = await self.fetch(url)
+                    if html is None:
+                        links = self._links.get(url, [])
+                    else:
+                        doc, links = await loop.run_in_executor(None, _parse_html, url, html, selector)
+                        self._links[url] = links
+                        if doc is not None:
+                            await results.put(doc)
+                        else:
+                            # Nothing to ingest, nothing to lose
+                            self.commit([url])
+                    if depth < max_depth:
+                        host = urlsplit(url).netloc
+                        for link in links:
+                            if urlsplit(link).netloc == host and link not in seen and len(seen) < max_pages:
+                                seen.add(link)
+                                frontier.put_nowait((link, depth + 1))
+                except Exception as e:
+                    logger.warning(f"Failed to crawl {url}: {str(e)}")
+                finally:
+                    frontier.task_done()
+
+        async def supervise() -> None:
+            await frontier.join()
+            await results.put(_DONE)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        supervisor = asyncio.create_task(supervise())
+        try:
+            while (doc := await results.get()) is not _DONE:
+                yield doc
+        finally:
+            supervisor.cancel()
+            for task in workers:
+                task.cancel()
+
+
+class WebCrawlerLoader:
+    """
+    Document loader adapter streaming crawled pages from the shared crawler.
+    """
+
+    def __init__(self, urls: List[str], selector: Optional[str] = None, max_depth: int = 0, max_pages: int = 100):
+        self.urls = urls
+        self.selector = selector
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        async for doc in get_web_crawler().crawl(self.urls, self.selector, self.max_depth, self.max_pages):
+            yield doc
+
+    async def load(self) -> List[Document]:
+        return [doc async for doc in self.alazy_load()]
+
+
+# Singleton instance
+_web_crawler: Optional[WebCrawler] = None
+
+
+def get_web_crawler() -> WebCrawler:
+    """Get or create the shared crawler, whose validators persist across crawls."""
+    global _web_crawler
+    if _web_crawler is None:
+        _web_crawler = WebCrawler(
+            max_concurrency=settings.CRAWLER_MAX_CONCURRENCY,
+            per_host_concurrency=settings.CRAWLER_PER_HOST_CONCURRENCY,
+            per_host_interval=settings.CRAWLER_PER_HOST_INTERVAL,
+            timeout=settings.CRAWLER_TIMEOUT
+        )
+    return _web_crawler
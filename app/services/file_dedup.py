@@ -0,0 +1,224 @@
+"""
+Content-addressed file storage: uploads are keyed by the SHA-256 of their
+bytes, and a file that was uploaded before reuses the stored object, metadata
+and search index entry instead of being processed again.
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+from datetime import datetime
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.core.db import SessionLocal
+from app.core.models import FileObjectDB
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+async def read_and_hash(file: UploadFile, chunk_size: int = READ_CHUNK_BYTES) -> Tuple[bytes, str]:
+    """
+    Read an upload in chunks, hashing it as it is read rather than in a
+    second pass over the bytes
+    """
+    hasher = hashlib.sha256()
+    chunks = []
+    while chunk := await file.read(chunk_size):
+        hasher.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+
+def content_key(sha256: str, filename: str) -> str:
+    """S3 key of a stored object: its hash, plus the extension for content-type sniffing clients"""
+    return f"{sha256}{os.path.splitext(filename)[1].lower()}"
+
+
+def _to_dict(file_object: FileObjectDB) -> Dict[str, Any]:
+    return {
+        "sha256": file_object.sha256,
+        "s3_key": file_object.s3_key,
+        "content_type": file_object.content_type,
+        "size": file_object.size,
+        "metadata": file_object.file_metadata or {},
+        "processing_seconds": file_object.processing_seconds or 0.0,
+        "upload_count": file_object.upload_count,
+    }
+
+
+class FileDedupService:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def _find(self, sha256: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            file_object = db.query(FileObjectDB).filter(FileObjectDB.sha256 == sha256).with_for_update().first()
+            if file_object is None:
+                return None
+            file_object.upload_count = (file_object.upload_count or 1) + 1
+            file_object.last_uploaded_at = datetime.utcnow()
+            db.commit()
+            return _to_dict(file_object)
+        finally:
+            db.close()
+
+    async def find(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored object by hash, counting the lookup as a duplicate upload
+        """
+        return await run_in_threadpool(self._find, sha256)
+
+    def _record(
+        self,
+        sha256: str,
+        s3_key: str,
+        content_type: Optional[str],
+        size: int,
+        metadata: Dict[str, Any],
+        processing_seconds: float
+    ) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            file_object = FileObjectDB(
+                sha256=sha256,
+                s3_key=s3_key,
+                content_type=content_type,
+                size=size,
+                file_metadata=metadata,
+                processing_seconds=processing_seconds,
+                upload_count=1
+            )
+            db.add(file_object)
+            db.commit()
+            return _to_dict(file_object)
+        except IntegrityError:
+            # Another worker stored the same content first
+            db.rollback()
+            logger.info(f"File object {sha256} was recorded concurrently")
+            return self._find(sha256)
+        finally:
+            db.close()
+
+    async def record(
+        self,
+        sha256: str,
+        s3_key: str,
+        content_type: Optional[str],
+        size: int,
+        metadata: Dict[str, Any],
+        processing_seconds: float
+    ) -> Dict[str, Any]:
+        """
+        Record a newly stored object
+        """
+        return await run_in_threadpool(self._record, sha256, s3_key, content_type, size, metadata, processing_seconds)
+
+    def _update(self, sha256: str, metadata: Dict[str, Any], processing_seconds: float) -> None:
+        db = self.session_factory()
+        try:
+            db.query(FileObjectDB).filter(FileObjectDB.sha256 == sha256).update(
+                {FileObjectDB.file_metadata: metadata, FileObjectDB.processing_seconds: processing_seconds},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def update(self, sha256: str, metadata: Dict[str, Any], processing_seconds: float) -> None:
+        """
+        Store the metadata and processing time of an object processed after it was recorded
+        """
+        await run_in_threadpool(self._update, sha256, metadata, processing_seconds)
+
+    def _filenames(self, s3_keys: Iterable[str]) -> Dict[str, str]:
+        db = self.session_factory()
+        try:
+            rows = db.query(FileObjectDB.s3_key, FileObjectDB.file_metadata).filter(
+                FileObjectDB.s3_key.in_(list(s3_keys))
+            ).all()
+            return {s3_key: metadata["filename"] for s3_key, metadata in rows if metadata and metadata.get("filename")}
+        finally:
+            db.close()
+
+    async def filenames(self, s3_keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Original filenames of stored objects by key (that of their first
+        upload); objects stored before content addressing are missing
+        """
+        return await run_in_threadpool(self._filenames, s3_keys)
+
+    def _forget(self, s3_key: str) -> Optional[int]:
+        db = self.session_factory()
+        try:
+            file_object = db.query(FileObjectDB).filter(FileObjectDB.s3_key == s3_key).with_for_update().first()
+            if file_object is None:
+                return None
+            remaining = (file_object.upload_count or 1) - 1
+            if remaining > 0:
+                file_object.upload_count = remaining
+            else:
+                db.delete(file_object)
+            db.commit()
+            return remaining
+        finally:
+            db.close()
+
+    async def forget(self, s3_key: str) -> Optional[int]:
+        """
+        Count one upload of a stored object as deleted and return the uploads
+        left; the object is shared by every upload of its content, so it may
+        only be deleted once none is left. At zero the record is dropped, so
+        that uploading the content again stores a new object instead of
+        pointing at the deleted one. None if the object has no record (stored
+        before content addressing).
+        """
+        return await run_in_threadpool(self._forget, s3_key)
+
+    def _get_stats(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            duplicates = FileObjectDB.upload_count - 1
+            objects, uploads, bytes_stored, bytes_saved, seconds_saved = db.query(
+                func.count(FileObjectDB.id),
+                func.coalesce(func.sum(FileObjectDB.upload_count), 0),
+                func.coalesce(func.sum(FileObjectDB.size), 0),
+                func.coalesce(func.sum(duplicates * FileObjectDB.size), 0),
+                func.coalesce(func.sum(duplicates * FileObjectDB.processing_seconds), 0.0)
+            ).one()
+            return {
+                "objects": objects,
+                "uploads": int(uploads),
+                "deduplicatedUploads": int(uploads) - objects,
+                "bytesStored": int(bytes_stored),
+                "bytesSaved": int(bytes_saved),
+                "processingSecondsSaved": float(seconds_saved),
+            }
+        finally:
+            db.close()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Storage and processing time saved by deduplication, across all workers
+        """
+        return await run_in_threadpool(self._get_stats)
+
+
+# Singleton instance
+_file_dedup_service: Optional[FileDedupService] = None
+_file_dedup_service_lock = threading.Lock()
+
+
+def get_file_dedup_service() -> FileDedupService:
+    """Get or create the shared file dedup service."""
+    global _file_dedup_service
+    if _file_dedup_service is None:
+        with _file_dedup_service_lock:
+            if _file_dedup_service is None:
+                _file_dedup_service = FileDedupService()
+    return _file_dedup_service
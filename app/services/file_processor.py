@@ -1,46 +1,81 @@
-from typing import Dict, Any, Optional
-import magic
+from typing import AsyncIterator, Dict, Any, Optional
 import os
-from PIL import Image
-import pytesseract
+import tempfile
 from app.core.config import settings
-import boto3
-from botocore.exceptions import ClientError
+from app.core.metrics import instrument_s3_client
+from app.core.tracing import traced, tracer
+import asyncio
 import logging
 import io
+import threading
 
 logger = logging.getLogger(__name__)
 
 class FileProcessor:
+    """
+    Type detection and content extraction of uploaded files. libmagic,
+    Pillow, pypdf and the OCR stack are imported on first use rather than
+    with the module, so that importing the app stays fast.
+    """
+
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
-        )
+        self._s3_client = None
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client(
+                's3',
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_REGION
+            )
+            instrument_s3_client(self._s3_client)
+        return self._s3_client
 
-    async def process_file(self, file_path: str, file_content: bytes) -> Dict[str, Any]:
+    def detect_type(self, file_content: bytes) -> str:
         """
-        Process a file and extract relevant information
+        Sniff the MIME type of a file, raising ValueError for unsupported types
         """
-        try:
-            # Detect file type
+        import magic
+        with tracer.start_as_current_span("file.detect_type") as span:
             file_type = magic.from_buffer(file_content, mime=True)
-            
-            # Validate file type
-            if file_type not in settings.ALLOWED_FILE_TYPES:
-                raise ValueError(f"Unsupported file type: {file_type}")
+            span.set_attribute("file.type", file_type)
+            span.set_attribute("file.size", len(file_content))
+        if file_type not in settings.ALLOWED_FILE_TYPES:
+            raise ValueError(f"Unsupported file type: {file_type}")
+        return file_type
+
+    @traced("file.process", {"file.path": "file_path"})
+    async def process_file(self, file_path: str, file_content: bytes, file_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a file and extract relevant information. ``file_type`` skips
+        sniffing a type already returned by detect_type.
+        """
+        try:
+            if file_type is None:
+                file_type = self.detect_type(file_content)
             
             # Extract metadata
             metadata = self._extract_metadata(file_path, file_content, file_type)
             
             # Process based on file type
             if file_type.startswith('image/'):
-                metadata.update(self._process_image(file_content))
+                # Decoding and OCR are CPU-bound, keep them off the event loop
+                loop = asyncio.get_running_loop()
+                with tracer.start_as_current_span("file.process_image") as span:
+                    metadata.update(await loop.run_in_executor(None, self._process_image, file_content))
+                    if "ocr_timings_ms" in metadata:
+                        span.set_attribute("ocr.skipped", metadata["ocr_skipped"])
+                        for stage, milliseconds in metadata["ocr_timings_ms"].items():
+                            span.set_attribute(f"ocr.{stage}_ms", milliseconds)
             elif file_type == 'application/pdf':
-                metadata.update(self._process_pdf(file_content))
+                # Parsing the document is CPU-bound too
+                loop = asyncio.get_running_loop()
+                with tracer.start_as_current_span("file.process_pdf"):
+                    metadata.update(await loop.run_in_executor(None, self._process_pdf, file_content))
             
             return metadata
             
@@ -63,6 +98,8 @@ class FileProcessor:
         """
         Process image files
         """
+        from PIL import Image
+        from app.services.ocr import ocr_image
         try:
             image = Image.open(io.BytesIO(file_content))
             metadata = {
@@ -74,8 +111,15 @@ class FileProcessor:
             
             # Perform OCR if enabled
             if settings.ENABLE_OCR:
-                text = pytesseract.image_to_string(image, lang=settings.OCR_LANGUAGE)
-                metadata["ocr_text"] = text
+                result = ocr_image(image)
+                metadata["ocr_text"] = result["text"]
+                metadata["ocr_skipped"] = result["skipped"]
+                metadata["ocr_timings_ms"] = {stage: round(ms, 1) for stage, ms in result["timings"].items()}
+                logger.info(
+                    f"OCR of {image.width}x{image.height} image: "
+                    + ("skipped, no text detected" if result["skipped"] else f"{result['strips']} strips")
+                    + f" {metadata['ocr_timings_ms']}"
+                )
             
             return metadata
         except Exception as e:
@@ -84,15 +128,46 @@ class FileProcessor:
 
     def _process_pdf(self, file_content: bytes) -> Dict[str, Any]:
         """
-        Process PDF files
+        Process PDF files: document metadata only, the page text is streamed
+        separately by stream_pdf_pages
+        """
+        from pypdf import PdfReader
+        from app.services.pdf_extraction import read_pdf_metadata
+        try:
+            return read_pdf_metadata(PdfReader(io.BytesIO(file_content)))
+        except Exception as e:
+            logger.error(f"Error processing PDF: {str(e)}")
+            return {}
+
+    async def stream_pdf_pages(self, file_content: bytes) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the pages of a PDF in order, extracted in parallel with OCR for
+        pages without a text layer, up to PDF_MAX_PAGES pages
+        """
+        from app.services.pdf_extraction import iter_pdf_pages
+        # Worker processes read the PDF from disk rather than receiving the bytes
+        loop = asyncio.get_running_loop()
+        temp_path = await loop.run_in_executor(None, self._write_temp_pdf, file_content)
+        try:
+            async for page in iter_pdf_pages(temp_path, max_pages=settings.PDF_MAX_PAGES):
+                yield page
+        finally:
+            os.unlink(temp_path)
+
+    def _write_temp_pdf(self, file_content: bytes) -> str:
+        """
+        Write a PDF to a temporary file and return its path
         """
-        # TODO: Implement PDF processing
-        return {}
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(file_content)
+        return temp_file.name
 
+    @traced("s3.upload_to_s3", {"file.path": "file_path"})
     async def upload_to_s3(self, file_path: str, file_content: bytes, metadata: Dict[str, Any]) -> str:
         """
         Upload file to S3 with metadata
         """
+        from botocore.exceptions import ClientError
         try:
             key = f"uploads/{metadata['filename']}"
             self.s3_client.put_object(
@@ -104,4 +179,19 @@ class FileProcessor:
             return key
         except ClientError as e:
             logger.error(f"Error uploading to S3: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+
+# Singleton instance
+_file_processor: Optional[FileProcessor] = None
+_file_processor_lock = threading.Lock()
+
+
+def get_file_processor() -> FileProcessor:
+    """Get or create the shared file processor."""
+    global _file_processor
+    if _file_processor is None:
+        with _file_processor_lock:
+            if _file_processor is None:
+                _file_processor = FileProcessor()
+    return _file_processor
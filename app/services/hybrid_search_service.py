@@ -0,0 +1,156 @@
+"""
+Hybrid file search: a BM25 (multi_match) leg and a kNN leg run concurrently
+against Elasticsearch and are merged with reciprocal rank fusion.
+
+Both legs share one latency budget. A leg that has not answered when the
+budget runs out, or that fails, is dropped and the other leg's ranking is
+returned on its own, so one slow leg cannot stall the whole request.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.search_service import SearchService, build_lexical_query
+from app.services.semantic_search_service import (
+    SOURCE_EXCLUDES, SemanticSearchService, best_passage, build_passage_knn, get_semantic_search_service
+)
+import asyncio
+import logging
+import time
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: each id scores ``sum(1 / (k + rank))`` over the lists
+    it appears in (rank starting at 1). Returns (id, score) best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings.values():
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridSearchService:
+    def __init__(
+        self,
+        search_service: Optional[SearchService] = None,
+        semantic_search_service: Optional[SemanticSearchService] = None
+    ):
+        self.search_service = search_service or SearchService()
+        self.semantic_search_service = semantic_search_service or get_semantic_search_service()
+        self.es = self.search_service.es
+        self.index = self.search_service.index
+
+    async def _lexical_hits(self, query: str, filters: Optional[Dict[str, Any]], window: int) -> List[Dict[str, Any]]:
+        response = await self.es.search(
+            index=self.index,
+            body={
+                "query": build_lexical_query(query, filters),
+                "size": window,
+                "_source": {"excludes": SOURCE_EXCLUDES}
+            }
+        )
+        return response["hits"]["hits"]
+
+    async def _vector_hits(self, query: str, filters: Optional[Dict[str, Any]], window: int) -> List[Dict[str, Any]]:
+        query_embedding = await self.semantic_search_service.embed_query(query)
+        response = await self.es.search(
+            index=self.index,
+            body={
+                "knn": build_passage_knn(query_embedding, window, filters),
+                "size": window,
+                "_source": {"excludes": SOURCE_EXCLUDES}
+            }
+        )
+        return response["hits"]["hits"]
+
+    async def search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        page: int = 1,
+        size: int = 10,
+        budget_ms: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Hybrid search with RRF, returning one page of fused results and the
+        status and latency of each leg
+        """
+        budget = (budget_ms or settings.HYBRID_SEARCH_BUDGET_MS) / 1000
+        # Each leg must rank deep enough to fill the requested page
+        window = max(settings.HYBRID_SEARCH_RANK_WINDOW, page * size)
+
+        start_time = time.perf_counter()
+        legs = {
+            "lexical": asyncio.create_task(self._lexical_hits(query, filters, window)),
+            "vector": asyncio.create_task(self._vector_hits(query, filters, window)),
+        }
+        finished_at: Dict[str, float] = {}
+        for name, task in legs.items():
+            task.add_done_callback(lambda _, name=name: finished_at.setdefault(name, time.perf_counter()))
+        done, pending = await asyncio.wait(legs.values(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        rankings: Dict[str, List[str]] = {}
+        sources: Dict[str, Dict[str, Any]] = {}
+        passages: Dict[str, Dict[str, Any]] = {}
+        leg_stats: Dict[str, Dict[str, Any]] = {}
+        for name, task in legs.items():
+            if task in pending:
+                logger.warning(f"Hybrid search {name} leg exceeded the {budget * 1000:.0f}ms budget, dropped")
+                leg_stats[name] = {"status": "timeout", "hits": 0, "took_ms": elapsed_ms}
+                continue
+            if task.exception() is not None:
+                logger.error(f"Hybrid search {name} leg failed: {str(task.exception())}")
+                leg_stats[name] = {"status": "error", "hits": 0, "took_ms": (finished_at[name] - start_time) * 1000}
+                continue
+            hits = task.result()
+            rankings[name] = [hit["_id"] for hit in hits]
+            for hit in hits:
+                sources.setdefault(hit["_id"], hit["_source"])
+                passage = best_passage(hit)
+                if passage is not None:
+                    passages[hit["_id"]] = passage
+            leg_stats[name] = {"status": "ok", "hits": len(hits), "took_ms": (finished_at[name] - start_time) * 1000}
+
+        fused = reciprocal_rank_fusion(rankings, k=settings.HYBRID_SEARCH_RRF_K)
+        ranks = {name: {doc_id: rank for rank, doc_id in enumerate(ids, start=1)} for name, ids in rankings.items()}
+        results = [
+            {
+                **sources[doc_id],
+                "id": doc_id,
+                "score": score,
+                "best_passage": passages.get(doc_id),
+                "ranks": {name: leg_ranks[doc_id] for name, leg_ranks in ranks.items() if doc_id in leg_ranks}
+            }
+            for doc_id, score in fused[(page - 1) * size:page * size]
+        ]
+
+        return {
+            "results": results,
+            # Bounded by the rank window of each leg
+            "total": len(fused),
+            "page": page,
+            "size": size,
+            "legs": leg_stats,
+            "took_ms": (time.perf_counter() - start_time) * 1000
+        }
+
+
+# Singleton instance
+_hybrid_search_service: Optional[HybridSearchService] = None
+_hybrid_search_service_lock = threading.Lock()
+
+
+def get_hybrid_search_service() -> HybridSearchService:
+    """Get or create the shared hybrid search service."""
+    global _hybrid_search_service
+    if _hybrid_search_service is None:
+        with _hybrid_search_service_lock:
+            if _hybrid_search_service is None:
+                _hybrid_search_service = HybridSearchService()
+    return _hybrid_search_service
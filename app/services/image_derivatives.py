@@ -0,0 +1,123 @@
+"""
+Downscaled WebP derivatives (thumbnails and previews) of uploaded images.
+
+Derivatives are generated once per stored object in a background process
+pool and written to S3 under keys derived from the original's key, so list
+views can show a few-kilobyte thumbnail instead of the full-resolution
+original. Original keys are content-addressed, so a derivative never changes
+and can be cached indefinitely.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+from app.core.config import settings
+from app.services.s3_service import DERIVATIVES_PREFIX, S3Service, get_s3_service
+import asyncio
+import io
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Name -> longest edge in pixels, largest first
+DERIVATIVE_SIZES = {
+    "preview": 1024,
+    "thumb": 256,
+}
+DERIVATIVE_CONTENT_TYPE = "image/webp"
+DERIVATIVE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_derivative_process_pool() -> ProcessPoolExecutor:
+    """Get or create the process pool used for image decoding and encoding."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS or os.cpu_count())
+    return _process_pool
+
+
+def derivative_key(file_key: str, name: str) -> str:
+    return f"{DERIVATIVES_PREFIX}{name}/{os.path.splitext(file_key)[0]}.webp"
+
+
+def generate_derivatives(file_content: bytes, quality: int = 80) -> Dict[str, bytes]:
+    """
+    Encode every derivative of an image as WebP. Runs in a worker process.
+
+    JPEGs are decoded in draft mode at the smallest DCT scale that still
+    covers the largest derivative, which skips most of the decoding work for
+    camera-sized photos. Each smaller derivative is then scaled from the
+    previous one rather than from the original.
+    """
+    from PIL import Image, ImageOps
+    with Image.open(io.BytesIO(file_content)) as image:
+        largest = max(DERIVATIVE_SIZES.values())
+        # No-op for formats other than JPEG
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        derivatives = {}
+        for name, size in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=quality, method=4)
+            derivatives[name] = output.getvalue()
+        return derivatives
+
+
+class ImageDerivativeService:
+    def __init__(self, s3_service: Optional[S3Service] = None):
+        self.s3_service = s3_service or get_s3_service()
+        # Keep references to background tasks until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def create_derivatives(self, file_key: str, file_content: bytes) -> Dict[str, str]:
+        """
+        Generate and store the derivatives of an image, returning their keys
+        """
+        loop = asyncio.get_running_loop()
+        derivatives = await loop.run_in_executor(
+            get_derivative_process_pool(), generate_derivatives, file_content, settings.IMAGE_DERIVATIVE_QUALITY
+        )
+        keys = {}
+        for name, content in derivatives.items():
+            keys[name] = derivative_key(file_key, name)
+            await self.s3_service.upload_file(
+                keys[name], content, DERIVATIVE_CONTENT_TYPE, cache_control=DERIVATIVE_CACHE_CONTROL
+            )
+        logger.info(f"Stored derivatives of {file_key}: " + ", ".join(
+            f"{name} {len(content) / 1024:.1f}KiB" for name, content in derivatives.items()
+        ))
+        return keys
+
+    def schedule(self, file_key: str, file_content: bytes) -> None:
+        """
+        Create the derivatives in the background, off the request path
+        """
+        async def run() -> None:
+            try:
+                await self.create_derivatives(file_key, file_content)
+            except Exception as e:
+                logger.error(f"Error creating derivatives of {file_key}: {str(e)}")
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Singleton instance
+_image_derivative_service: Optional[ImageDerivativeService] = None
+_image_derivative_service_lock = threading.Lock()
+
+
+def get_image_derivative_service() -> ImageDerivativeService:
+    """Get or create the shared image derivative service."""
+    global _image_derivative_service
+    if _image_derivative_service is None:
+        with _image_derivative_service_lock:
+            if _image_derivative_service is None:
+                _image_derivative_service = ImageDerivativeService()
+    return _image_derivative_service
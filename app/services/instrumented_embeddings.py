@@ -0,0 +1,32 @@
+"""
+Embeddings wrapper recording the batch size and latency of model calls.
+Imported when the first model is built, as it pulls in LangChain.
+"""
+from typing import Any, List
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_SECONDS
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """
+    Records the batch size and latency of every call to the wrapped model.
+    Other attributes are those of the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self._batch_size = EMBEDDING_BATCH_SIZE.labels(model)
+        self._seconds = EMBEDDING_SECONDS.labels(model)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._batch_size.observe(len(texts))
+        with self._seconds.time():
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._batch_size.observe(1)
+        with self._seconds.time():
+            return self.embeddings.embed_query(text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embeddings, name)
@@ -0,0 +1,129 @@
+"""
+Process-wide registry of embedding models.
+
+Each (provider, model) pair is loaded once and shared by every service that
+asks for it, instead of each service (and each module importing it) loading
+its own copy of the weights. Models listed in PRELOAD_EMBEDDING_MODELS are
+loaded when the app module is imported, so a pre-forking server (e.g.
+``gunicorn --preload``) loads them once in the master and the workers share
+the pages copy-on-write.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+import logging
+import os
+import resource
+import threading
+import time
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of the process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+
+
+def _build_embeddings(provider: str, model: str) -> "Embeddings":
+    if provider.startswith("mistral"):
+        from langchain_mistralai import MistralAIEmbeddings
+        if settings.MISTRAL_BASE_URL:
+            return MistralAIEmbeddings(model=model, endpoint=settings.MISTRAL_BASE_URL.rstrip("/") + "/")
+        return MistralAIEmbeddings(model=model)
+    elif provider.startswith("openai"):
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model)
+    elif provider.startswith("huggingface"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model)
+    elif provider == "onnx":
+        from app.services.onnx_embeddings import create_onnx_embeddings
+        return create_onnx_embeddings(model)
+    else:
+        raise ValueError(f"Unsupported embeddings model: {model}")
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], "Embeddings"] = {}
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_embeddings(self, provider: str, model: str) -> "Embeddings":
+        """
+        Get the shared embeddings instance for a provider and model, loading it on first use
+        """
+        key = (provider, model)
+        embeddings = self._models.get(key)
+        if embeddings is not None:
+            return embeddings
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # Per-model lock: concurrent first callers wait for a single load
+        with key_lock:
+            embeddings = self._models.get(key)
+            if embeddings is None:
+                from app.services.instrumented_embeddings import InstrumentedEmbeddings
+                rss_before = resident_memory_bytes()
+                start_time = time.perf_counter()
+                embeddings = InstrumentedEmbeddings(_build_embeddings(provider, model), model)
+                self._stats[key] = {
+                    "provider": provider,
+                    "model": model,
+                    "loadSeconds": time.perf_counter() - start_time,
+                    "residentBytes": max(0, resident_memory_bytes() - rss_before),
+                    "loadedInPid": os.getpid(),
+                }
+                self._models[key] = embeddings
+                logger.info(f"Loaded {provider} embeddings {model} in {self._stats[key]['loadSeconds']:.2f}s")
+        return embeddings
+
+    def preload(self, models: List[Tuple[str, str]]) -> None:
+        for provider, model in models:
+            try:
+                self.get_embeddings(provider, model)
+            except Exception as e:
+                logger.error(f"Failed to preload {provider} embeddings {model}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "residentBytes": resident_memory_bytes(),
+            "models": list(self._stats.values()),
+        }
+
+
+# Singleton instance
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create the process-wide model registry."""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry()
+    return _model_registry
+
+
+def preload_configured_models() -> None:
+    """
+    Load the models listed in PRELOAD_EMBEDDING_MODELS ("provider:model,...").
+    """
+    specs = []
+    for spec in settings.PRELOAD_EMBEDDING_MODELS.split(","):
+        if spec.strip():
+            provider, _, model = spec.strip().partition(":")
+            specs.append((provider, model))
+    if specs:
+        get_model_registry().preload(specs)
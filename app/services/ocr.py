@@ -0,0 +1,245 @@
+"""
+OCR of uploaded images and scanned PDF pages.
+
+Tesseract's run time grows with the pixel count, and phone photos of
+documents carry far more pixels than it needs: text is recognised best at
+around 300 DPI. Images are therefore decoded at reduced size, downsampled to
+the target resolution, flattened against uneven lighting and binarized, and
+tall pages are split at blank rows into strips that are recognised in
+parallel. Images that do not look like a document (photos, illustrations)
+skip OCR altogether.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+from app.core.config import settings
+import io
+import logging
+import math
+import os
+import pytesseract
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tesseract shells out to a subprocess per call, so threads are enough to
+# recognise strips in parallel. Each tesseract process is limited to one
+# thread so parallel strips do not oversubscribe the CPUs; the limit is set in
+# their environment only, not in that of the app's own OpenMP runtimes.
+TESSERACT_THREAD_LIMIT = "1"
+
+# Size of the copy used for text detection
+DETECTION_EDGE_PIXELS = 512
+# A document binarizes cleanly (paper vs. ink) with a small fraction of ink,
+# and that ink is thin strokes: little of it survives a 3x3 erosion at
+# detection size, unlike the solid shapes of a photo
+MIN_SEPARABILITY = 0.65
+MIN_INK_FRACTION = 0.002
+MAX_INK_FRACTION = 0.3
+MAX_SOLID_INK = 0.4
+# Strip cuts are moved to the blankest row within this fraction of the strip height
+CUT_SEARCH_FRACTION = 0.25
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_ocr_thread_pool() -> ThreadPoolExecutor:
+    """Get or create the thread pool that runs tesseract on strips."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=settings.OCR_WORKERS or os.cpu_count())
+    return _thread_pool
+
+
+def ocr_scale(image: Image.Image, target_dpi: int, max_pixels: int) -> float:
+    """
+    Factor to scale an image by before OCR: down to ``target_dpi`` when the
+    image records a higher resolution, and to at most ``max_pixels`` pixels
+    (phone photos usually record 72 DPI whatever their size). The cap is on
+    the area rather than an edge so that long receipts keep their width.
+    Images are never upscaled.
+    """
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if dpi and float(dpi[0]) > target_dpi:
+        scale = target_dpi / float(dpi[0])
+    pixels = image.width * image.height * scale ** 2
+    if pixels > max_pixels:
+        scale *= math.sqrt(max_pixels / pixels)
+    return scale
+
+
+def load_grayscale(image: Image.Image, target_dpi: int, max_pixels: int) -> Image.Image:
+    """
+    Decode an image as upright grayscale at OCR resolution. JPEGs are decoded
+    in draft mode, at the smallest DCT scale still above the target size.
+    """
+    scale = ocr_scale(image, target_dpi, max_pixels)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # No-op for formats other than JPEG, and for images already decoded
+    image.draft("L", size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparent areas are paper, not ink
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image.convert("RGBA"))
+    gray = image.convert("L")
+    if image.size != size and (gray.width > size[0] or gray.height > size[1]):
+        # The size after exif_transpose may be rotated
+        target = size if (gray.width >= gray.height) == (size[0] >= size[1]) else size[::-1]
+        gray = gray.resize(target, Image.Resampling.LANCZOS)
+    return gray
+
+
+def flatten(gray: Image.Image) -> Image.Image:
+    """
+    Remove uneven lighting: subtract a background estimate (the local maximum
+    of a coarse copy, which erases the ink) so that paper becomes white
+    """
+    coarse = gray.reduce(16) if min(gray.size) >= 64 else gray
+    background = coarse.filter(ImageFilter.MaxFilter(5)).filter(ImageFilter.GaussianBlur(2))
+    background = background.resize(gray.size, Image.Resampling.BILINEAR)
+    return ImageOps.invert(ImageChops.subtract(background, gray))
+
+
+def otsu_threshold(histogram: List[int]) -> Tuple[int, float]:
+    """
+    Otsu's threshold of a grayscale histogram, with its separability: the
+    share of the variance explained by splitting at the threshold (1.0 for a
+    perfectly two-tone image)
+    """
+    total = sum(histogram)
+    if not total:
+        return 127, 0.0
+    sum_all = sum(value * count for value, count in enumerate(histogram))
+    mean = sum_all / total
+    variance = sum(count * (value - mean) ** 2 for value, count in enumerate(histogram)) / total
+    best_threshold, best_between = 127, 0.0
+    weight, weighted_sum = 0, 0
+    for threshold, count in enumerate(histogram):
+        weight += count
+        weighted_sum += threshold * count
+        if weight == 0:
+            continue
+        if weight == total:
+            break
+        dark_mean = weighted_sum / weight
+        light_mean = (sum_all - weighted_sum) / (total - weight)
+        between = weight * (total - weight) * (dark_mean - light_mean) ** 2 / total ** 2
+        if between > best_between:
+            best_threshold, best_between = threshold, between
+    return best_threshold, best_between / variance if variance else 0.0
+
+
+def binarize(gray: Image.Image, threshold: int) -> Image.Image:
+    return gray.point([0 if value <= threshold else 255 for value in range(256)])
+
+
+def text_likelihood(flattened: Image.Image) -> Dict[str, float]:
+    """
+    Features of a flattened image used to tell documents from photos
+    """
+    small = flattened.copy()
+    small.thumbnail((DETECTION_EDGE_PIXELS, DETECTION_EDGE_PIXELS), Image.Resampling.BILINEAR)
+    threshold, separability = otsu_threshold(small.histogram())
+    binary = binarize(small, threshold)
+    ink = binary.histogram()[0]
+    solid = binary.filter(ImageFilter.MaxFilter(3)).histogram()[0]
+    return {
+        "separability": separability,
+        "inkFraction": ink / max(1, small.width * small.height),
+        "solidInk": solid / max(1, ink),
+    }
+
+
+def looks_like_text(features: Dict[str, float]) -> bool:
+    return (
+        features["separability"] >= MIN_SEPARABILITY
+        and MIN_INK_FRACTION <= features["inkFraction"] <= MAX_INK_FRACTION
+        and features["solidInk"] <= MAX_SOLID_INK
+    )
+
+
+def split_strips(binary: Image.Image, tile_height: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Boxes of horizontal strips of about ``tile_height`` rows, cut at the
+    blankest row near each cut so that no line of text is split
+    """
+    if binary.height <= tile_height * 1.5:
+        return [(0, 0, binary.width, binary.height)]
+    # Mean of each row: 255 is a blank row
+    rows = binary.resize((1, binary.height), Image.Resampling.BOX).tobytes()
+    window = int(tile_height * CUT_SEARCH_FRACTION)
+    cuts = [0]
+    while binary.height - cuts[-1] > tile_height * 1.5:
+        target = cuts[-1] + tile_height
+        candidates = range(target - window, min(target + window, binary.height - 1))
+        # Blankest row, nearest the target on ties
+        cuts.append(max(candidates, key=lambda row: (rows[row], -abs(row - target))))
+    cuts.append(binary.height)
+    return [(0, top, binary.width, bottom) for top, bottom in zip(cuts, cuts[1:])]
+
+
+def _recognise(image: Image.Image, lang: str) -> str:
+    # pytesseract runs tesseract with the process environment, so it is
+    # called directly, with the image on stdin and the text on stdout
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    env = dict(os.environ)
+    env.setdefault("OMP_THREAD_LIMIT", TESSERACT_THREAD_LIMIT)
+    try:
+        process = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", lang],
+            input=buffer.getvalue(), capture_output=True, env=env
+        )
+    except FileNotFoundError:
+        raise pytesseract.TesseractNotFoundError()
+    if process.returncode:
+        raise pytesseract.TesseractError(process.returncode, process.stderr.decode(errors="replace").strip())
+    return process.stdout.decode("utf-8")
+
+
+def ocr_image(image: Image.Image, lang: Optional[str] = None, parallel: bool = True) -> Dict[str, Any]:
+    """
+    OCR an image, returning its text with per-stage timings in milliseconds
+    (``decode``, ``preprocess``, ``detect``, ``ocr``). Text is empty when the
+    image was skipped as not being a document.
+    """
+    lang = lang or settings.OCR_LANGUAGE
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = (now - start) * 1000
+        start = now
+
+    gray = load_grayscale(image, settings.OCR_TARGET_DPI, settings.OCR_MAX_PIXELS)
+    lap("decode")
+    flattened = flatten(gray)
+    lap("preprocess")
+    features = text_likelihood(flattened)
+    is_text = looks_like_text(features)
+    lap("detect")
+    result: Dict[str, Any] = {"text": "", "skipped": False, "strips": 0, "features": features}
+    if settings.OCR_SKIP_NON_TEXT and not is_text:
+        result["skipped"] = True
+        result["timings"] = timings
+        return result
+
+    threshold, _ = otsu_threshold(flattened.histogram())
+    binary = binarize(flattened, threshold)
+    strips = [binary.crop(box) for box in split_strips(binary, settings.OCR_TILE_HEIGHT)]
+    timings["preprocess"] += (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    if parallel and len(strips) > 1:
+        texts = list(get_ocr_thread_pool().map(lambda strip: _recognise(strip, lang), strips))
+    else:
+        texts = [_recognise(strip, lang) for strip in strips]
+    lap("ocr")
+    result["text"] = "\n".join(text.strip("\n") for text in texts if text.strip())
+    result["strips"] = len(strips)
+    result["timings"] = timings
+    return result
@@ -0,0 +1,151 @@
+"""
+CPU embeddings on ONNX Runtime with an int8 dynamically-quantized export of a
+sentence-transformers model.
+
+Requires the optional ``onnx`` dependencies (``onnxruntime``, plus ``optimum``
+to export the model). Export once at build time so workers only need
+onnxruntime and the tokenizer:
+
+    python -m app.services.onnx_embeddings sentence-transformers/all-MiniLM-L6-v2
+"""
+from typing import Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+def export_dir_for(model_name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def export_quantized_model(model_name: str, cache_dir: str) -> str:
+    """
+    Export a transformers model to ONNX and quantize its weights to int8,
+    returning the export directory. A no-op if the export already exists.
+    """
+    export_dir = export_dir_for(model_name, cache_dir)
+    if os.path.exists(os.path.join(export_dir, QUANTIZED_MODEL_FILE)):
+        return export_dir
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise ImportError(
+            "Exporting ONNX embeddings requires the optional 'onnx' dependencies "
+            "(pip install 'backend[onnx]')"
+        ) from e
+
+    logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(export_dir)
+    quantize_dynamic(
+        os.path.join(export_dir, "model.onnx"),
+        os.path.join(export_dir, QUANTIZED_MODEL_FILE),
+        weight_type=QuantType.QInt8
+    )
+    return export_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Mean-pooled sentence embeddings from an int8 ONNX export.
+
+    Texts are tokenized once, sorted by length and batched, and each batch is
+    padded only to its own longest sequence, so short texts never pay for the
+    padding of long ones.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        batch_size: int = 32,
+        max_length: int = 256,
+        normalize: bool = True,
+        intra_op_threads: int = 0
+    ):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "ONNX embeddings require the optional 'onnx' dependencies (pip install 'backend[onnx]')"
+            ) from e
+
+        export_dir = export_quantized_model(model_name, cache_dir)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.normalize = normalize
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            os.path.join(export_dir, QUANTIZED_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, token_ids: List[List[int]]) -> np.ndarray:
+        length = max(len(ids) for ids in token_ids)
+        input_ids = np.full((len(token_ids), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(token_ids), length), dtype=np.int64)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+
+        feed: Dict[str, Any] = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        hidden_states = self.session.run(None, feed)[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden_states * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        token_ids = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)["input_ids"]
+        # Length-bucketed batching: neighbours in sorted order have similar lengths
+        order = sorted(range(len(texts)), key=lambda i: len(token_ids[i]))
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            vectors = self._encode_batch([token_ids[i] for i in indices])
+            for i, vector in zip(indices, vectors):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_onnx_embeddings(model_name: str) -> OnnxEmbeddings:
+    return OnnxEmbeddings(
+        model_name,
+        cache_dir=settings.ONNX_MODEL_DIR,
+        batch_size=settings.ONNX_BATCH_SIZE,
+        max_length=settings.ONNX_MAX_LENGTH,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    model = sys.argv[1] if len(sys.argv) > 1 else settings.SEMANTIC_SEARCH_MODEL
+    print(export_quantized_model(model, settings.ONNX_MODEL_DIR))
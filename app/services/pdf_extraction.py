@@ -0,0 +1,142 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+from pypdf import PdfReader
+from app.core.config import settings
+from app.services.ocr import ocr_image
+import asyncio
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Pages with less extracted text than this are treated as having no text layer
+MIN_TEXT_LAYER_CHARS = 16
+# Page ranges handed out per worker: a few each balances the load, but every
+# range re-opens the PDF in its worker, so many small ranges cost more than
+# they gain
+RANGES_PER_WORKER = 4
+MIN_PAGES_PER_TASK = 8
+
+
+def pdf_worker_count() -> int:
+    return settings.PDF_WORKERS or os.cpu_count() or 1
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """Get or create the shared process pool used for PDF parsing."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=pdf_worker_count())
+    return _process_pool
+
+
+def count_pdf_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def read_pdf_metadata(reader: PdfReader) -> Dict[str, Any]:
+    """
+    Document-level metadata: page count and the info dictionary fields
+    """
+    info = reader.metadata or {}
+    metadata = {
+        "page_count": len(reader.pages),
+        "encrypted": reader.is_encrypted,
+    }
+    for key, field in (("title", "/Title"), ("author", "/Author"), ("subject", "/Subject"), ("producer", "/Producer")):
+        if info.get(field):
+            metadata[key] = str(info[field])
+    return metadata
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[Dict[str, Any]]:
+    """
+    Extract the text and layout metadata of pages [start, stop) of a PDF.
+    Runs in a worker process, each worker opening its own reader on the file.
+    """
+    reader = PdfReader(path)
+    pages = []
+    for number in range(start, stop):
+        page = reader.pages[number]
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Failed to extract text from page {number + 1} of {path}: {str(e)}")
+            text = ""
+        pages.append({
+            "page": number + 1,
+            "text": text,
+            "width": float(page.mediabox.width),
+            "height": float(page.mediabox.height),
+            "rotation": page.rotation,
+            "ocr": False,
+        })
+    return pages
+
+
+def _ocr_page(path: str, number: int) -> str:
+    """
+    OCR the images of a page without a text layer (a scanned page is a
+    single full-page image). Runs in a worker process, which already runs in
+    parallel with the other pages, so strips are recognised one at a time.
+    """
+    page = PdfReader(path).pages[number - 1]
+    texts = []
+    for image_file in page.images:
+        try:
+            texts.append(ocr_image(image_file.image, parallel=False)["text"])
+        except Exception as e:
+            logger.warning(f"Failed to OCR an image on page {number} of {path}: {str(e)}")
+    return "\n".join(texts)
+
+
+async def iter_pdf_pages(
+    path: str,
+    max_pages: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    ocr: Optional[bool] = None,
+    max_ocr_pages: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extract PDF page text in parallel across the process pool, yielding pages
+    in order as soon as each range is done.
+
+    Pages without a text layer are OCR'd (when OCR is enabled), up to
+    ``max_ocr_pages`` per document; OCR of a range starts as soon as its text
+    extraction finishes, so it overlaps the extraction of later ranges.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_process_pool()
+    ocr = settings.ENABLE_OCR if ocr is None else ocr
+    ocr_budget = settings.PDF_MAX_OCR_PAGES if max_ocr_pages is None else max_ocr_pages
+    page_count = await loop.run_in_executor(None, count_pdf_pages, path)
+    if max_pages is not None:
+        page_count = min(page_count, max_pages)
+    if pages_per_task is None:
+        pages_per_task = max(MIN_PAGES_PER_TASK, math.ceil(page_count / (pdf_worker_count() * RANGES_PER_WORKER)))
+    tasks = [
+        loop.run_in_executor(pool, _extract_page_range, path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    ocr_tasks: List[asyncio.Future] = []
+    try:
+        for task in tasks:
+            pages = await task
+            page_ocr: Dict[int, asyncio.Future] = {}
+            for page in pages:
+                if ocr and ocr_budget > 0 and len(page["text"].strip()) < MIN_TEXT_LAYER_CHARS:
+                    ocr_budget -= 1
+                    page_ocr[page["page"]] = loop.run_in_executor(pool, _ocr_page, path, page["page"])
+            ocr_tasks.extend(page_ocr.values())
+            for page in pages:
+                if page["page"] in page_ocr:
+                    text = await page_ocr[page["page"]]
+                    if text.strip():
+                        page = {**page, "text": text, "ocr": True}
+                yield page
+    finally:
+        for task in tasks + ocr_tasks:
+            task.cancel()
@@ -1,13 +1,20 @@
-import boto3
 import os
-from botocore.config import Config
+from typing import Optional
 from fastapi import UploadFile
 from app.core.config import settings
+from app.core.metrics import instrument_s3_client
+from app.core.tracing import traced
 import tempfile
+import asyncio
+import threading
 from datetime import datetime
 
+DERIVATIVES_PREFIX = "derivatives/"
+
 class S3Service:
     def __init__(self):
+        import boto3
+        from botocore.config import Config
         self.s3_client = boto3.client(
             's3',
             endpoint_url=settings.S3_ENDPOINT_URL,
@@ -16,23 +23,28 @@ class S3Service:
             config=Config(signature_version='s3v4'),
             region_name=settings.AWS_REGION
         )
+        instrument_s3_client(self.s3_client)
         self.bucket_name = settings.S3_BUCKET_NAME
 
-    async def upload_file(self, file_key: str, file_content: bytes, content_type: str) -> str:
+    @traced("s3.upload_file", {"s3.key": "file_key", "s3.content_type": "content_type"})
+    async def upload_file(self, file_key: str, file_content: bytes, content_type: str, cache_control: Optional[str] = None) -> str:
         """
         Upload a file to S3
         """
         try:
+            extra_args = {"CacheControl": cache_control} if cache_control else {}
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=file_key,
                 Body=file_content,
-                ContentType=content_type
+                ContentType=content_type,
+                **extra_args
             )
             return await self.get_presigned_url(file_key)
         except Exception as e:
             raise Exception(f"Error uploading file: {str(e)}")
 
+    @traced("s3.get_presigned_url", {"s3.key": "file_key"})
     async def get_presigned_url(self, file_key: str) -> str:
         """
         Generate a presigned URL for a file
@@ -46,6 +58,7 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Error generating presigned URL: {str(e)}")
 
+    @traced("s3.list_files")
     async def list_files(self) -> list:
         """
         List all files in the bucket
@@ -55,12 +68,16 @@ class S3Service:
         
         if 'Contents' in response:
             for obj in response['Contents']:
+                # Derivatives are listed through their original
+                if obj['Key'].startswith(DERIVATIVES_PREFIX):
+                    continue
                 url = self.s3_client.generate_presigned_url(
                     'get_object',
                     Params={'Bucket': self.bucket_name, 'Key': obj['Key']},
                     ExpiresIn=3600
                 )
                 files.append({
+                    "key": obj['Key'],
                     "filename": obj['Key'].strip(),
                     "url": url,
                     "size": obj['Size'],
@@ -69,6 +86,7 @@ class S3Service:
         
         return files
 
+    @traced("s3.download_file", {"s3.key": "file_key"})
     async def download_file(self, file_key: str) -> str:
         """
         Download a file from S3
@@ -84,6 +102,45 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Error downloading file: {str(e)}")
         
+    @traced("s3.get_object", {"s3.key": "file_key"})
+    async def get_object(self, file_key: str) -> dict:
+        """
+        Read a small object into memory, with its content type and cache headers
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                None, lambda: self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            )
+            body = await loop.run_in_executor(None, response['Body'].read)
+            return {
+                "body": body,
+                "content_type": response.get('ContentType'),
+                "cache_control": response.get('CacheControl'),
+                "etag": response.get('ETag'),
+            }
+        except Exception as e:
+            raise Exception(f"Error reading file: {str(e)}")
+
+    @traced("s3.download_to_tempfile", {"s3.key": "file_key"})
+    async def download_to_tempfile(self, file_key: str, suffix: str = "") -> str:
+        """
+        Stream a file from S3 to a temporary file without blocking the event loop
+        or buffering it in memory. The caller owns (and must delete) the file.
+        """
+        temp_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        try:
+            loop = asyncio.get_running_loop()
+            with temp_file:
+                await loop.run_in_executor(
+                    None, self.s3_client.download_fileobj, self.bucket_name, file_key, temp_file
+                )
+            return temp_file.name
+        except Exception as e:
+            os.unlink(temp_file.name)
+            raise Exception(f"Error downloading file: {str(e)}")
+
+    @traced("s3.get_file_metadata", {"s3.key": "file_id"})
     async def get_file_metadata(self, file_id: str) -> dict:
         """
         Get metadata of a file in S3
@@ -99,6 +156,7 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Error retrieving file metadata: {str(e)}")
 
+    @traced("s3.delete_file", {"s3.key": "file_key"})
     async def delete_file(self, file_key: str) -> None:
         """
         Delete a file from S3
@@ -114,3 +172,18 @@ class S3Service:
 def sanitized(filename: str) -> str:
     # Remove all spaces and convert to lowercase
     return filename.replace(' ', '').lower()
+
+
+# Singleton instance
+_s3_service: Optional[S3Service] = None
+_s3_service_lock = threading.Lock()
+
+
+def get_s3_service() -> S3Service:
+    """Get or create the shared S3 service (one boto3 client and connection pool)."""
+    global _s3_service
+    if _s3_service is None:
+        with _s3_service_lock:
+            if _s3_service is None:
+                _s3_service = S3Service()
+    return _s3_service
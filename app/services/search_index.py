@@ -0,0 +1,390 @@
+"""
+Bootstrap and management of the Elasticsearch files index.
+
+The index is versioned (``<alias>-v<N>``) and found through two aliases:
+``<alias>`` for searches and ``<alias>-write`` for writes. Changing
+the mappings means bumping INDEX_VERSION and running a reindex, which
+creates the new index, points the write alias at both the old and the new
+index, copies the old documents across (without overwriting anything written
+meanwhile) and then atomically moves both aliases to the new index, so
+neither reads nor writes see any downtime.
+
+Writers go through SearchIndexManager.index_document, update_document and
+delete_document. While a migration runs they apply every write to the old
+index, which holds every document, and then to the new one, so no write made
+during the copy is lost: updates of documents not copied yet are carried
+over in full, and documents the copy brought back after they were deleted
+are deleted again before the switch.
+
+    python -m app.services.search_index ensure|reindex|status
+"""
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from app.core.config import settings
+import asyncio
+import logging
+import time
+
+if TYPE_CHECKING:
+    from elasticsearch import AsyncElasticsearch
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever index_mappings() changes, then run a reindex
+INDEX_VERSION = 3
+
+# How long a writer trusts its view of the write alias. A migration waits this
+# long after changing the alias, so that every writer has seen the change
+WRITE_TARGETS_TTL = 5.0
+
+# Document ids checked per request when looking for deleted documents
+RECONCILE_BATCH_SIZE = 1000
+
+
+def write_alias_for(alias: str) -> str:
+    return f"{alias}-write"
+
+
+def index_settings() -> Dict[str, Any]:
+    return {
+        "number_of_shards": 1,
+        "refresh_interval": "1s",
+    }
+
+
+def _vector_mapping(embedding_dims: int) -> Dict[str, Any]:
+    return {
+        "type": "dense_vector",
+        "dims": embedding_dims,
+        "index": True,
+        "similarity": "cosine",
+        # int8 scalar-quantized HNSW: ~4x less vector memory, rescored on the raw floats
+        "index_options": {"type": "int8_hnsw", "m": 16, "ef_construction": 100},
+    }
+
+
+def index_mappings(embedding_dims: int) -> Dict[str, Any]:
+    text_with_keyword = {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}}
+    return {
+        # Unlisted string metadata is exact-match filterable rather than analysed text
+        "dynamic_templates": [
+            {"strings_as_keywords": {"match_mapping_type": "string", "mapping": {"type": "keyword", "ignore_above": 1024}}}
+        ],
+        "properties": {
+            "id": {"type": "keyword"},
+            "filename": text_with_keyword,
+            "content": {"type": "text"},
+            "ocr_text": {"type": "text"},
+            "content_type": {"type": "keyword"},
+            "file_type": {"type": "keyword"},
+            "extension": {"type": "keyword"},
+            "format": {"type": "keyword"},
+            "mode": {"type": "keyword"},
+            "url": {"type": "keyword", "index": False},
+            "size": {"type": "long"},
+            "width": {"type": "integer"},
+            "height": {"type": "integer"},
+            "created_at": {"type": "date"},
+            "metadata": {"type": "object", "dynamic": True},
+            # Whole-file vector of v1 documents; files are now embedded per passage
+            "embedding": _vector_mapping(embedding_dims),
+            "passages": {
+                "type": "nested",
+                "properties": {
+                    "text": {"type": "text"},
+                    "offset": {"type": "integer"},
+                    "page": {"type": "integer"},
+                    "vector": _vector_mapping(embedding_dims),
+                },
+            },
+        },
+    }
+
+
+class SearchIndexManager:
+    def __init__(self, es: "AsyncElasticsearch", alias: str, embedding_dims: int):
+        self.es = es
+        self.alias = alias
+        self.write_alias = write_alias_for(alias)
+        self.embedding_dims = embedding_dims
+        self._ready = False
+        self._lock = asyncio.Lock()
+        self._write_targets: List[str] = []
+        self._write_targets_expiry = 0.0
+
+    def versioned_name(self, version: int) -> str:
+        return f"{self.alias}-v{version}"
+
+    async def _alias_targets(self, alias: str) -> List[str]:
+        if not await self.es.indices.exists_alias(name=alias):
+            return []
+        return list((await self.es.indices.get_alias(name=alias)).keys())
+
+    async def _create_index(self, name: str) -> None:
+        if not await self.es.indices.exists(index=name):
+            await self.es.indices.create(
+                index=name,
+                settings=index_settings(),
+                mappings=index_mappings(self.embedding_dims)
+            )
+            logger.info(f"Created search index {name}")
+
+    async def _copy_documents(self, source: str, dest: str) -> Dict[str, Any]:
+        # op_type=create keeps documents already written to the new index
+        return await self.es.options(request_timeout=3600).reindex(
+            source={"index": source},
+            dest={"index": dest, "op_type": "create"},
+            conflicts="proceed",
+            wait_for_completion=True,
+            refresh=True
+        )
+
+    async def _drop_deleted(self, sources: List[str], dest: str) -> int:
+        """
+        Delete the documents of ``dest`` that none of ``sources`` holds anymore:
+        deleted while the copy ran, after the copy had read them
+        """
+        from elasticsearch.helpers import async_scan
+        dropped = 0
+        batch: List[str] = []
+        async for hit in async_scan(self.es, index=dest, query={"query": {"match_all": {}}}, _source=False):
+            batch.append(hit["_id"])
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                dropped += await self._drop_missing(sources, dest, batch)
+                batch = []
+        if batch:
+            dropped += await self._drop_missing(sources, dest, batch)
+        return dropped
+
+    async def _drop_missing(self, sources: List[str], dest: str, ids: List[str]) -> int:
+        from elasticsearch import NotFoundError
+        missing = set(ids)
+        for name in sources:
+            response = await self.es.mget(index=name, ids=sorted(missing), _source=False)
+            missing -= {doc["_id"] for doc in response["docs"] if doc.get("found")}
+            if not missing:
+                return 0
+        for doc_id in missing:
+            try:
+                await self.es.delete(index=dest, id=doc_id)
+            except NotFoundError:
+                pass
+        return len(missing)
+
+    async def _migrate(self, sources: List[str], dest: str, switch_actions: List[Dict[str, Any]]) -> int:
+        """
+        Copy ``sources`` into ``dest`` while writers write to both, then apply
+        the alias ``switch_actions`` in one atomic step. Returns the number of
+        documents copied.
+        """
+        # Writes go to the old indices and to the new one, the write index
+        actions: List[Dict[str, Any]] = [
+            {"remove": {"index": name, "alias": self.write_alias}}
+            for name in await self._alias_targets(self.write_alias) if name not in sources and name != dest
+        ]
+        actions += [{"add": {"index": name, "alias": self.write_alias, "is_write_index": False}} for name in sources]
+        actions.append({"add": {"index": dest, "alias": self.write_alias, "is_write_index": True}})
+        await self.es.indices.update_aliases(actions=actions)
+        self._write_targets_expiry = 0.0
+        # Until writers see the new alias they write to the old indices only,
+        # which the copy then picks up
+        await asyncio.sleep(WRITE_TARGETS_TTL)
+
+        copied = 0
+        for name in sources:
+            result = await self._copy_documents(name, dest)
+            copied += result["created"]
+        dropped = await self._drop_deleted(sources, dest)
+        if dropped:
+            logger.info(f"Deleted {dropped} documents from {dest} that were deleted during the copy")
+
+        await self.es.indices.update_aliases(actions=switch_actions)
+        self._write_targets_expiry = 0.0
+        return copied
+
+    async def _current_write_targets(self) -> List[str]:
+        """
+        Indices behind the write alias, the write index last; more than one
+        while a migration runs
+        """
+        if time.monotonic() >= self._write_targets_expiry:
+            if await self.es.indices.exists_alias(name=self.write_alias):
+                indices = await self.es.indices.get_alias(name=self.write_alias)
+                self._write_targets = sorted(
+                    indices.keys(),
+                    key=lambda name: indices[name]["aliases"][self.write_alias].get("is_write_index", False)
+                )
+            else:
+                self._write_targets = []
+            self._write_targets_expiry = time.monotonic() + WRITE_TARGETS_TTL
+        # Addressed by name, so that a writer that has not seen a migration
+        # start yet keeps writing to the index being copied
+        return self._write_targets or [self.write_alias]
+
+    async def index_document(self, document: Dict[str, Any], doc_id: Optional[str] = None) -> None:
+        """
+        Index a document into every index behind the write alias, the old ones first
+        """
+        for name in await self._current_write_targets():
+            await self.es.index(index=name, document=document, id=doc_id)
+
+    async def update_document(self, doc_id: str, fields: Dict[str, Any]) -> None:
+        """
+        Partially update a document. Mid-migration the new index may not have
+        it yet, so it is updated in the old indices and copied across in full.
+        """
+        from elasticsearch import NotFoundError
+        *old_indices, write_index = await self._current_write_targets()
+        updated = None
+        for name in old_indices:
+            try:
+                await self.es.update(index=name, id=doc_id, body={"doc": fields})
+                updated = name
+            except NotFoundError:
+                pass
+        if updated is None:
+            await self.es.update(index=write_index, id=doc_id, body={"doc": fields})
+            return
+        document = await self.es.get(index=updated, id=doc_id)
+        await self.es.index(index=write_index, document=document["_source"], id=doc_id)
+
+    async def delete_document(self, doc_id: str) -> None:
+        """
+        Delete a document from every index behind the write alias; raises
+        NotFoundError when none of them has it
+        """
+        from elasticsearch import NotFoundError
+        not_found: Optional[NotFoundError] = None
+        deleted = False
+        for name in await self._current_write_targets():
+            try:
+                await self.es.delete(index=name, id=doc_id)
+                deleted = True
+            except NotFoundError as e:
+                not_found = e
+        if not deleted and not_found is not None:
+            raise not_found
+
+    async def ensure_index(self) -> None:
+        """
+        Create the current index version and its aliases if they do not exist
+        yet. An index created by dynamic mapping under the alias name is
+        migrated into the versioned index. Idempotent and cheap after the first
+        call, so writers can call it before every write.
+        """
+        if self._ready:
+            return
+        async with self._lock:
+            if self._ready:
+                return
+            targets = await self._alias_targets(self.alias)
+            if targets:
+                current = self.versioned_name(INDEX_VERSION)
+                if current not in targets:
+                    logger.warning(
+                        f"Search alias {self.alias} points to {targets}, not {current}; "
+                        "run `python -m app.services.search_index reindex`"
+                    )
+                if not await self._alias_targets(self.write_alias):
+                    await self.es.indices.put_alias(index=targets[0], name=self.write_alias)
+            elif await self.es.indices.exists(index=self.alias):
+                # A write alias means another process is migrating it already
+                if not await self._alias_targets(self.write_alias):
+                    await self._migrate_legacy_index()
+            else:
+                name = self.versioned_name(INDEX_VERSION)
+                await self._create_index(name)
+                await self.es.indices.update_aliases(actions=[
+                    {"add": {"index": name, "alias": self.alias}},
+                    {"add": {"index": name, "alias": self.write_alias}},
+                ])
+            self._write_targets_expiry = 0.0
+            self._ready = True
+
+    async def _migrate_legacy_index(self) -> None:
+        """
+        Replace a concrete index named like the alias (dynamic-mapped, from
+        before the index was managed) with the versioned index.
+        """
+        name = self.versioned_name(INDEX_VERSION)
+        logger.info(f"Migrating unmanaged index {self.alias} to {name}")
+        await self._create_index(name)
+        # An alias cannot take the name of an existing index, so drop the old
+        # index, and the write alias with it, and add the aliases in one atomic step
+        await self._migrate([self.alias], name, [
+            {"remove_index": {"index": self.alias}},
+            {"add": {"index": name, "alias": self.alias}},
+            {"add": {"index": name, "alias": self.write_alias, "is_write_index": True}},
+        ])
+
+    async def reindex(self, version: int = INDEX_VERSION, delete_old: bool = False) -> Dict[str, Any]:
+        """
+        Zero-downtime reindex into ``<alias>-v<version>``. Writes made while
+        the copy runs go to both indices, so the new index ends up with every
+        document written, updated or deleted meanwhile.
+        """
+        await self.ensure_index()
+        new_index = self.versioned_name(version)
+        old_indices = [name for name in await self._alias_targets(self.alias) if name != new_index]
+        await self._create_index(new_index)
+
+        # Searches and writes switch over in a single atomic step
+        switch_actions: List[Dict[str, Any]] = []
+        for name in old_indices:
+            switch_actions.append({"remove": {"index": name, "alias": self.alias}})
+            switch_actions.append({"remove": {"index": name, "alias": self.write_alias}})
+        switch_actions.append({"add": {"index": new_index, "alias": self.alias}})
+        switch_actions.append({"add": {"index": new_index, "alias": self.write_alias, "is_write_index": True}})
+        copied = 0
+        if old_indices:
+            copied = await self._migrate(old_indices, new_index, switch_actions)
+        else:
+            await self.es.indices.update_aliases(actions=switch_actions)
+        if delete_old:
+            # Writers that have not seen the switch yet still write to the old indices
+            await asyncio.sleep(WRITE_TARGETS_TTL)
+            for name in old_indices:
+                await self.es.indices.delete(index=name)
+
+        logger.info(f"Reindexed {old_indices} into {new_index} ({copied} documents copied)")
+        return {"index": new_index, "previous": old_indices, "copied": copied}
+
+    async def status(self) -> Dict[str, Any]:
+        return {
+            "alias": await self._alias_targets(self.alias),
+            "writeAlias": await self._alias_targets(self.write_alias),
+            "currentVersion": self.versioned_name(INDEX_VERSION),
+        }
+
+
+# Singleton instance
+_search_index_manager: Optional[SearchIndexManager] = None
+
+
+def get_search_index_manager() -> SearchIndexManager:
+    """Get or create the files index manager."""
+    global _search_index_manager
+    if _search_index_manager is None:
+        from app.core.es_client import InstrumentedAsyncElasticsearch
+        _search_index_manager = SearchIndexManager(
+            InstrumentedAsyncElasticsearch([settings.ELASTICSEARCH_URL]),
+            settings.ELASTICSEARCH_INDEX,
+            settings.SEMANTIC_SEARCH_DIMS
+        )
+    return _search_index_manager
+
+
+async def _main(command: str) -> None:
+    manager = get_search_index_manager()
+    try:
+        if command == "ensure":
+            await manager.ensure_index()
+        elif command == "reindex":
+            print(await manager.reindex())
+        print(await manager.status())
+    finally:
+        await manager.es.close()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "status"))
@@ -1,13 +1,47 @@
 from typing import List, Dict, Any, Optional
-from elasticsearch import AsyncElasticsearch
 from app.core.config import settings
+from app.services.search_index import get_search_index_manager
 import logging
 
 logger = logging.getLogger(__name__)
 
+LEXICAL_FIELDS = ["filename^3", "content", "metadata.*", "ocr_text"]
+
+
+def build_filter_clauses(filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Term filters for a ``{field: value}`` dict; list values match any of the values
+    """
+    filter_conditions = []
+    for field, value in (filters or {}).items():
+        if isinstance(value, list):
+            filter_conditions.append({"terms": {field: value}})
+        else:
+            filter_conditions.append({"term": {field: value}})
+    return filter_conditions
+
+
+def build_lexical_query(query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    bool_query: Dict[str, Any] = {
+        "must": [
+            {
+                "multi_match": {
+                    "query": query,
+                    "fields": LEXICAL_FIELDS,
+                    "fuzziness": "AUTO"
+                }
+            }
+        ]
+    }
+    if filters:
+        bool_query["filter"] = build_filter_clauses(filters)
+    return {"bool": bool_query}
+
+
 class SearchService:
     def __init__(self):
-        self.es = AsyncElasticsearch([settings.ELASTICSEARCH_URL])
+        from app.core.es_client import InstrumentedAsyncElasticsearch
+        self.es = InstrumentedAsyncElasticsearch([settings.ELASTICSEARCH_URL])
         self.index = settings.ELASTICSEARCH_INDEX
 
     async def index_file(self, file_data: Dict[str, Any]) -> bool:
@@ -15,11 +49,9 @@ class SearchService:
         Index a file in Elasticsearch
         """
         try:
-            await self.es.index(
-                index=self.index,
-                document=file_data,
-                id=file_data.get('id')
-            )
+            index_manager = get_search_index_manager()
+            await index_manager.ensure_index()
+            await index_manager.index_document(file_data, file_data.get('id'))
             return True
         except Exception as e:
             logger.error(f"Error indexing file: {str(e)}")
@@ -38,24 +70,7 @@ class SearchService:
         try:
             # Build search query
             search_query = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {
-                                "multi_match": {
-                                    "query": query,
-                                    "fields": [
-                                        "filename^3",
-                                        "content",
-                                        "metadata.*",
-                                        "ocr_text"
-                                    ],
-                                    "fuzziness": "AUTO"
-                                }
-                            }
-                        ]
-                    }
-                },
+                "query": build_lexical_query(query, filters),
                 "from": (page - 1) * size,
                 "size": size,
                 "sort": [
@@ -64,17 +79,6 @@ class SearchService:
                 ]
             }
 
-            # Add filters if provided
-            if filters:
-                filter_conditions = []
-                for field, value in filters.items():
-                    if isinstance(value, list):
-                        filter_conditions.append({"terms": {field: value}})
-                    else:
-                        filter_conditions.append({"term": {field: value}})
-                
-                search_query["query"]["bool"]["filter"] = filter_conditions
-
             # Execute search
             response = await self.es.search(
                 index=self.index,
@@ -106,10 +110,7 @@ class SearchService:
         Delete a file from the index
         """
         try:
-            await self.es.delete(
-                index=self.index,
-                id=file_id
-            )
+            await get_search_index_manager().delete_document(file_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting file from index: {str(e)}")
@@ -120,11 +121,7 @@ class SearchService:
         Update a file in the index
         """
         try:
-            await self.es.update(
-                index=self.index,
-                id=file_id,
-                body={"doc": file_data}
-            )
+            await get_search_index_manager().update_document(file_id, file_data)
             return True
         except Exception as e:
             logger.error(f"Error updating file in index: {str(e)}")
@@ -1,80 +1,295 @@
-from typing import List, Dict, Any
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Any, Optional, Tuple
+from contextlib import aclosing
+import asyncio
 import os
-from elasticsearch import AsyncElasticsearch
+from opentelemetry import trace
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.tracing import mark_error, traced, tracer
+from app.services.search_index import get_search_index_manager
+from app.services.search_service import build_filter_clauses
 import logging
+import threading
+
+if TYPE_CHECKING:
+    from elasticsearch import AsyncElasticsearch
+    from langchain_core.embeddings import Embeddings
 
 logger = logging.getLogger(__name__)
 
+# Vectors are only needed by the kNN search itself, never in the response
+SOURCE_EXCLUDES = ["embedding", "passages"]
+
+
+def split_passages(text: str, words_per_passage: int, overlap: int, max_passages: int) -> List[Dict[str, Any]]:
+    """
+    Split text into overlapping passages of at most ``words_per_passage``
+    words, sized to fit the embedding model's sequence length. Each passage
+    records its word offset in the text.
+    """
+    words = text.split()
+    step = max(1, words_per_passage - overlap)
+    passages = []
+    for start in range(0, max(len(words), 1), step):
+        chunk = words[start:start + words_per_passage]
+        if chunk:
+            passages.append({"text": " ".join(chunk), "offset": start})
+        if start + words_per_passage >= len(words) or len(passages) >= max_passages:
+            break
+    return passages
+
+
+def build_passage_knn(query_embedding: List[float], k: int, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Nested kNN over passage vectors. Hits are files (each file counted once,
+    by its best passage), and the best passage is returned as an inner hit.
+    """
+    knn: Dict[str, Any] = {
+        "field": "passages.vector",
+        "query_vector": query_embedding,
+        "k": k,
+        "num_candidates": max(100, 2 * k),
+        "inner_hits": {"size": 1, "_source": ["passages.text", "passages.offset", "passages.page"]}
+    }
+    if filters:
+        # Filtered during the HNSW search, so the k neighbours all match
+        knn["filter"] = build_filter_clauses(filters)
+    return knn
+
+
+def best_passage(hit: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    inner_hits = hit.get("inner_hits", {}).get("passages", {}).get("hits", {}).get("hits", [])
+    if not inner_hits:
+        return None
+    return {**inner_hits[0]["_source"], "score": inner_hits[0].get("_score")}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
 
 class SemanticSearchService:
-    def __init__(self):
-        self.model = HuggingFaceEmbeddings(
-            model_name=settings.SEMANTIC_SEARCH_MODEL)
-        
-        self.es = AsyncElasticsearch([settings.ELASTICSEARCH_URL])
+    def __init__(self, model: Optional["Embeddings"] = None, es: Optional["AsyncElasticsearch"] = None):
+        if model is None:
+            # Shared with every other user of the same model
+            from app.services.model_registry import get_model_registry
+            model = get_model_registry().get_embeddings(settings.SEMANTIC_SEARCH_PROVIDER, settings.SEMANTIC_SEARCH_MODEL)
+        self.model = model
+
+        if es is None:
+            from app.core.es_client import InstrumentedAsyncElasticsearch
+            es = InstrumentedAsyncElasticsearch([settings.ELASTICSEARCH_URL])
+        self.es = es
         self.index = settings.ELASTICSEARCH_INDEX
 
+        # Query vectors only depend on the query text, so they can be cached
+        # well beyond the lifetime of a search result
+        self.query_embedding_cache = TTLCache(settings.SEMANTIC_QUERY_CACHE_SIZE, settings.SEMANTIC_QUERY_CACHE_TTL)
+        self.coalesce = settings.SEMANTIC_SEARCH_COALESCE
+        self._embedding_flight = SingleFlight()
+        self._search_flight = SingleFlight()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts. Local models are CPU-bound, so keep inference
+        off the event loop.
+        """
+        with tracer.start_as_current_span("embedding.embed") as span:
+            span.set_attribute("embedding.batch_size", len(texts))
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.model.embed_documents, texts)
+
     async def get_embedding(self, text: str) -> List[float]:
         """
         Get embedding for a given text using HuggingFaceHubEmbeddings
         """
-        # HuggingFaceHubEmbeddings expects a list of texts
-        return self.model.embed_documents([text])[0]
+        return (await self.get_embeddings([text]))[0]
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embedding of a search query, from the query cache when possible.
+        Concurrent misses for the same query share one model call.
+        """
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is not None:
+            self._cache_hits += 1
+            return embedding
+        self._cache_misses += 1
+
+        async def compute() -> List[float]:
+            embedding = await self.get_embedding(key)
+            self.query_embedding_cache.set(key, embedding)
+            return embedding
+
+        if not self.coalesce:
+            return await compute()
+        return await self._embedding_flight.do(key, compute)
 
-    async def index_file(self, file_data: Dict[str, Any]) -> bool:
+    async def _embed_pages(
+        self,
+        file_data: Dict[str, Any],
+        pages: AsyncIterator[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[List[float]]]:
         """
-        Index a file with its embedding
+        Consume streamed pages, embedding their passages in batches while
+        later pages are still being extracted. The page texts are stored as a
+        multi-valued ``content`` field rather than joined into one string.
         """
+        filename = file_data.get("filename", "")
+        content: List[str] = []
+        passages: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = []
+        batches: List[asyncio.Task] = []
+        chars = 0
+        ocr_pages = 0
+
+        def flush() -> None:
+            batch = list(pending)
+            pending.clear()
+            passages.extend(batch)
+            batches.append(asyncio.create_task(
+                self.get_embeddings([f"{filename} {passage['text']}" for passage in batch])
+            ))
+
         try:
-            # Generate embedding for the file content
-            content = file_data.get("content", "")
-            ocr_text = file_data.get("ocr_text", "")
-            text_to_embed = f"{file_data.get('filename', '')} {content} {ocr_text}"
-            embedding = await self.get_embedding(text_to_embed)
+            async with aclosing(pages):
+                async for page in pages:
+                    text = page["text"][:settings.PDF_MAX_TEXT_CHARS - chars]
+                    if not text.strip():
+                        continue
+                    chars += len(text)
+                    content.append(text)
+                    ocr_pages += bool(page.get("ocr"))
+                    remaining = settings.SEMANTIC_MAX_PASSAGES - len(passages) - len(pending)
+                    if remaining > 0:
+                        for passage in split_passages(text, settings.SEMANTIC_PASSAGE_WORDS, settings.SEMANTIC_PASSAGE_OVERLAP, remaining):
+                            pending.append({**passage, "page": page["page"]})
+                    if len(pending) >= settings.SEMANTIC_EMBED_BATCH_SIZE:
+                        flush()
+                    if chars >= settings.PDF_MAX_TEXT_CHARS:
+                        logger.warning(f"Text of {filename} truncated at {chars} characters")
+                        break
+            if pending:
+                flush()
+            vectors = [vector for batch in await asyncio.gather(*batches) for vector in batch]
+        except BaseException:
+            # Extraction or a batch failed: cancel the batches still in flight
+            # rather than leaving them running unreferenced
+            for task in batches:
+                task.cancel()
+            await asyncio.gather(*batches, return_exceptions=True)
+            raise
 
-            # Add embedding to the file data
-            file_data["embedding"] = embedding
+        file_data["content"] = content
+        file_data["indexed_pages"] = len(content)
+        file_data["ocr_pages"] = ocr_pages
+        return passages, vectors
+
+    @traced("search.index_file")
+    async def index_file(self, file_data: Dict[str, Any], pages: Optional[AsyncIterator[Dict[str, Any]]] = None) -> bool:
+        """
+        Index a file with one embedding per passage of its text. The text is
+        either in the file data or streamed page by page through ``pages``.
+        """
+        try:
+            if pages is not None:
+                passages, vectors = await self._embed_pages(file_data, pages)
+            else:
+                content = file_data.get("content", "")
+                ocr_text = file_data.get("ocr_text", "")
+                passages = split_passages(
+                    f"{content} {ocr_text}",
+                    settings.SEMANTIC_PASSAGE_WORDS,
+                    settings.SEMANTIC_PASSAGE_OVERLAP,
+                    settings.SEMANTIC_MAX_PASSAGES
+                )
+                vectors = []
+            if not passages:
+                passages = [{"text": "", "offset": 0}]
+            if len(vectors) != len(passages):
+                # All passages in one batch; the filename gives each passage its context
+                filename = file_data.get("filename", "")
+                vectors = await self.get_embeddings([f"{filename} {passage['text']}" for passage in passages])
+            file_data["passages"] = [
+                {**passage, "vector": vector} for passage, vector in zip(passages, vectors)
+            ]
+            trace.get_current_span().set_attribute("search.passages", len(passages))
 
             # Index the file
-            await self.es.index(
-                index=self.index,
-                document=file_data,
-                id=file_data.get("id")
-            )
+            index_manager = get_search_index_manager()
+            await index_manager.ensure_index()
+            await index_manager.index_document(file_data, file_data.get("id"))
             return True
         except Exception as e:
             logger.error(f"Error indexing file with embedding: {str(e)}")
+            mark_error(e)
             return False
 
     async def semantic_search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """
-        Perform semantic search
+        Perform semantic search, returning files with their best matching passage.
+        Identical searches in flight at the same time share one ES request.
         """
+        if not self.coalesce:
+            return await self._semantic_search(query, top_k)
+        return await self._search_flight.do((normalize_query(query), top_k), lambda: self._semantic_search(query, top_k))
+
+    async def _semantic_search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
         try:
             # Get embedding for the query
-            query_embedding = await self.get_embedding(query)
+            query_embedding = await self.embed_query(query)
 
             # Build search query
             search_query = {
-                "knn": {
-                    "field": "embedding",
-                    "query_vector": query_embedding,
-                    "k": top_k,
-                    "num_candidates": 100
-                }
+                "knn": build_passage_knn(query_embedding, top_k),
+                "size": top_k,
+                "_source": {"excludes": SOURCE_EXCLUDES}
             }
 
             # Execute search
             response = await self.es.search(
                 index=self.index,
-                body={"knn": search_query}
+                body=search_query
             )
 
             # Process results
-            return [hit["_source"] for hit in response["hits"]["hits"]]
+            return [
+                {**hit["_source"], "best_passage": best_passage(hit)}
+                for hit in response["hits"]["hits"]
+            ]
 
         except Exception as e:
             logger.error(f"Error performing semantic search: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "queryEmbeddingCache": {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hitRate": self._cache_hits / lookups if lookups else 0.0,
+                "entries": len(self.query_embedding_cache),
+            },
+            "embeddingCoalescing": self._embedding_flight.get_stats(),
+            "searchCoalescing": self._search_flight.get_stats(),
+        }
+
+
+# Singleton instance
+_semantic_search_service: Optional[SemanticSearchService] = None
+_semantic_search_service_lock = threading.Lock()
+
+
+def get_semantic_search_service() -> SemanticSearchService:
+    """Get or create the shared semantic search service (loads the embedding model)."""
+    global _semantic_search_service
+    if _semantic_search_service is None:
+        with _semantic_search_service_lock:
+            if _semantic_search_service is None:
+                _semantic_search_service = SemanticSearchService()
+    return _semantic_search_service
@@ -7,12 +7,27 @@ Device-specific code (CUDA/MPS/CPU) has been removed as processing happens on th
 The API response format {"transcript": "..."} is automatically converted to {"text": "..."}
 for backward compatibility with the original interface.
 """
+import functools
+import logging
 import os
 import io
 import subprocess
 import tempfile
 from typing import Optional, Dict, Any
 import requests
+from app.core.metrics import TRANSCRIPTION_ERRORS, TRANSCRIPTION_SECONDS, track
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+def _tracked(fn):
+    """Record the latency and failures of a transcription call"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with track(TRANSCRIPTION_SECONDS, TRANSCRIPTION_ERRORS):
+            return fn(*args, **kwargs)
+    return wrapper
 
 
 class TranscriptionService:
@@ -28,8 +43,10 @@ class TranscriptionService:
         """
         self.api_url = api_url
         self.timeout = timeout
-        print(f"TranscriptionService initialized with API: {self.api_url}")
+        logger.info(f"TranscriptionService initialized with API: {self.api_url}")
         
+    @_tracked
+    @traced("transcription.transcribe", {"audio.path": "audio_path"})
     def transcribe(self, audio_path: str) -> Dict[str, Any]:
         """
         Transcribe an audio file by sending it to the API server.
@@ -58,7 +75,6 @@ class TranscriptionService:
                 )
                 response.raise_for_status()
                 data = response.json()
-                print(f"Transcription API response: {data}")
                 
                 if "error" in data:
                     raise Exception(f"Transcription API error: {data['error']}")
@@ -67,21 +83,23 @@ class TranscriptionService:
                 transcript = data.get("transcript")
                 if transcript is None:
                     raise KeyError("Response missing 'transcript' field")
+                logger.debug("Transcription received", extra={"transcript": transcript})
                     
                 return {"text": transcript}
         except requests.exceptions.Timeout as e:
-            print(f"Transcription timeout: {str(e)}")
+            logger.warning(f"Transcription timeout: {str(e)}")
             raise Exception(f"Transcription API request timed out after {self.timeout}s: {str(e)}")
         except requests.exceptions.ConnectionError as e:
-            print(f"Transcription connection error: {str(e)}")
+            logger.warning(f"Transcription connection error: {str(e)}")
             raise Exception(f"Could not connect to transcription API at {self.api_url}: {str(e)}")
         except requests.exceptions.HTTPError as e:
-            print(f"Transcription HTTP error: {str(e)}")
+            logger.warning(f"Transcription HTTP error: {str(e)}")
             raise Exception(f"Transcription API returned HTTP error: {str(e)}")
         except (KeyError, ValueError) as e:
-            print(f"Transcription response error: {str(e)}")
+            logger.warning(f"Transcription response error: {str(e)}")
             raise Exception(f"Invalid API response format: {str(e)}")
     
+    @traced("transcription.convert_to_wav", {"audio.format": "source_format"})
     def _convert_to_wav(self, audio_bytes: bytes, source_format: str) -> bytes:
         """Convert audio to WAV format using ffmpeg."""
         with tempfile.NamedTemporaryFile(suffix=f'.{source_format}', delete=False) as input_file:
@@ -102,6 +120,8 @@ class TranscriptionService:
             os.unlink(input_path)
             os.unlink(output_path)
     
+    @_tracked
+    @traced("transcription.transcribe_bytes", {"audio.format": "audio_format"})
     def transcribe_bytes(self, audio_bytes: bytes, audio_format: str = "webm") -> Dict[str, Any]:
         """
         Transcribe audio from bytes by sending it to the API server.
@@ -117,54 +137,50 @@ class TranscriptionService:
             Exception: If API request fails or response is invalid
         """
         try:
-            print(f"Original audio format: {audio_format}, size: {len(audio_bytes)} bytes")
+            logger.debug("Transcribing audio", extra={"audio_format": audio_format, "audio_bytes": len(audio_bytes)})
             
             # Convert webm to wav for better compatibility with librosa
             if audio_format == "webm":
-                print("Converting webm to wav...")
                 audio_bytes = self._convert_to_wav(audio_bytes, audio_format)
                 audio_format = "wav"
-                print(f"Converted to wav, size: {len(audio_bytes)} bytes")
+                logger.debug("Converted audio to wav", extra={"audio_bytes": len(audio_bytes)})
             
             audio_file = io.BytesIO(audio_bytes)
             filename = f"audio.{audio_format}"
             files = {'audio_file': (filename, audio_file, f'audio/{audio_format}')}
             
-            print(f"Sending transcription request to {self.api_url}")
             response = requests.post(
                 self.api_url,
                 files=files,
                 headers={"Accept": "application/json"},
                 timeout=self.timeout
             )
-            print(f"Response status: {response.status_code}")
             response.raise_for_status()
-            print(f"Response content: {response.text[:500]}")
             data = response.json()
-            print(f"Transcription API response: {data}")
             
             if "error" in data:
                 raise Exception(f"Transcription API error: {data['error']}")
             
             transcript = data.get("transcript")
             if transcript is None:
-                raise KeyError(f"Response missing 'transcript' field. Got: {data}")
+                raise KeyError(f"Response missing 'transcript' field. Got keys: {sorted(data)}")
+            logger.debug("Transcription received", extra={"transcript": transcript})
                 
             return {"transcript": transcript}
         except requests.exceptions.Timeout as e:
-            print(f"Transcription timeout: {str(e)}")
+            logger.warning(f"Transcription timeout: {str(e)}")
             raise Exception(f"Transcription API request timed out after {self.timeout}s: {str(e)}")
         except requests.exceptions.ConnectionError as e:
-            print(f"Transcription connection error: {str(e)}")
+            logger.warning(f"Transcription connection error: {str(e)}")
             raise Exception(f"Could not connect to transcription API at {self.api_url}: {str(e)}")
         except requests.exceptions.HTTPError as e:
-            print(f"Transcription HTTP error: {str(e)}")
+            logger.warning(f"Transcription HTTP error: {str(e)}")
             raise Exception(f"Transcription API returned HTTP error: {str(e)}")
         except (KeyError, ValueError) as e:
-            print(f"Transcription response error: {str(e)}")
+            logger.warning(f"Transcription response error: {str(e)}")
             raise Exception(f"Invalid API response format: {str(e)}")
         except subprocess.CalledProcessError as e:
-            print(f"Audio conversion error: {e.stderr.decode() if e.stderr else str(e)}")
+            logger.error(f"Audio conversion error: {e.stderr.decode() if e.stderr else str(e)}")
             raise Exception(f"Failed to convert audio format: {str(e)}")
         finally:
             if 'audio_file' in locals():
@@ -183,7 +199,7 @@ class TranscriptionService:
         Returns:
             None
         """
-        print("Warning: Language detection not implemented for API client")
+        logger.warning("Language detection not implemented for API client")
         return None
 
 
@@ -200,7 +216,7 @@ def get_transcription_service() -> TranscriptionService:
         try:
             timeout = int(timeout_str)
         except ValueError:
-            print(f"Warning: Invalid WHISPER_API_TIMEOUT '{timeout_str}', using default 30")
+            logger.warning(f"Invalid WHISPER_API_TIMEOUT '{timeout_str}', using default 30")
             timeout = 30
             
         _transcription_service = TranscriptionService(api_url=api_url, timeout=timeout)
@@ -0,0 +1,410 @@
+"""
+Background processing of uploaded files.
+
+An upload returns once its object is stored in S3; what makes the file
+searchable runs afterwards as a job through two stages with their own
+workers, connected by a bounded queue:
+
+    extract (MIME-specific metadata, OCR) -> index (PDF text, embedding, Elasticsearch)
+
+A failed stage is retried with exponential backoff, up to
+UPLOAD_JOB_MAX_ATTEMPTS attempts, before the job fails. Job state is kept in
+the ``file_jobs`` table, so any worker process can report it.
+
+Each worker process holds the jobs it created under a lease: it renews their
+``updated_at`` every UPLOAD_JOB_HEARTBEAT_SECONDS while they are queued or
+processing, and takes over the unfinished jobs of other processes once their
+lease has not been renewed for UPLOAD_JOB_STALE_SECONDS, i.e. their process
+stopped. A process that finds a job it held taken over drops it. When
+UPLOAD_JOB_WEBHOOK_URL is set, the job is POSTed there once it is indexed or
+has failed.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from opentelemetry import trace
+from opentelemetry.trace import Link
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.metrics import UPLOAD_JOB_STAGE_ERRORS, UPLOAD_JOB_STAGE_SECONDS, UPLOAD_JOBS_FINISHED, track
+from app.core.models import FileJobDB
+from app.core.tracing import mark_error, tracer
+from app.services.file_dedup import FileDedupService, get_file_dedup_service
+from app.services.file_processor import FileProcessor, get_file_processor
+from app.services.image_derivatives import DERIVATIVE_SIZES, ImageDerivativeService, get_image_derivative_service
+from app.services.s3_service import S3Service, get_s3_service
+from app.services.semantic_search_service import SemanticSearchService, get_semantic_search_service
+import asyncio
+import logging
+import time
+import uuid
+import threading
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("extract", "index")
+UNFINISHED = ("queued", "processing")
+WEBHOOK_ATTEMPTS = 3
+
+
+def _to_dict(job: FileJobDB) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "sha256": job.sha256,
+        "s3_key": job.s3_key,
+        "filename": job.filename,
+        "content_type": job.content_type,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts or 0,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+    }
+
+
+class UploadJobService:
+    def __init__(
+        self,
+        file_processor: FileProcessor,
+        s3_service: S3Service,
+        semantic_search_service: SemanticSearchService,
+        file_dedup_service: FileDedupService,
+        image_derivative_service: ImageDerivativeService,
+        session_factory=SessionLocal
+    ):
+        self.file_processor = file_processor
+        self.s3_service = s3_service
+        self.semantic_search_service = semantic_search_service
+        self.file_dedup_service = file_dedup_service
+        self.image_derivative_service = image_derivative_service
+        self.session_factory = session_factory
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        # Retry timers, referenced until they fire
+        self._timers: Set[asyncio.Task] = set()
+        self._in_memory = 0
+        # Owner of the jobs this process holds
+        self.worker_id = uuid.uuid4().hex
+
+    # Job records
+
+    def _create(self, sha256: str, s3_key: str, filename: str, content_type: Optional[str]) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            job = FileJobDB(
+                id=uuid.uuid4().hex, sha256=sha256, s3_key=s3_key, filename=filename,
+                content_type=content_type, status="queued", stage=STAGES[0], attempts=0, owner=self.worker_id
+            )
+            db.add(job)
+            db.commit()
+            return _to_dict(job)
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        # None once another process has taken the job over
+        db = self.session_factory()
+        try:
+            job = db.query(FileJobDB).filter(FileJobDB.id == job_id, FileJobDB.owner == self.worker_id).first()
+            if job is None:
+                return None
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            return _to_dict(job)
+        finally:
+            db.close()
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            job = db.query(FileJobDB).filter(FileJobDB.id == job_id).first()
+            return _to_dict(job) if job is not None else None
+        finally:
+            db.close()
+
+    def _latest_for(self, sha256: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            job = db.query(FileJobDB).filter(FileJobDB.sha256 == sha256).order_by(FileJobDB.created_at.desc()).first()
+            return _to_dict(job) if job is not None else None
+        finally:
+            db.close()
+
+    def _renew(self) -> int:
+        db = self.session_factory()
+        try:
+            renewed = db.query(FileJobDB).filter(
+                FileJobDB.owner == self.worker_id, FileJobDB.status.in_(UNFINISHED)
+            ).update({FileJobDB.updated_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return renewed
+        finally:
+            db.close()
+
+    def _claim_stale(self) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=settings.UPLOAD_JOB_STALE_SECONDS)
+            claimed = []
+            stale = db.query(FileJobDB).filter(FileJobDB.status.in_(UNFINISHED), FileJobDB.updated_at < cutoff).all()
+            for job in stale:
+                # Conditional on the timestamp read, so that only one worker process takes a job over
+                updated = db.query(FileJobDB).filter(
+                    FileJobDB.id == job.id, FileJobDB.updated_at == job.updated_at
+                ).update(
+                    {FileJobDB.updated_at: datetime.utcnow(), FileJobDB.owner: self.worker_id},
+                    synchronize_session=False
+                )
+                db.commit()
+                if updated:
+                    claimed.append(_to_dict(job))
+            return claimed
+        finally:
+            db.close()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await run_in_threadpool(self._get, job_id)
+
+    async def latest_for(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """
+        The most recent job processing some content, if any
+        """
+        return await run_in_threadpool(self._latest_for, sha256)
+
+    # Pipeline
+
+    def start(self) -> None:
+        """
+        Start the stage workers and the lease maintenance of this process, once
+        """
+        if self._workers:
+            return
+        self._queues = {
+            "extract": asyncio.Queue(),
+            "index": asyncio.Queue(maxsize=settings.UPLOAD_JOB_INDEX_WORKERS * 2),
+        }
+        workers = {"extract": settings.UPLOAD_JOB_EXTRACT_WORKERS, "index": settings.UPLOAD_JOB_INDEX_WORKERS}
+        for stage, count in workers.items():
+            for _ in range(max(1, count)):
+                self._workers.append(asyncio.create_task(self._work(stage)))
+        self._workers.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        for task in [*self._workers, *self._timers]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._timers, return_exceptions=True)
+        self._workers = []
+
+    async def resume(self) -> int:
+        """
+        Take over the jobs that stopped processes left unfinished, as the
+        workers then keep doing every UPLOAD_JOB_HEARTBEAT_SECONDS
+        """
+        self.start()
+        return await self._take_over()
+
+    async def _take_over(self) -> int:
+        jobs = await run_in_threadpool(self._claim_stale)
+        for job in jobs:
+            # Extraction results were not kept, so every job restarts from the first stage
+            logger.info(f"Resuming upload job {job['id']} of {job['filename']}")
+            self._queues["extract"].put_nowait({"job": job, "started": time.perf_counter(), "attempt": 0})
+        return len(jobs)
+
+    async def _maintain(self) -> None:
+        """
+        Renew the leases of the jobs this process holds, then take over the
+        jobs whose lease lapsed
+        """
+        while True:
+            await asyncio.sleep(settings.UPLOAD_JOB_HEARTBEAT_SECONDS)
+            try:
+                await run_in_threadpool(self._renew)
+                resumed = await self._take_over()
+                if resumed:
+                    logger.info(f"Took over {resumed} upload jobs of stopped workers")
+            except Exception as e:
+                logger.error(f"Failed to renew or take over upload jobs: {str(e)}")
+
+    async def submit(
+        self,
+        sha256: str,
+        s3_key: str,
+        filename: str,
+        content_type: Optional[str],
+        file_type: str,
+        file_content: bytes
+    ) -> Dict[str, Any]:
+        """
+        Queue the processing of a stored object, returning its job
+        """
+        self.start()
+        job = await run_in_threadpool(self._create, sha256, s3_key, filename, content_type)
+        item = {"job": job, "file_type": file_type, "started": time.perf_counter(), "attempt": 0}
+        # The job's spans run after the request's and are linked to it
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            item["link"] = Link(span_context)
+        # Past a bounded backlog, files are re-read from S3 rather than held in memory
+        if self._in_memory < settings.UPLOAD_JOB_MEMORY_QUEUE:
+            item["content"] = file_content
+            self._in_memory += 1
+        # Unbounded: jobs are accepted once their object is stored
+        self._queues["extract"].put_nowait(item)
+        return job
+
+    def _release_content(self, item: Dict[str, Any]) -> None:
+        if item.get("content") is not None:
+            item["content"] = None
+            self._in_memory -= 1
+
+    async def _work(self, stage: str) -> None:
+        queue = self._queues[stage]
+        while True:
+            item = await queue.get()
+            try:
+                await self._run_stage(stage, item)
+            except Exception as e:
+                logger.error(f"Unexpected error in upload job {item['job']['id']}: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def _run_stage(self, stage: str, item: Dict[str, Any]) -> None:
+        job = item["job"]
+        item["attempt"] += 1
+        held = await run_in_threadpool(self._update, job["id"], status="processing", stage=stage, attempts=item["attempt"])
+        if held is None:
+            # This process stalled past its lease and another one runs the job now
+            logger.warning(f"Upload job {job['id']} was taken over by another worker, dropping it")
+            self._release_content(item)
+            return
+        links = [item["link"]] if item.get("link") else []
+        with tracer.start_as_current_span(f"upload_job.{stage}", links=links) as span:
+            span.set_attribute("upload_job.id", job["id"])
+            span.set_attribute("upload_job.attempt", item["attempt"])
+            try:
+                with track(UPLOAD_JOB_STAGE_SECONDS, UPLOAD_JOB_STAGE_ERRORS, stage):
+                    if stage == "extract":
+                        await self._extract(item)
+                    else:
+                        await self._index(item)
+            except Exception as e:
+                mark_error(e)
+                await self._retry_or_fail(stage, item, e)
+                return
+
+        if stage == "extract":
+            item["attempt"] = 0
+            # Waits while the index stage is saturated
+            await self._queues["index"].put(item)
+        else:
+            await self._complete(item)
+
+    async def _content(self, item: Dict[str, Any]) -> bytes:
+        if item.get("content") is None:
+            item["content"] = (await self.s3_service.get_object(item["job"]["s3_key"]))["body"]
+            self._in_memory += 1
+        return item["content"]
+
+    async def _extract(self, item: Dict[str, Any]) -> None:
+        job = item["job"]
+        file_content = await self._content(item)
+        metadata = await self.file_processor.process_file(job["filename"], file_content, item.get("file_type"))
+        if settings.IMAGE_DERIVATIVES_ENABLED and metadata.get("file_type", "").startswith("image/"):
+            self.image_derivative_service.schedule(job["s3_key"], file_content)
+            metadata["derivatives"] = list(DERIVATIVE_SIZES)
+        item["metadata"] = metadata
+
+    async def _index(self, item: Dict[str, Any]) -> None:
+        job = item["job"]
+        metadata = item["metadata"]
+        file_content = await self._content(item)
+        # PDF page text is streamed into the indexer
+        pages = self.file_processor.stream_pdf_pages(file_content) if metadata.get("file_type") == "application/pdf" else None
+        indexed = await self.semantic_search_service.index_file({
+            "id": job["s3_key"],
+            "filename": job["filename"],
+            "content_type": job["content_type"],
+            **metadata
+        }, pages=pages)
+        if not indexed:
+            raise Exception("Error indexing file, see the search service log")
+
+    async def _retry_or_fail(self, stage: str, item: Dict[str, Any], error: Exception) -> None:
+        job = item["job"]
+        if item["attempt"] >= settings.UPLOAD_JOB_MAX_ATTEMPTS:
+            logger.error(f"Upload job {job['id']} failed at stage {stage}: {str(error)}")
+            self._release_content(item)
+            UPLOAD_JOBS_FINISHED.labels("failed").inc()
+            final = await run_in_threadpool(
+                self._update, job["id"], status="failed", error=str(error), completed_at=datetime.utcnow()
+            )
+            await self._notify(final)
+            return
+
+        delay = settings.UPLOAD_JOB_RETRY_DELAY * 2 ** (item["attempt"] - 1)
+        logger.warning(
+            f"Upload job {job['id']} stage {stage} attempt {item['attempt']} failed, retrying in {delay:.1f}s: {str(error)}"
+        )
+        if await run_in_threadpool(self._update, job["id"], status="queued", error=str(error)) is None:
+            self._release_content(item)
+            return
+
+        async def retry() -> None:
+            await asyncio.sleep(delay)
+            await self._queues[stage].put(item)
+
+        timer = asyncio.create_task(retry())
+        self._timers.add(timer)
+        timer.add_done_callback(self._timers.discard)
+
+    async def _complete(self, item: Dict[str, Any]) -> None:
+        job = item["job"]
+        self._release_content(item)
+        await self.file_dedup_service.update(job["sha256"], item["metadata"], time.perf_counter() - item["started"])
+        UPLOAD_JOBS_FINISHED.labels("indexed").inc()
+        final = await run_in_threadpool(
+            self._update, job["id"], status="indexed", error=None, completed_at=datetime.utcnow()
+        )
+        logger.info(f"Upload job {job['id']} indexed {job['filename']}")
+        await self._notify(final)
+
+    async def _notify(self, job: Optional[Dict[str, Any]]) -> None:
+        if not settings.UPLOAD_JOB_WEBHOOK_URL or job is None:
+            return
+        import httpx
+        async with httpx.AsyncClient(timeout=10) as client:
+            for attempt in range(1, WEBHOOK_ATTEMPTS + 1):
+                try:
+                    response = await client.post(settings.UPLOAD_JOB_WEBHOOK_URL, json=job)
+                    response.raise_for_status()
+                    return
+                except Exception as e:
+                    logger.warning(f"Upload job webhook attempt {attempt} for {job['id']} failed: {str(e)}")
+                    if attempt < WEBHOOK_ATTEMPTS:
+                        await asyncio.sleep(2 ** (attempt - 1))
+
+
+# Singleton instance
+_upload_job_service: Optional[UploadJobService] = None
+_upload_job_service_lock = threading.Lock()
+
+
+def get_upload_job_service() -> UploadJobService:
+    """Get or create the shared upload job service, wired to the shared services."""
+    global _upload_job_service
+    if _upload_job_service is None:
+        with _upload_job_service_lock:
+            if _upload_job_service is None:
+                _upload_job_service = UploadJobService(
+                    get_file_processor(),
+                    get_s3_service(),
+                    get_semantic_search_service(),
+                    get_file_dedup_service(),
+                    get_image_derivative_service(),
+                )
+    return _upload_job_service
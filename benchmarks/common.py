@@ -0,0 +1,59 @@
+from typing import Any, Dict, List
+import math
+import socket
+import time
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of ``values`` (``pct`` in 0-100)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> Dict[str, Any]:
+    """
+    Throughput and latency percentiles (in milliseconds) for a benchmark run
+    """
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def print_summary(name: str, summary: Dict[str, Any]) -> None:
+    print(
+        f"{name:<28} n={summary['requests']:<5} err={summary['errors']:<4} "
+        f"{summary['throughput_rps']:>8.1f} req/s  p50={summary['p50_ms']:.1f}ms "
+        f"p95={summary['p95_ms']:.1f}ms  p99={summary['p99_ms']:.1f}ms"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 60.0) -> None:
+    """
+    Wait until a local server accepts connections on ``port``
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Nothing listening on port {port} after {timeout:.0f}s")
+            time.sleep(0.1)
@@ -0,0 +1,86 @@
+"""
+PyTorch vs int8 ONNX Runtime embeddings on CPU.
+
+Embeds a fixed corpus with both backends and reports batch throughput
+(sentences/sec), single-query latency percentiles, and how closely the int8
+vectors agree with the fp32 ones (cosine similarity per sentence).
+
+    python -m benchmarks.embeddings_onnx --model sentence-transformers/all-MiniLM-L6-v2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import percentile
+
+CORPUS = [
+    "Patient reports mild headache and fatigue for the past three days.",
+    "Blood pressure measured at 128 over 84, within normal range.",
+    "Schedule a follow-up appointment in two weeks to review lab results.",
+    "The MRI scan shows no evidence of acute intracranial abnormality.",
+    "Prescribed ibuprofen 400mg every eight hours as needed for pain.",
+    "Allergic to penicillin; reaction noted as hives in 2019.",
+    "Discussed diet and exercise plan to manage type 2 diabetes.",
+    "Chest X-ray clear, no signs of pneumonia or effusion.",
+    "Task decomposition breaks a complex goal into smaller, manageable steps.",
+    "The robot arm moved to the home position after calibration.",
+    "Transcription of the audio consultation was uploaded to storage.",
+    "Heart rate variability decreased during the overnight sleep study.",
+]
+
+
+def bench(embeddings, texts, queries):
+    embeddings.embed_documents(texts[:8])  # warm-up
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - start)
+    return np.asarray(vectors, dtype=np.float32), batch_seconds, latencies
+
+
+def report(name, count, batch_seconds, latencies):
+    print(
+        f"{name:<10} {count / batch_seconds:>9.1f} sentences/s  "
+        f"query p50={percentile(latencies, 50) * 1000:.2f}ms p99={percentile(latencies, 99) * 1000:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--cache-dir", default="data/onnx")
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from app.services.onnx_embeddings import OnnxEmbeddings
+
+    texts = [f"{CORPUS[i % len(CORPUS)]} (note {i})" for i in range(args.sentences)]
+    queries = [CORPUS[i % len(CORPUS)] for i in range(args.queries)]
+
+    torch_vectors, torch_seconds, torch_latencies = bench(
+        HuggingFaceEmbeddings(model_name=args.model, encode_kwargs={"normalize_embeddings": True}), texts, queries
+    )
+    onnx_vectors, onnx_seconds, onnx_latencies = bench(
+        OnnxEmbeddings(args.model, cache_dir=args.cache_dir), texts, queries
+    )
+
+    report("pytorch", len(texts), torch_seconds, torch_latencies)
+    report("onnx-int8", len(texts), onnx_seconds, onnx_latencies)
+    # Both sides are L2-normalized, so the row-wise dot product is the cosine
+    agreement = (torch_vectors * onnx_vectors).sum(axis=1)
+    print(
+        f"speedup {torch_seconds / onnx_seconds:.2f}x  "
+        f"cosine agreement mean={agreement.mean():.4f} min={agreement.min():.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
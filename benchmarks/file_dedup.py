@@ -0,0 +1,92 @@
+"""
+Behaviour checks of content-addressed uploads against the app and its local
+stand-ins (see benchmarks.load_test).
+
+Identical uploads share one S3 object and one ``file_objects`` record. The
+run uploads the same content twice under different names and checks that:
+
+- the second upload is deduplicated onto the first one's object;
+- deleting one of the uploads keeps the object, which the other still uses;
+- deleting the last upload removes the object and its record, so that the
+  same content uploaded again is stored anew.
+
+    python -m benchmarks.file_dedup
+
+Exits non-zero when a check fails.
+"""
+import argparse
+import sys
+from typing import List
+
+import httpx
+
+from benchmarks.load_test import API, Stack
+
+
+class Checks:
+    def __init__(self):
+        self.failures: List[str] = []
+
+    def expect(self, name: str, condition: bool, detail: str = "") -> None:
+        print(f"  {'ok  ' if condition else 'FAIL'} {name}{f' ({detail})' if detail and not condition else ''}")
+        if not condition:
+            self.failures.append(name)
+
+
+def upload(client: httpx.Client, filename: str, content: bytes) -> dict:
+    response = client.post(f"{API}/files/upload", files={"file": (filename, content, "text/plain")})
+    response.raise_for_status()
+    return response.json()
+
+
+def run(client: httpx.Client) -> List[str]:
+    checks = Checks()
+    content = b"shared report of the quarterly lab results " * 20
+    print("uploads:")
+    first = upload(client, "first.txt", content)
+    second = upload(client, "second.txt", content)
+    key = first["url"].split("?")[0].rsplit("/", 1)[-1]
+    checks.expect("deduplicates identical content", second["deduplicated"] and second["url"].split("?")[0] == first["url"].split("?")[0])
+
+    print("deletes:")
+    client.delete(f"{API}/files/{key}").raise_for_status()
+    download = client.get(f"{API}/files/download/{key}")
+    checks.expect("keeps an object another upload still uses", download.status_code == 200 and download.content == content,
+                  f"HTTP {download.status_code}")
+    stats = client.get(f"{API}/files/dedup/stats").json()
+    checks.expect("counts the remaining upload", stats.get("objects") == 1 and stats.get("uploads") == 1, str(stats))
+
+    client.delete(f"{API}/files/{key}").raise_for_status()
+    download = client.get(f"{API}/files/download/{key}")
+    checks.expect("deletes the object with its last upload", download.status_code == 404, f"HTTP {download.status_code}")
+    stats = client.get(f"{API}/files/dedup/stats").json()
+    checks.expect("drops the record with its last upload", stats.get("objects") == 0, str(stats))
+
+    third = upload(client, "third.txt", content)
+    download = client.get(f"{API}/files/download/{key}")
+    checks.expect("stores the content anew once deleted", not third["deduplicated"] and download.status_code == 200,
+                  f"deduplicated={third['deduplicated']}, HTTP {download.status_code}")
+    return checks.failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, default=384, help="embedding dimensions")
+    args = parser.parse_args()
+    # Stand-in latencies do not matter here
+    args.es_ms = args.whisper_ms = args.llm_ms = args.embed_ms = 0.0
+
+    stack = Stack(args)
+    try:
+        stack.start()
+        with httpx.Client(base_url=stack.base_url, timeout=60) as client:
+            failures = run(client)
+    finally:
+        stack.stop()
+    if failures:
+        print(f"{len(failures)} checks failed: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline relevance and latency benchmark for hybrid (BM25 + kNN) file search.
+
+Runs the real HybridSearchService against an in-process stand-in for
+Elasticsearch over a synthetic corpus, so no cluster or model is needed:
+
+* the lexical leg is BM25 over the raw tokens;
+* the vector leg is cosine over "concept" vectors in which synonyms share a
+  dimension, plus weaker hashed dimensions for every other token, a
+  stand-in for an embedding model.
+
+Half of the queries quote a document's unique reference code with some of
+its topics (lexical is strong), the other half paraphrase its topics with
+synonyms plus one of its words (vector is strong). Each leg gets a
+simulated log-normal latency, so the budget drops the slow tail.
+
+    python -m benchmarks.hybrid_search --docs 5000 --queries 500 --budget-ms 80
+
+The fusion depth and constant come from HYBRID_SEARCH_RANK_WINDOW and
+HYBRID_SEARCH_RRF_K, so they can be swept from the environment.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.common import percentile
+from app.services.hybrid_search_service import HybridSearchService
+
+# Words in a group are synonyms: same concept, different tokens
+CONCEPTS = [
+    ["fever", "pyrexia", "temperature"],
+    ["headache", "migraine", "cephalalgia"],
+    ["heart", "cardiac", "coronary"],
+    ["lung", "pulmonary", "respiratory"],
+    ["kidney", "renal", "nephric"],
+    ["blood", "hematologic", "sanguine"],
+    ["scan", "imaging", "radiograph"],
+    ["pain", "ache", "discomfort"],
+    ["child", "pediatric", "infant"],
+    ["elderly", "geriatric", "senior"],
+    ["sugar", "glucose", "glycemic"],
+    ["skin", "dermal", "cutaneous"],
+    ["bone", "skeletal", "osseous"],
+    ["report", "summary", "note"],
+    ["infection", "sepsis", "contamination"],
+    ["pressure", "tension", "hypertension"],
+]
+CONTENT_TYPES = ["application/pdf", "image/png", "text/plain"]
+WORD_CONCEPT = {word: i for i, group in enumerate(CONCEPTS) for word in group}
+HASH_DIMENSIONS = 512
+HASHED_TOKEN_WEIGHT = 0.4
+
+
+def concept_vector(tokens):
+    vector = np.zeros(len(CONCEPTS) + HASH_DIMENSIONS, dtype=np.float32)
+    for token in tokens:
+        if token in WORD_CONCEPT:
+            vector[WORD_CONCEPT[token]] += 1.0
+        else:
+            vector[len(CONCEPTS) + zlib.crc32(token.encode()) % HASH_DIMENSIONS] += HASHED_TOKEN_WEIGHT
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FakeElasticsearch:
+    """Answers the two query shapes HybridSearchService sends."""
+
+    def __init__(self, docs, lexical_latency, vector_latency, rng):
+        self.docs = docs
+        self.lexical_latency = lexical_latency
+        self.vector_latency = vector_latency
+        self.rng = rng
+        self.tokens = [doc["text"].split() for doc in docs]
+        self.vectors = np.stack([concept_vector(tokens) for tokens in self.tokens])
+        self.avg_len = sum(len(tokens) for tokens in self.tokens) / len(docs)
+        self.doc_freq = Counter(token for tokens in self.tokens for token in set(tokens))
+        self.term_freqs = [Counter(tokens) for tokens in self.tokens]
+
+    def _matches(self, doc, filters):
+        for clause in filters or []:
+            (kind, condition), = clause.items()
+            (field, value), = condition.items()
+            if (doc[field] not in value) if kind == "terms" else (doc[field] != value):
+                return False
+        return True
+
+    def _bm25(self, query_tokens, k1=1.2, b=0.75):
+        n = len(self.docs)
+        scores = np.zeros(n)
+        for token in set(query_tokens):
+            df = self.doc_freq.get(token)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i, tf in enumerate(self.term_freqs):
+                if token in tf:
+                    length_norm = 1 - b + b * len(self.tokens[i]) / self.avg_len
+                    scores[i] += idf * tf[token] * (k1 + 1) / (tf[token] + k1 * length_norm)
+        return scores
+
+    def _hits(self, scores, filters, size):
+        order = np.argsort(-scores)
+        hits = []
+        for i in order:
+            if scores[i] <= 0 or len(hits) >= size:
+                break
+            if self._matches(self.docs[i], filters):
+                hits.append({"_id": self.docs[i]["id"], "_score": float(scores[i]), "_source": self.docs[i]})
+        return hits
+
+    async def search(self, index, body):
+        if "knn" in body:
+            await asyncio.sleep(self.rng.lognormvariate(*self.vector_latency))
+            knn = body["knn"]
+            scores = self.vectors @ np.asarray(knn["query_vector"], dtype=np.float32)
+            hits = self._hits(scores, knn.get("filter"), knn["k"])
+        else:
+            await asyncio.sleep(self.rng.lognormvariate(*self.lexical_latency))
+            query = body["query"]["bool"]
+            text = query["must"][0]["multi_match"]["query"]
+            hits = self._hits(self._bm25(text.split()), query.get("filter"), body["size"])
+        return {"hits": {"hits": hits, "total": {"value": len(hits)}}}
+
+
+class FakeSearchService:
+    def __init__(self, es):
+        self.es = es
+        self.index = "benchmark"
+
+
+class FakeSemanticSearchService:
+    async def embed_query(self, text):
+        return concept_vector(text.split()).tolist()
+
+
+def build_corpus(count, rng):
+    docs = []
+    for i in range(count):
+        concepts = rng.sample(range(len(CONCEPTS)), 3)
+        words = [rng.choice(CONCEPTS[c]) for c in concepts for _ in range(rng.randint(1, 3))]
+        words += [f"filler{rng.randint(0, 300)}" for _ in range(rng.randint(10, 40))]
+        rng.shuffle(words)
+        code = f"ref{i:06d}"
+        docs.append({
+            "id": f"doc-{i}",
+            "text": " ".join(words + [code]),
+            "code": code,
+            "concepts": concepts,
+            "content_type": rng.choice(CONTENT_TYPES),
+        })
+    return docs
+
+
+def build_queries(docs, count, rng):
+    queries = []
+    for _ in range(count):
+        doc = rng.choice(docs)
+        tokens = doc["text"].split()
+        if rng.random() < 0.5:
+            # Exact reference code plus a topic word
+            text = f"{doc['code']} {rng.choice(CONCEPTS[rng.choice(doc['concepts'])])}"
+        else:
+            # Synonyms of the document's topics that do not occur in it, plus one of its words
+            present = set(tokens)
+            words = []
+            for c in doc["concepts"]:
+                unused = [word for word in CONCEPTS[c] if word not in present]
+                words.append(rng.choice(unused or CONCEPTS[c]))
+            words.append(rng.choice([token for token in tokens if token.startswith("filler")] or tokens))
+            text = " ".join(words)
+        queries.append((text, doc["id"], doc["content_type"]))
+    return queries
+
+
+def relevance(ranked_ids, target):
+    rank = ranked_ids.index(target) + 1 if target in ranked_ids else None
+    return (1.0 if rank else 0.0), (1.0 / rank if rank else 0.0)
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    docs = build_corpus(args.docs, rng)
+    queries = build_queries(docs, args.queries, rng)
+    es = FakeElasticsearch(
+        docs,
+        lexical_latency=(math.log(args.lexical_ms / 1000), 0.5),
+        vector_latency=(math.log(args.vector_ms / 1000), 0.8),
+        rng=rng
+    )
+    service = HybridSearchService(FakeSearchService(es), FakeSemanticSearchService())
+
+    metrics = {mode: {"recall": [], "mrr": []} for mode in ("lexical", "vector", "hybrid")}
+    latencies = []
+    dropped = Counter()
+    for text, target, content_type in queries:
+        filters = {"content_type": content_type} if args.filter else None
+        # Legs on their own, without a budget, for the relevance baseline
+        lexical = [hit["_id"] for hit in await service._lexical_hits(text, filters, args.size)]
+        vector = [hit["_id"] for hit in await service._vector_hits(text, filters, args.size)]
+
+        start = time.perf_counter()
+        response = await service.search(text, filters=filters, size=args.size, budget_ms=args.budget_ms)
+        latencies.append(time.perf_counter() - start)
+        for name, leg in response["legs"].items():
+            if leg["status"] != "ok":
+                dropped[name] += 1
+
+        for mode, ranked in (("lexical", lexical), ("vector", vector), ("hybrid", [r["id"] for r in response["results"]])):
+            recall, mrr = relevance(ranked, target)
+            metrics[mode]["recall"].append(recall)
+            metrics[mode]["mrr"].append(mrr)
+
+    print(f"{args.docs} docs, {args.queries} queries, top {args.size}, budget {args.budget_ms}ms")
+    for mode, values in metrics.items():
+        print(f"{mode:<8} recall@{args.size}={np.mean(values['recall']):.3f}  MRR={np.mean(values['mrr']):.3f}")
+    print(
+        f"hybrid latency p50={percentile(latencies, 50) * 1000:.1f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms "
+        f"max={max(latencies) * 1000:.1f}ms"
+    )
+    print(f"legs dropped by budget: lexical={dropped['lexical']} vector={dropped['vector']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--budget-ms", type=int, default=80)
+    parser.add_argument("--lexical-ms", type=float, default=15.0, help="median simulated lexical leg latency")
+    parser.add_argument("--vector-ms", type=float, default=25.0, help="median simulated vector leg latency")
+    parser.add_argument("--filter", action="store_true", help="filter each query on the target's content_type")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Image derivative benchmark on a generated camera-sized JPEG.
+
+Compares generating the preview and thumbnail with a full-resolution decode
+against the draft-mode decode used by the derivative pipeline, reporting
+time per image and derivative sizes relative to the original.
+
+    python -m benchmarks.image_derivatives --width 4000 --height 3000 --runs 5
+"""
+import argparse
+import io
+import time
+
+from PIL import Image, ImageDraw, ImageOps
+
+from app.services.image_derivatives import DERIVATIVE_SIZES, generate_derivatives
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """
+    Photo-like JPEG: a gradient with shapes, so it compresses like a photo
+    rather than a flat colour
+    """
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for i in range(60):
+        x, y = (i * 7919) % width, (i * 104729) % height
+        draw.ellipse((x, y, x + width // 8, y + height // 8), fill=((i * 37) % 256, (i * 91) % 256, (i * 53) % 256))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def full_decode(file_content: bytes, quality: int):
+    """Baseline: decode every pixel, then scale each derivative from the original"""
+    with Image.open(io.BytesIO(file_content)) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        derivatives = {}
+        for name, size in DERIVATIVE_SIZES.items():
+            image = original.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=quality, method=4)
+            derivatives[name] = output.getvalue()
+        return derivatives
+
+
+def measure(fn, file_content: bytes, quality: int, runs: int):
+    fn(file_content, quality)
+    start = time.perf_counter()
+    for _ in range(runs):
+        derivatives = fn(file_content, quality)
+    return (time.perf_counter() - start) / runs, derivatives
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    original = make_jpeg(args.width, args.height)
+    print(f"{args.width}x{args.height} JPEG, {len(original) / 1024:.0f} KiB")
+    for name, fn in (("full decode", full_decode), ("draft mode", generate_derivatives)):
+        seconds, derivatives = measure(fn, original, args.quality, args.runs)
+        sizes = "  ".join(
+            f"{key} {len(content) / 1024:.1f}KiB ({len(content) / len(original):.1%})"
+            for key, content in derivatives.items()
+        )
+        print(f"  {name:<12} {seconds * 1000:>8.1f}ms/image  {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Cold import time of the app (``import app.main``), which bounds how fast a
+worker starts serving: uvicorn imports the app before accepting connections,
+and autoscaled or restarted workers pay it again.
+
+Each run imports the app in a fresh interpreter under ``python -X importtime``
+and reads the cumulative time of ``app.main``; the median of ``--runs`` runs
+is reported with the slowest top-level packages and the process's peak RSS.
+The run also checks that none of the libraries only needed by some requests
+(ML frameworks, LangChain, cloud SDK and search clients, PDF parsing) is
+imported with the app.
+
+    python -m benchmarks.import_time --output benchmarks/results/import_time.json
+    python -m benchmarks.import_time --max-ms 1500 --baseline benchmarks/results/import_time.json
+
+Exits non-zero when the median exceeds ``--max-ms``, regressed by more than
+``--max-regression`` percent against ``--baseline``, or a deferred library
+was imported. Timings are only comparable on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+# Imported by the code paths that need them, never by importing the app
+DEFERRED_MODULES = (
+    "torch", "transformers", "sentence_transformers", "onnxruntime",
+    "langchain", "langchain_core", "langchain_community", "langchain_mistralai", "langchain_openai", "langchain_huggingface",
+    "langgraph", "pinecone", "boto3", "botocore", "elasticsearch", "pypdf", "PIL", "magic", "pytesseract",
+)
+
+PROBE = (
+    "import json, resource, sys; import app.main; "
+    "print(json.dumps({'modules': sorted(sys.modules), "
+    "'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))"
+)
+
+
+def app_env() -> Dict[str, str]:
+    # Enough configuration to import the app without any backing service
+    return {
+        "DATABASE_URL": "sqlite://",
+        "SEMANTIC_SEARCH_PROVIDER": "mistralai",
+        "SEMANTIC_SEARCH_MODEL": "mistral-embed",
+        "MISTRAL_API_KEY": "import-time",
+        **os.environ,
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    (module, self us, cumulative us) of each ``-X importtime`` line
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_once() -> Dict[str, Any]:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=app_env()
+    )
+    if process.returncode != 0:
+        sys.exit(f"importing the app failed:\n{process.stderr[-4000:]}")
+    probe = json.loads(process.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(process.stderr)
+    total_us = next(cumulative for name, _, cumulative in entries if name == "app.main")
+
+    # Cumulative time per top-level package, first import only
+    packages: Dict[str, int] = {}
+    for name, _, cumulative in entries:
+        root = name.split(".")[0]
+        packages[root] = max(packages.get(root, 0), cumulative)
+    packages.pop("app", None)
+
+    return {
+        "total_ms": total_us / 1000,
+        "packages_ms": {name: us / 1000 for name, us in packages.items()},
+        "deferred_imported": sorted({name.split(".")[0] for name in probe["modules"]} & set(DEFERRED_MODULES)),
+        "max_rss_mb": probe["max_rss_kb"] / 1024,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    parser.add_argument("--max-ms", type=float, default=1500.0, help="target median import time")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="percent")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    median_ms = statistics.median(run["total_ms"] for run in runs)
+    packages = {
+        name: statistics.median(run["packages_ms"].get(name, 0.0) for run in runs)
+        for name in runs[0]["packages_ms"]
+    }
+    deferred_imported = sorted({name for run in runs for name in run["deferred_imported"]})
+
+    print(f"import app.main: median {median_ms:.0f}ms over {args.runs} runs "
+          f"(min {min(run['total_ms'] for run in runs):.0f}ms, max {max(run['total_ms'] for run in runs):.0f}ms), "
+          f"peak RSS {statistics.median(run['max_rss_mb'] for run in runs):.0f}MiB")
+    for name, milliseconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<32} {milliseconds:>8.1f}ms")
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "median_ms": median_ms,
+        "max_rss_mb": statistics.median(run["max_rss_mb"] for run in runs),
+        "packages_ms": packages,
+        "deferred_imported": deferred_imported,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"results written to {args.output}")
+
+    failures = []
+    if deferred_imported:
+        failures.append(f"imported with the app: {', '.join(deferred_imported)}")
+    if median_ms > args.max_ms:
+        failures.append(f"median {median_ms:.0f}ms above the {args.max_ms:.0f}ms target")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        change = (median_ms - baseline["median_ms"]) / baseline["median_ms"] * 100
+        print(f"compared to {args.baseline} (commit {baseline.get('meta', {}).get('commit')}): "
+              f"{baseline['median_ms']:.0f}ms -> {median_ms:.0f}ms ({change:+.1f}%)")
+        if change > args.max_regression:
+            failures.append(f"median regressed by {change:.1f}% (more than {args.max_regression}%)")
+    if failures:
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+End-to-end load test of the API against local stand-ins (see
+benchmarks.standins): moto for S3, a fake Elasticsearch, a stub Whisper
+server and a fake Mistral API for chat and embeddings, with configurable
+latencies.
+
+The app runs in its own uvicorn process with a fresh SQLite database, bucket,
+index and RAG corpus. Each scenario fires ``--requests`` requests with at
+most ``--concurrency`` in flight, after a short warm-up, and records
+throughput, p50/p95/p99 latency, errors and the peak RSS of the app process.
+
+    python -m benchmarks.load_test --output benchmarks/results/baseline.json
+    python -m benchmarks.load_test --baseline benchmarks/results/baseline.json --max-regression 20
+
+With ``--baseline``, the run is compared to a previous one and exits non-zero
+when a scenario's throughput, p95 or p99 latency, peak RSS or error count
+regressed by more than ``--max-regression`` percent. Baselines are only
+comparable on the same machine (e.g. the same CI runner type).
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import boto3
+import httpx
+from sqlalchemy import create_engine
+
+from benchmarks.common import free_port, print_summary, summarize, wait_for_port
+from app.core.models import Base
+
+API = "/api/v1"
+SCENARIOS = [
+    "upload", "semantic_search", "rag_query",
+    "consultation_create", "consultation_get", "consultation_list", "consultation_update",
+    "chat_add", "chat_list", "transcribe",
+]
+QUERIES = [
+    "lab results follow-up", "blood pressure readings", "prescription refill", "chest x-ray report",
+    "allergy to penicillin", "diabetes care plan", "mri scan findings", "sleep study summary",
+]
+# Compared against the baseline: (metric, True when higher is better)
+COMPARED_METRICS = [("throughput_rps", True), ("p95_ms", False), ("p99_ms", False), ("peak_rss_mb", False)]
+
+
+def wav_bytes(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    output = io.BytesIO()
+    with wave.open(output, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(b"\x00\x00" * int(seconds * rate))
+    return output.getvalue()
+
+
+def document(i: int) -> bytes:
+    """A unique text document (distinct content, so uploads are not deduplicated)"""
+    topics = QUERIES[i % len(QUERIES)], QUERIES[(i * 3 + 1) % len(QUERIES)]
+    lines = [f"Clinical note {i}: {topics[0]} reviewed alongside {topics[1]}."]
+    lines += [f"Observation {j} for note {i}: {topics[j % 2]} remains stable." for j in range(40)]
+    return "\n".join(lines).encode()
+
+
+class RSSSampler:
+    """Peak resident memory of a process, sampled from /proc (Linux only)"""
+
+    def __init__(self, pid: int, interval: float = 0.02):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def read_kb(self, field: str = "VmRSS") -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/status") as status:
+                for line in status:
+                    if line.startswith(f"{field}:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.read_kb() or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RSSSampler":
+        self.peak_kb = self.read_kb() or 0
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class Stack:
+    """The stand-ins and the app under test, in their own processes"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="load-test-")
+        self.ports = {name: free_port() for name in ("s3", "es", "whisper", "mistral", "app")}
+        self.processes: List[subprocess.Popen] = []
+        self.app: Optional[subprocess.Popen] = None
+        self.startup_seconds = 0.0
+
+    def app_env(self) -> Dict[str, str]:
+        mistral = f"http://127.0.0.1:{self.ports['mistral']}"
+        return {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(self.workdir, 'app.db')}",
+            "S3_ENDPOINT_URL": f"http://127.0.0.1:{self.ports['s3']}",
+            "S3_BUCKET_NAME": "load-test",
+            "AWS_ACCESS_KEY_ID": "test",
+            "AWS_SECRET_ACCESS_KEY": "test",
+            "ELASTICSEARCH_URL": f"http://127.0.0.1:{self.ports['es']}",
+            "ELASTICSEARCH_INDEX": "load-test",
+            "WHISPER_API_URL": f"http://127.0.0.1:{self.ports['whisper']}/transcribe_audio",
+            "MISTRAL_BASE_URL": f"{mistral}/v1",
+            "MISTRAL_API_KEY": "load-test",
+            "SEMANTIC_SEARCH_PROVIDER": "mistralai",
+            "SEMANTIC_SEARCH_MODEL": "mistral-embed",
+            "SEMANTIC_SEARCH_DIMS": str(self.args.dims),
+            "RAG_SOURCE_URL": f"{mistral}/corpus",
+            "RAG_SNAPSHOT_DIR": os.path.join(self.workdir, "rag"),
+            "LOG_LEVEL": "WARNING",
+            "RESPONSE_CACHE_BACKEND": "memory",
+            # The Mistral embeddings client otherwise tries to download a tokenizer
+            "HF_HUB_OFFLINE": "1",
+        }
+
+    def start(self) -> None:
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "benchmarks.standins",
+            "--s3-port", str(self.ports["s3"]), "--es-port", str(self.ports["es"]),
+            "--whisper-port", str(self.ports["whisper"]), "--mistral-port", str(self.ports["mistral"]),
+            "--es-ms", str(self.args.es_ms), "--whisper-ms", str(self.args.whisper_ms),
+            "--llm-ms", str(self.args.llm_ms), "--embed-ms", str(self.args.embed_ms), "--dims", str(self.args.dims),
+        ]))
+        for name in ("s3", "es", "whisper", "mistral"):
+            wait_for_port(self.ports[name])
+
+        env = self.app_env()
+        boto3.client(
+            "s3", endpoint_url=env["S3_ENDPOINT_URL"], region_name="us-east-1",
+            aws_access_key_id="test", aws_secret_access_key="test"
+        ).create_bucket(Bucket=env["S3_BUCKET_NAME"])
+        # Schema straight from the models: SQLite cannot run the Postgres migrations
+        Base.metadata.create_all(create_engine(env["DATABASE_URL"]))
+
+        start = time.perf_counter()
+        self.app = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.ports["app"]),
+            "--log-level", "warning", "--no-access-log",
+        ], env=env, stdout=subprocess.DEVNULL)
+        self.processes.append(self.app)
+        wait_for_port(self.ports["app"], timeout=300)
+        self.startup_seconds = time.perf_counter() - start
+
+    def wait_until_ready(self, timeout: float = 300.0) -> None:
+        """Wait for the RAG pipeline to crawl and embed its corpus"""
+        deadline = time.monotonic() + timeout
+        with httpx.Client(base_url=self.base_url) as client:
+            while client.get(f"{API}/rag/ready").status_code != 200:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"RAG pipeline not ready after {timeout:.0f}s")
+                time.sleep(0.5)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.ports['app']}"
+
+    def stop(self) -> None:
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Scenarios:
+    """One request per call, by scenario; ``i`` numbers the request"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.audio = wav_bytes()
+        self.consultations: List[int] = []
+
+    async def upload(self, i: int) -> httpx.Response:
+        files = {"file": (f"note-{i}.txt", document(i), "text/plain")}
+        return await self.client.post(f"{API}/files/upload", files=files)
+
+    async def semantic_search(self, i: int) -> httpx.Response:
+        return await self.client.get(f"{API}/files/semantic-search", params={"query": QUERIES[i % len(QUERIES)], "top_k": 5})
+
+    async def rag_query(self, i: int) -> httpx.Response:
+        # Distinct questions, so that the answer cache does not short-circuit the pipeline
+        return await self.client.post(f"{API}/rag/query", json={"question": f"What is task decomposition? (variant {i})"})
+
+    async def consultation_create(self, i: int) -> httpx.Response:
+        response = await self.client.post(
+            f"{API}/consultations/",
+            data={"transcript": f"Patient {i} reports a mild headache.", "language": "en"},
+            files={"audio": (f"consultation-{i}.wav", self.audio, "audio/wav")},
+        )
+        if response.status_code == 200:
+            self.consultations.append(response.json()["id"])
+        return response
+
+    def consultation(self, i: int) -> int:
+        return self.consultations[i % len(self.consultations)]
+
+    async def consultation_get(self, i: int) -> httpx.Response:
+        return await self.client.get(f"{API}/consultations/{self.consultation(i)}")
+
+    async def consultation_list(self, i: int) -> httpx.Response:
+        return await self.client.get(f"{API}/consultations/")
+
+    async def consultation_update(self, i: int) -> httpx.Response:
+        return await self.client.put(
+            f"{API}/consultations/{self.consultation(i)}",
+            json={"status": "reviewed", "doctor_response": f"Rest and fluids ({i})."},
+        )
+
+    async def chat_add(self, i: int) -> httpx.Response:
+        consultation_id = self.consultation(i)
+        return await self.client.post(f"{API}/consultations/{consultation_id}/chat", json={
+            "consultation_id": consultation_id, "sender": "doctor" if i % 2 else "patient", "message": f"Message {i}",
+        })
+
+    async def chat_list(self, i: int) -> httpx.Response:
+        return await self.client.get(f"{API}/consultations/{self.consultation(i)}/chat")
+
+    async def transcribe(self, i: int) -> httpx.Response:
+        return await self.client.post(
+            f"{API}/consultations/transcribe", files={"audio": (f"voice-{i}.wav", self.audio, "audio/wav")}
+        )
+
+
+async def run_scenario(request: Callable[[int], Awaitable[httpx.Response]], requests: int, concurrency: int,
+                       sampler: RSSSampler, offset: int = 0) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await request(offset + i)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    with sampler:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall = time.perf_counter() - start
+    return {**summarize(latencies, wall, errors), "peak_rss_mb": sampler.peak_kb / 1024}
+
+
+async def run(stack: Stack, args) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=stack.base_url, timeout=120.0, limits=limits) as client:
+        scenarios = Scenarios(client)
+        for name in args.scenarios:
+            if name.startswith(("consultation_", "chat_")) and name != "consultation_create" and not scenarios.consultations:
+                # Reads and updates need consultations to work on
+                await run_scenario(scenarios.consultation_create, args.concurrency, args.concurrency, RSSSampler(stack.app.pid), offset=10**6)
+            request = getattr(scenarios, name)
+            # Warm-up requests are numbered apart from the measured ones (unique uploads and questions)
+            await run_scenario(request, args.warmup, args.concurrency, RSSSampler(stack.app.pid), offset=10**7)
+            results[name] = await run_scenario(request, args.requests, args.concurrency, RSSSampler(stack.app.pid))
+            print_summary(name, results[name])
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Regressions of the current run against the baseline, as messages"""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            print(f"  {name:<22} {metric:<15} {before:>10.1f} -> {after:>10.1f}  ({change:+.1f}%)")
+            if (-change if higher_is_better else change) > max_regression:
+                regressions.append(f"{name}: {metric} {before:.1f} -> {after:.1f} ({change:+.1f}%)")
+        if result["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="fake chat model latency")
+    parser.add_argument("--embed-ms", type=float, default=5.0, help="fake embeddings latency per request")
+    parser.add_argument("--whisper-ms", type=float, default=200.0, help="stub Whisper latency")
+    parser.add_argument("--es-ms", type=float, default=0.0, help="added fake Elasticsearch latency")
+    parser.add_argument("--dims", type=int, default=384, help="embedding dimensions")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="percent")
+    args = parser.parse_args()
+
+    stack = Stack(args)
+    try:
+        stack.start()
+        stack.wait_until_ready()
+        print(f"app up in {stack.startup_seconds:.1f}s")
+        scenarios = asyncio.run(run(stack, args))
+        server_peak_kb = RSSSampler(stack.app.pid).read_kb("VmHWM")
+    finally:
+        stack.stop()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "parameters": {
+                key: getattr(args, key)
+                for key in ("requests", "warmup", "concurrency", "llm_ms", "embed_ms", "whisper_ms", "es_ms", "dims")
+            },
+        },
+        "server": {
+            "startup_seconds": stack.startup_seconds,
+            "peak_rss_mb": server_peak_kb / 1024 if server_peak_kb else None,
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("meta", {}).get("parameters") != results["meta"]["parameters"]:
+            print("warning: baseline was recorded with different parameters", file=sys.stderr)
+        print(f"compared to {args.baseline} (commit {baseline.get('meta', {}).get('commit')}):")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"regressions above {args.max_regression}%:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Overhead of the Prometheus middleware on a trivial route.
+
+Two modes:
+
+- ``http`` (default): the bare and the instrumented app each run in a
+  uvicorn server and are called over keep-alive HTTP connections, as in
+  production.
+- ``asgi``: requests are driven straight through the ASGI interface (no
+  sockets or server), so nothing but the two apps is compared. This is the
+  worst case, and at this scale it is close to the noise of the machine.
+
+Each round runs both apps back to back in shuffled order, so that drift in
+CPU speed affects both alike, and the overhead is the median over rounds of
+the paired difference. Exits non-zero if it exceeds --max-overhead percent.
+
+    python -m benchmarks.metrics_overhead --mode http --requests 200 --rounds 100
+    python -m benchmarks.metrics_overhead --mode asgi --requests 1000 --rounds 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.common import free_port
+from app.core.metrics import PrometheusMiddleware
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping/{name}")
+    async def ping(name: str):
+        return {"pong": name}
+
+    if instrumented:
+        app.add_middleware(PrometheusMiddleware)
+    return app
+
+
+# Served by uvicorn in http mode
+bare_app = make_app(False)
+instrumented_app = make_app(True)
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds per request, through the ASGI interface"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/ping/{i % 100}", "raw_path": f"/ping/{i % 100}".encode(),
+            "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def compare(runners: Dict[str, Callable[[], float]], rounds: int) -> float:
+    timings: Dict[str, List[float]] = {name: [] for name in runners}
+    for _ in range(rounds):
+        for name in random.sample(list(runners), len(runners)):
+            timings[name].append(runners[name]())
+    for name, values in timings.items():
+        print(f"{name:<13} {min(values) * 1e6:>8.2f}us/request fastest  {statistics.median(values) * 1e6:>8.2f}us median")
+    pairs = list(zip(timings["bare"], timings["instrumented"]))
+    difference = statistics.median(instrumented - bare for bare, instrumented in pairs)
+    overhead = statistics.median((instrumented - bare) / bare for bare, instrumented in pairs) * 100
+    print(f"overhead      {difference * 1e6:>8.2f}us/request ({overhead:+.2f}%, median of paired rounds)")
+    return overhead
+
+
+def run_asgi(args) -> float:
+    loop = asyncio.new_event_loop()
+    apps = {"bare": bare_app, "instrumented": instrumented_app}
+    # Warm up: route compilation, middleware stack build
+    for app in apps.values():
+        loop.run_until_complete(drive(app, 1000))
+    return compare(
+        {name: (lambda app=app: loop.run_until_complete(drive(app, args.requests))) for name, app in apps.items()},
+        args.rounds
+    )
+
+
+def run_http(args) -> float:
+    servers, clients = [], {}
+    try:
+        for name in ("bare", "instrumented"):
+            port = free_port()
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", f"benchmarks.metrics_overhead:{name}_app",
+                 "--port", str(port), "--log-level", "warning", "--no-access-log"]
+            ))
+            clients[name] = httpx.Client(base_url=f"http://127.0.0.1:{port}")
+        for client in clients.values():
+            for _ in range(100):
+                try:
+                    client.get("/ping/warmup")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+        def round_of(client: httpx.Client) -> float:
+            start = time.perf_counter()
+            for i in range(args.requests):
+                client.get(f"/ping/{i % 100}")
+            return (time.perf_counter() - start) / args.requests
+
+        return compare({name: (lambda client=client: round_of(client)) for name, client in clients.items()}, args.rounds)
+    finally:
+        for client in clients.values():
+            client.close()
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["http", "asgi"], default="http")
+    parser.add_argument("--requests", type=int, default=None, help="requests per round (default: 200 http, 1000 asgi)")
+    parser.add_argument("--rounds", type=int, default=None, help="default: 100 http, 50 asgi")
+    parser.add_argument("--max-overhead", type=float, default=2.0, help="percent")
+    args = parser.parse_args()
+    if args.mode == "http":
+        args.requests, args.rounds = args.requests or 200, args.rounds or 100
+        overhead = run_http(args)
+    else:
+        args.requests, args.rounds = args.requests or 1000, args.rounds or 50
+        overhead = run_asgi(args)
+    if overhead > args.max_overhead:
+        print(f"overhead above {args.max_overhead}%", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+PDF text extraction benchmark on generated 1-, 50- and 500-page documents.
+
+Compares extracting pages one after another in-process (what a naive
+implementation does) with the page-parallel extraction used by
+FileProcessor, reporting total time, time to first page and pages/sec.
+
+    python -m benchmarks.pdf_processing --pages 1 50 500 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+from app.core.config import settings
+
+LINE = "The patient presented with intermittent chest pain radiating to the left arm during exertion."
+
+
+def make_pdf(page_count: int, lines_per_page: int = 40) -> bytes:
+    """
+    Minimal text-layer PDF: one Helvetica content stream per page
+    """
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    contents = []
+    for number in range(page_count):
+        lines = " T* ".join(f"({LINE} Page {number + 1} line {i}) Tj" for i in range(lines_per_page))
+        stream = f"BT /F1 9 Tf 11 TL 36 760 Td {lines} ET".encode()
+        contents.append(add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+    pages_id = len(objects) + page_count + 1
+    page_ids = [
+        add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        )
+        for content in contents
+    ]
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, page_count))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def sequential(path: str):
+    start = time.perf_counter()
+    first_page = None
+    chars = 0
+    for page in PdfReader(path).pages:
+        chars += len(page.extract_text() or "")
+        if first_page is None:
+            first_page = time.perf_counter() - start
+    return time.perf_counter() - start, first_page, chars
+
+
+async def parallel(path: str, ocr: bool):
+    from app.services.pdf_extraction import iter_pdf_pages
+    start = time.perf_counter()
+    first_page = None
+    chars = 0
+    async for page in iter_pdf_pages(path, max_pages=settings.PDF_MAX_PAGES, ocr=ocr):
+        chars += len(page["text"])
+        if first_page is None:
+            first_page = time.perf_counter() - start
+    return time.perf_counter() - start, first_page, chars
+
+
+def report(name, pages, result):
+    seconds, first_page, chars = result
+    print(
+        f"  {name:<11} {seconds * 1000:>9.1f}ms total  first page {first_page * 1000:>7.1f}ms  "
+        f"{pages / seconds:>8.1f} pages/s  {chars} chars"
+    )
+
+
+async def run(args) -> None:
+    from app.services.pdf_extraction import get_pdf_process_pool
+    # Start the workers before timing anything
+    await asyncio.get_running_loop().run_in_executor(get_pdf_process_pool(), os.getpid)
+    print(f"{settings.PDF_WORKERS or os.cpu_count()} worker processes")
+    for page_count in args.pages:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(make_pdf(page_count))
+        try:
+            print(f"{page_count} pages ({os.path.getsize(temp_file.name) / 1024:.0f} KiB)")
+            report("sequential", page_count, sequential(temp_file.name))
+            report("parallel", page_count, await parallel(temp_file.name, args.ocr))
+        finally:
+            os.unlink(temp_file.name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--workers", type=int, default=0, help="PDF worker processes (0 = one per CPU)")
+    parser.add_argument("--ocr", action="store_true", help="OCR pages without a text layer")
+    args = parser.parse_args()
+    settings.PDF_WORKERS = args.workers
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Concurrency benchmark for /rag/query.
+
+Fires ``--requests`` POSTs at a running server with at most ``--concurrency``
+in flight and reports throughput and tail latency. Questions are distinct by
+default, within a run and across runs (each run tags them with a fresh
+nonce), so the answer cache does not short-circuit the pipeline.
+
+    python -m benchmarks.rag_concurrency --base-url http://localhost:8000 --requests 100 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import print_summary, summarize
+
+
+async def run(base_url: str, requests: int, concurrency: int, repeat_question: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    # Answers cached by a previous run must not be hit again
+    nonce = uuid.uuid4().hex[:8]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        ready = await client.get("/api/v1/rag/ready")
+        if ready.status_code != 200:
+            raise SystemExit(f"RAG pipeline is not ready: {ready.text}")
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            question = "What is task decomposition?" if repeat_question else f"What is task decomposition? (run {nonce}, variant {i})"
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/rag/query", json={"question": question})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall = time.perf_counter() - start
+
+    print_summary("rag/query", summarize(latencies, wall, errors))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--repeat-question", action="store_true", help="send the same question every time (exercises the answer cache)")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.requests, args.concurrency, args.repeat_question))
+
+
+if __name__ == "__main__":
+    main()
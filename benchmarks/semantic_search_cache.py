@@ -0,0 +1,101 @@
+"""
+QPS of /files/semantic-search under a skewed (Zipf) query distribution, with
+and without the query embedding cache and request coalescing.
+
+Runs SemanticSearchService in-process with a model that burns a fixed amount
+of time per embedding call and an Elasticsearch stand-in with a fixed
+latency, and counts how many model and ES calls each configuration makes.
+
+    python -m benchmarks.semantic_search_cache --requests 5000 --concurrency 64 --zipf 1.1
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks.common import print_summary, summarize
+from app.core.cache import TTLCache
+from app.services.semantic_search_service import SemanticSearchService
+
+
+class SlowEmbeddings:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.seconds)
+        return [[float(len(text))] * 8 for text in texts]
+
+
+class FakeElasticsearch:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.calls = 0
+
+    async def search(self, index, body):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return {"hits": {"hits": [{"_id": "1", "_source": {"filename": "report.pdf"}}]}}
+
+
+def zipf_queries(count, vocabulary, exponent, rng):
+    # Query i is drawn with probability proportional to 1 / i^exponent
+    weights = 1.0 / np.arange(1, vocabulary + 1) ** exponent
+    picks = rng.choice(vocabulary, size=count, p=weights / weights.sum())
+    return [f"patient report {i}" for i in picks]
+
+
+async def run_mode(name, queries, args, cache, coalesce):
+    model = SlowEmbeddings(args.embed_ms / 1000)
+    es = FakeElasticsearch(args.es_ms / 1000)
+    service = SemanticSearchService(model=model, es=es)
+    if not cache:
+        service.query_embedding_cache = TTLCache(0, 0)
+    service.coalesce = coalesce
+
+    pending = iter(queries)
+    latencies = []
+
+    async def worker():
+        for query in pending:
+            start = time.perf_counter()
+            await service.semantic_search(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    print_summary(name, summarize(latencies, time.perf_counter() - start))
+    stats = service.get_stats()
+    print(
+        f"{'':<28} model calls={model.calls} es calls={es.calls} "
+        f"cache hit rate={stats['queryEmbeddingCache']['hitRate']:.2f} "
+        f"coalesced embeddings={stats['embeddingCoalescing']['coalesced']} "
+        f"searches={stats['searchCoalescing']['coalesced']}"
+    )
+
+
+async def run(args) -> None:
+    queries = zipf_queries(args.requests, args.vocabulary, args.zipf, np.random.default_rng(args.seed))
+    print(f"{args.requests} requests over {len(set(queries))} distinct queries, concurrency {args.concurrency}")
+    await run_mode("no cache, no coalescing", queries, args, cache=False, coalesce=False)
+    await run_mode("cache", queries, args, cache=True, coalesce=False)
+    await run_mode("cache + coalescing", queries, args, cache=True, coalesce=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--vocabulary", type=int, default=2000, help="number of distinct queries")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of query popularity")
+    parser.add_argument("--embed-ms", type=float, default=8.0, help="simulated model time per embedding call")
+    parser.add_argument("--es-ms", type=float, default=10.0, help="simulated Elasticsearch latency")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Local stand-ins for the services the API calls, so that it can be load
+tested on one machine without credentials or network access:
+
+- S3: a moto server;
+- Elasticsearch: an in-memory fake of the API subset the app uses (index and
+  alias management, indexing, kNN and keyword search, deletes and updates);
+- Whisper: a transcription server answering after a fixed delay;
+- Mistral: chat completions after a fixed delay, embeddings that hash words
+  into a fixed number of dimensions (so similar texts get similar vectors),
+  and a ``/corpus`` page for the RAG pipeline to crawl.
+
+Stand-in latencies are fixed so that benchmark runs measure the app rather
+than its dependencies.
+
+    python -m benchmarks.standins --s3-port 9100 --es-port 9101 --whisper-port 9102 --mistral-port 9103 --llm-ms 300
+"""
+import argparse
+import asyncio
+import fnmatch
+import logging
+import math
+import re
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+
+WORD = re.compile(r"\w+")
+
+CORPUS_TOPICS = [
+    "task decomposition", "planning", "self-reflection", "memory", "tool use", "retrieval",
+    "chain of thought", "vector stores", "agents", "prompting", "evaluation", "feedback",
+]
+
+
+def corpus_html(paragraphs: int) -> str:
+    """A deterministic article of ``paragraphs`` paragraphs for the RAG crawl"""
+    body = []
+    for i in range(paragraphs):
+        topic = CORPUS_TOPICS[i % len(CORPUS_TOPICS)]
+        other = CORPUS_TOPICS[(i * 7 + 3) % len(CORPUS_TOPICS)]
+        body.append(
+            f"<p>Section {i}: {topic} lets an agent break work into steps and combine it with {other}. "
+            f"In practice {topic} is evaluated on held-out tasks, and {other} keeps the context short "
+            f"enough for the model. Example {i} shows how {topic} and {other} interact over several turns.</p>"
+        )
+    return f"<html><head><title>Agents</title></head><body>{''.join(body)}</body></html>"
+
+
+def hashed_embedding(text: str, dims: int) -> List[float]:
+    """Bag of words hashed into ``dims`` dimensions, L2-normalized"""
+    vector = [0.0] * dims
+    for word in WORD.findall(text.lower()):
+        vector[zlib.crc32(word.encode()) % dims] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class FakeElasticsearch:
+    """
+    In-memory indices and aliases. Searches score every document: kNN by the
+    best cosine over its passage vectors, queries by how many query words
+    appear in its text.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.indices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.aliases: Dict[str, set] = {}
+        # Normalized passage vectors of each document, so that kNN searches
+        # cost the stand-in little next to the app
+        self.vectors: Dict[str, np.ndarray] = {}
+
+    def resolve(self, name: str) -> List[str]:
+        names = []
+        for part in name.split(","):
+            if part in self.aliases:
+                names.extend(sorted(self.aliases[part]))
+            elif part in self.indices:
+                names.append(part)
+            else:
+                names.extend(index for index in self.indices if "*" in part and fnmatch.fnmatch(index, part))
+        return names
+
+    def app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def product_header(request: Request, call_next):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            response = await call_next(request)
+            # The client refuses to talk to anything else
+            response.headers["X-Elastic-Product"] = "Elasticsearch"
+            return response
+
+        @app.get("/")
+        async def info():
+            return {"name": "fake", "cluster_name": "standins", "version": {"number": "9.1.0", "build_flavor": "default"}, "tagline": "You Know, for Search"}
+
+        @app.head("/_alias/{name}")
+        async def exists_alias(name: str):
+            return Response(status_code=200 if name in self.aliases else 404)
+
+        @app.get("/_alias/{name}")
+        async def get_alias(name: str):
+            if name not in self.aliases:
+                return JSONResponse({"error": f"alias [{name}] missing", "status": 404}, status_code=404)
+            return {index: {"aliases": {name: {}}} for index in self.aliases[name]}
+
+        @app.post("/_aliases")
+        async def update_aliases(request: Request):
+            for action in (await request.json())["actions"]:
+                (kind, spec), = action.items()
+                if kind == "add":
+                    self.aliases.setdefault(spec["alias"], set()).add(spec["index"])
+                elif kind == "remove":
+                    self.aliases.get(spec["alias"], set()).discard(spec["index"])
+                elif kind == "remove_index":
+                    self.indices.pop(spec["index"], None)
+            return {"acknowledged": True}
+
+        @app.put("/{index}/_alias/{name}")
+        async def put_alias(index: str, name: str):
+            self.aliases.setdefault(name, set()).add(index)
+            return {"acknowledged": True}
+
+        @app.head("/{index}")
+        async def exists(index: str):
+            return Response(status_code=200 if self.resolve(index) else 404)
+
+        @app.put("/{index}")
+        async def create(index: str):
+            if index in self.indices:
+                return JSONResponse({"error": {"type": "resource_already_exists_exception"}, "status": 400}, status_code=400)
+            self.indices[index] = {}
+            return {"acknowledged": True, "shards_acknowledged": True, "index": index}
+
+        @app.delete("/{index}")
+        async def delete_index(index: str):
+            for name in self.resolve(index):
+                self.indices.pop(name, None)
+                for targets in self.aliases.values():
+                    targets.discard(name)
+            return {"acknowledged": True}
+
+        @app.api_route("/{index}/_doc/{doc_id}", methods=["PUT", "POST"])
+        async def index_document(index: str, doc_id: str, request: Request):
+            return self._index(index, doc_id, await request.json())
+
+        @app.post("/{index}/_doc")
+        async def index_new_document(index: str, request: Request):
+            return self._index(index, uuid.uuid4().hex, await request.json())
+
+        @app.delete("/{index}/_doc/{doc_id}")
+        async def delete_document(index: str, doc_id: str):
+            found = False
+            for name in self.resolve(index):
+                found = self.indices[name].pop(doc_id, None) is not None or found
+            return JSONResponse({"_id": doc_id, "result": "deleted" if found else "not_found"}, status_code=200 if found else 404)
+
+        @app.post("/{index}/_update/{doc_id}")
+        async def update_document(index: str, doc_id: str, request: Request):
+            body = await request.json()
+            for name in self.resolve(index):
+                if doc_id in self.indices[name]:
+                    self.indices[name][doc_id].update(body.get("doc", {}))
+                    return {"_id": doc_id, "result": "updated"}
+            return JSONResponse({"_id": doc_id, "result": "not_found"}, status_code=404)
+
+        @app.api_route("/{index}/_search", methods=["GET", "POST"])
+        async def search(index: str, request: Request):
+            body = await request.json() if await request.body() else {}
+            return self._search(self.resolve(index), body)
+
+        @app.get("/{index}/_count")
+        async def count(index: str):
+            return {"count": sum(len(self.indices[name]) for name in self.resolve(index))}
+
+        return app
+
+    def _index(self, index: str, doc_id: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        names = self.resolve(index)
+        if not names:
+            # Dynamic index creation, as Elasticsearch does
+            self.indices[index] = {}
+            names = [index]
+        self.indices[names[0]][doc_id] = document
+        vectors = [passage["vector"] for passage in document.get("passages", []) if passage.get("vector")]
+        if vectors:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            self.vectors[doc_id] = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return {"_index": names[0], "_id": doc_id, "result": "created", "_version": 1}
+
+    def _search(self, names: List[str], body: Dict[str, Any]) -> Dict[str, Any]:
+        size = body.get("size", 10)
+        start = body.get("from", 0)
+        documents = [(name, doc_id, doc) for name in names for doc_id, doc in self.indices[name].items()]
+        scored = []
+        knn = body.get("knn")
+        if knn:
+            knn = knn[0] if isinstance(knn, list) else knn
+            query = np.asarray(knn["query_vector"], dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            for name, doc_id, doc in documents:
+                vectors = self.vectors.get(doc_id)
+                if vectors is not None:
+                    similarities = vectors @ query
+                    best = int(similarities.argmax())
+                    scored.append((float(similarities[best]), name, doc_id, doc, doc["passages"][best]))
+            scored = sorted(scored, key=lambda hit: hit[0], reverse=True)[:knn.get("k", size)]
+        else:
+            words = set(WORD.findall(" ".join(_query_strings(body.get("query", {}))).lower()))
+            for name, doc_id, doc in documents:
+                text = " ".join(str(doc.get(field, "")) for field in ("filename", "content", "ocr_text")).lower()
+                score = sum(1.0 for word in words if word in text) if words else 1.0
+                if score:
+                    scored.append((score, name, doc_id, doc, None))
+            scored.sort(key=lambda hit: hit[0], reverse=True)
+        excludes = set((body.get("_source") or {}).get("excludes", [])) if isinstance(body.get("_source"), dict) else set()
+        hits = []
+        for score, name, doc_id, doc, passage in scored[start:start + size]:
+            hit = {"_index": name, "_id": doc_id, "_score": score, "_source": {k: v for k, v in doc.items() if k not in excludes}}
+            if passage is not None:
+                source = {key: passage[key] for key in ("text", "offset", "page") if key in passage}
+                hit["inner_hits"] = {"passages": {"hits": {"hits": [{"_source": source, "_score": score}]}}}
+            hits.append(hit)
+        return {
+            "took": 1, "timed_out": False,
+            "hits": {"total": {"value": len(scored), "relation": "eq"}, "max_score": scored[0][0] if scored else None, "hits": hits},
+        }
+
+
+def _query_strings(query: Any) -> List[str]:
+    """The search terms of a query DSL tree (the values of its ``query`` keys)"""
+    if isinstance(query, dict):
+        strings = []
+        for key, value in query.items():
+            if key == "query" and isinstance(value, str):
+                strings.append(value)
+            elif key == "filter":
+                continue
+            else:
+                strings.extend(_query_strings(value))
+        return strings
+    if isinstance(query, list):
+        return [string for item in query for string in _query_strings(item)]
+    return []
+
+
+def whisper_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/transcribe_audio")
+    async def transcribe_audio(request: Request):
+        audio = await request.body()
+        await asyncio.sleep(latency)
+        return {"transcript": f"Patient describes a headache lasting three days ({len(audio)} bytes of audio)."}
+
+    return app
+
+
+def mistral_app(llm_latency: float, embed_latency: float, dims: int, corpus_paragraphs: int) -> FastAPI:
+    app = FastAPI()
+    corpus = corpus_html(corpus_paragraphs)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(llm_latency)
+        prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+        answer = "Task decomposition splits a goal into smaller steps that the agent plans and executes in turn."
+        return {
+            "id": uuid.uuid4().hex, "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(answer.split()),
+                      "total_tokens": len(prompt.split()) + len(answer.split())},
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(embed_latency)
+        return {
+            "id": uuid.uuid4().hex, "object": "list", "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": hashed_embedding(text, dims)} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": sum(len(text.split()) for text in texts)},
+        }
+
+    @app.get("/corpus", response_class=HTMLResponse)
+    async def get_corpus():
+        return corpus
+
+    return app
+
+
+def start_s3(port: int):
+    from moto.server import ThreadedMotoServer
+    # One access log line per S3 call otherwise
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    return server
+
+
+async def serve(apps: Dict[int, FastAPI]) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+        for port, app in apps.items()
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--s3-port", type=int, default=9100)
+    parser.add_argument("--es-port", type=int, default=9101)
+    parser.add_argument("--whisper-port", type=int, default=9102)
+    parser.add_argument("--mistral-port", type=int, default=9103)
+    parser.add_argument("--es-ms", type=float, default=0.0, help="added to every Elasticsearch request")
+    parser.add_argument("--whisper-ms", type=float, default=200.0)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="per chat completion")
+    parser.add_argument("--embed-ms", type=float, default=5.0, help="per embeddings request")
+    parser.add_argument("--dims", type=int, default=384, help="embedding dimensions")
+    parser.add_argument("--corpus-paragraphs", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    s3 = start_s3(args.s3_port)
+    try:
+        asyncio.run(serve({
+            args.es_port: FakeElasticsearch(args.es_ms / 1000).app(),
+            args.whisper_port: whisper_app(args.whisper_ms / 1000),
+            args.mistral_port: mistral_app(args.llm_ms / 1000, args.embed_ms / 1000, args.dims, args.corpus_paragraphs),
+        }))
+    finally:
+        s3.stop()
+
+
+if __name__ == "__main__":
+    main()
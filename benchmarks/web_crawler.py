@@ -0,0 +1,252 @@
+"""
+Behaviour checks of the RAG web crawler against a local fixture site, plus
+the time of a cold and of an unchanged recrawl.
+
+The fixture server (aiohttp, in-process) serves a small site whose pages
+carry ETags and answer conditional GETs with 304, links to another host
+that must not be followed, and a page without text. The run checks:
+
+- link extraction and the depth and page limits;
+- per-host rate limiting (request starts at least ``--interval`` apart);
+- conditional GETs: an unchanged recrawl downloads and yields nothing but
+  still follows links, a changed page is yielded again;
+- validators only taking effect once committed: after an ingestion that
+  failed (embeddings erroring), the next ingestion downloads and indexes
+  the pages again instead of getting 304 and indexing nothing;
+- no snapshot is written for an empty corpus.
+
+    python -m benchmarks.web_crawler --pages 50 --interval 0.02
+
+Exits non-zero when a check fails.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Settings are read on import: use a fast crawler and a scratch snapshot directory
+os.environ.setdefault("CRAWLER_PER_HOST_INTERVAL", "0.02")
+os.environ.setdefault("RAG_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="crawler-check-"))
+os.environ.setdefault("MISTRAL_API_KEY", "crawler-check")
+os.environ.setdefault("RAG_CACHE_ENABLED", "false")
+
+from aiohttp import web
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app.schemas.agentic import RAGConfig
+from app.services.agentic.document_loader import DocumentLoaderFactory
+from app.services.agentic.rag_pipeline_service import RAGPipeline
+from app.services.agentic.web_crawler import WebCrawler, get_web_crawler
+from benchmarks.standins import hashed_embedding
+
+EXTERNAL_LINK = "http://external.invalid/page"
+
+
+class FixtureSite:
+    """
+    ``/`` links to ``/p0`` ... ``/p<n-1>``, each linking to its child
+    ``/p<i>/child``; ``/empty`` has no text
+    """
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.versions: Dict[str, int] = {}
+        # (path, start time, conditional, status) of every request
+        self.requests: List[Tuple[str, float, bool, int]] = []
+
+    def html(self, path: str) -> str:
+        if path == "/":
+            links = [f"/p{i}" for i in range(self.pages)] + ["/empty", EXTERNAL_LINK]
+        elif path.endswith("/child") or path == "/empty":
+            links = []
+        else:
+            links = [f"{path}/child"]
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        text = "" if path == "/empty" else f"<p>Page {path} version {self.versions.get(path, 0)} about crawling.</p>"
+        title = "" if path == "/empty" else f"<title>{path}</title>"
+        return f"<html><head>{title}</head><body>{text}{anchors}</body></html>"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        started = time.monotonic()
+        path = request.path
+        etag = f'"{path}-{self.versions.get(path, 0)}"'
+        conditional = "If-None-Match" in request.headers
+        status = 304 if request.headers.get("If-None-Match") == etag else 200
+        self.requests.append((path, started, conditional, status))
+        if status == 304:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=self.html(path), content_type="text/html", headers={"ETag": etag})
+
+
+class FlakyEmbeddings:
+    """Hashed bag-of-words embeddings, failing while ``failing`` is set"""
+
+    def __init__(self):
+        self.failing = False
+
+    def embed_documents(self, texts):
+        if self.failing:
+            raise RuntimeError("embedding service unavailable")
+        return [hashed_embedding(text, 64) for text in texts]
+
+    def embed_query(self, text):
+        return hashed_embedding(text, 64)
+
+
+class Checks:
+    def __init__(self):
+        self.failures: List[str] = []
+
+    def expect(self, name: str, condition: bool, detail: str = "") -> None:
+        print(f"  {'ok  ' if condition else 'FAIL'} {name}{f' ({detail})' if detail and not condition else ''}")
+        if not condition:
+            self.failures.append(name)
+
+
+async def crawl(crawler: WebCrawler, base: str, **kwargs) -> List[str]:
+    return [doc.metadata["source"] async for doc in crawler.crawl([base + "/"], **kwargs)]
+
+
+async def check_crawler(site: FixtureSite, base: str, args, checks: Checks) -> None:
+    pages = site.pages
+    crawler = WebCrawler(max_concurrency=8, per_host_concurrency=4, per_host_interval=args.interval)
+    try:
+        print("crawler:")
+        started = time.perf_counter()
+        sources = await crawl(crawler, base, max_depth=2, max_pages=1000)
+        cold_seconds = time.perf_counter() - started
+        expected = {base + "/"} | {f"{base}/p{i}" for i in range(pages)} | {f"{base}/p{i}/child" for i in range(pages)}
+        checks.expect("follows same-host links to max_depth", set(sources) == expected,
+                      f"{len(set(sources) ^ expected)} pages differ")
+        checks.expect("does not follow other hosts", len(site.requests) == len(expected) + 1,
+                      f"{len(site.requests)} requests")
+        checks.expect("yields no document for a page without text", f"{base}/empty" not in sources)
+
+        starts = sorted(start for _, start, _, _ in site.requests)
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        # Timer granularity of the event loop
+        checks.expect("rate limits requests per host", min(gaps, default=args.interval) >= args.interval * 0.9,
+                      f"smallest gap {min(gaps, default=0) * 1000:.1f}ms")
+
+        site.requests.clear()
+        for max_depth, max_pages in ((1, 1000), (2, 5)):
+            other = WebCrawler(per_host_interval=0)
+            try:
+                sources = await crawl(other, base, max_depth=max_depth, max_pages=max_pages)
+            finally:
+                await other.close()
+            if max_pages == 5:
+                checks.expect("stops at max_pages", len(sources) <= 5, f"{len(sources)} pages")
+            else:
+                checks.expect("stops at max_depth", sources and not any(source.endswith("/child") for source in sources))
+
+        # Uncommitted validators: the recrawl downloads everything again
+        site.requests.clear()
+        again = await crawl(crawler, base, max_depth=2, max_pages=1000)
+        # (those of pages without text are committed as they are fetched)
+        checks.expect("refetches pages whose validators were not committed", set(again) == expected and not any(
+            status == 304 for path, _, _, status in site.requests if path != "/empty"
+        ))
+
+        crawler.commit(again)
+        site.requests.clear()
+        started = time.perf_counter()
+        unchanged = await crawl(crawler, base, max_depth=2, max_pages=1000)
+        recrawl_seconds = time.perf_counter() - started
+        checks.expect("sends conditional GETs and yields nothing when unchanged", unchanged == [])
+        checks.expect("follows the links of unchanged pages",
+                      sum(1 for path, _, conditional, status in site.requests if conditional and status == 304)
+                      == len(expected) + 1, f"{len(site.requests)} requests")
+
+        site.versions["/p1"] = 1
+        changed = await crawl(crawler, base, max_depth=2, max_pages=1000)
+        checks.expect("yields a changed page again", changed == [f"{base}/p1"], str(changed))
+
+        print(f"  cold crawl of {len(expected) + 1} pages: {cold_seconds * 1000:.0f}ms, "
+              f"unchanged recrawl: {recrawl_seconds * 1000:.0f}ms")
+    finally:
+        await crawler.close()
+
+
+async def check_ingestion(site: FixtureSite, base: str, checks: Checks) -> None:
+    print("ingestion:")
+    config = RAGConfig(
+        llm={"model": "mistral-large-latest", "temperature": 0},
+        embeddings={"provider": "mistralai", "model": "mistral-embed"},
+        chunking={"chunkSize": 1000, "chunkOverlap": 0},
+        vectorStore={"type": "memory"},
+        documentLoader={"type": "web", "webConfig": {"url": base + "/", "maxDepth": 2, "maxPages": 1000}},
+    )
+    pipeline = RAGPipeline(config)
+    embeddings = FlakyEmbeddings()
+    pipeline.embeddings = embeddings
+    pipeline.vector_store = InMemoryVectorStore(embeddings)
+    try:
+        await pipeline.save_snapshot()
+        checks.expect("does not snapshot an empty corpus", not os.path.exists(pipeline.snapshot_path))
+
+        embeddings.failing = True
+        try:
+            await pipeline.load_and_index_documents()
+            checks.expect("ingestion with failing embeddings raises", False)
+        except Exception:
+            pass
+
+        embeddings.failing = False
+        report = await pipeline.ingest(DocumentLoaderFactory.stream_documents(config.documentLoader))
+        checks.expect("re-ingests the pages after a failed ingestion", report.documents > 0 and report.embedded > 0,
+                      f"{report.documents} documents, {report.embedded} embedded")
+
+        await pipeline.save_snapshot()
+        checks.expect("snapshots the ingested corpus", os.path.exists(pipeline.snapshot_path))
+
+        site.requests.clear()
+        report = await pipeline.ingest(DocumentLoaderFactory.stream_documents(config.documentLoader))
+        checks.expect("skips unchanged pages once ingested", report.documents == 0 and all(
+            status == 304 for *_, status in site.requests
+        ), f"{report.documents} documents")
+    finally:
+        await get_web_crawler().close()
+        pipeline.retrieval_executor.shutdown()
+        pipeline.ingestion_executor.shutdown()
+
+
+async def run(args) -> List[str]:
+    checks = Checks()
+    for check in (check_crawler, check_ingestion):
+        # A fresh site per check, so that validators from one do not leak into the other
+        site = FixtureSite(args.pages)
+        app = web.Application()
+        app.router.add_get("/{path:.*}", site.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        server = web.TCPSite(runner, "127.0.0.1", 0)
+        await server.start()
+        base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        try:
+            if check is check_crawler:
+                await check(site, base, args, checks)
+            else:
+                await check(site, base, checks)
+        finally:
+            await runner.cleanup()
+    return checks.failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20, help="pages linked from the fixture home page")
+    parser.add_argument("--interval", type=float, default=0.02, help="per-host request interval, seconds")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print(f"{len(failures)} checks failed: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()